@@ -15,17 +15,30 @@ def create_app(config_class=Config):
     db.init_app(app)
     login_manager.init_app(app)
 
+    # 请求耗时与 SQL 统计（METRICS_ENABLED 关闭时不注册任何钩子）
+    from app.services.metrics import init_metrics
+    init_metrics(app)
+
     # Import and register blueprints
     from app.routes.auth import auth_bp
     from app.routes.dashboard import dashboard_bp
     from app.routes.profile import profile_bp
     from app.routes.meal_track import meal_track_bp
     from app.routes.admin import admin_bp
+    from app.routes.plate import plate_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(dashboard_bp)
     app.register_blueprint(profile_bp)
     app.register_blueprint(meal_track_bp)
     app.register_blueprint(admin_bp)
+    app.register_blueprint(plate_bp)
+
+    # 派生数据的增量维护（通过 SQLAlchemy 事件注册）
+    from app.services import nutrition_table, nutrition_engine, dish_resolver, counters, user_cache  # noqa: F401
+    counters.pending_deltas.flush_interval = app.config['COUNTER_FLUSH_INTERVAL']
+
+    from app.commands import register_commands
+    register_commands(app)
 
     return app
@@ -0,0 +1,277 @@
+# app/commands.py - 维护用的 Flask 命令行命令（flask --app run.py <命令>）
+
+import click
+from sqlalchemy import inspect, text
+
+from app import db
+
+
+def register_commands(app):
+    """注册命令行命令"""
+
+    @app.cli.command('rebuild-dish-nutrition')
+    def rebuild_dish_nutrition_command():
+        """全量重建菜品每100g营养成分表"""
+        from app.services.nutrition_table import rebuild_dish_nutrition
+
+        count = rebuild_dish_nutrition(db.session)
+        db.session.commit()
+        click.echo(f'已重建 {count} 个菜品的营养成分')
+
+    @app.cli.command('migrate-dish-names')
+    def migrate_dish_names_command():
+        """为已有的 dishes 表补充规范化菜名列、回填数据并建立唯一索引"""
+        from app.models.food import Dish, normalize_dish_name
+
+        columns = {column['name'] for column in inspect(db.engine).get_columns('dishes')}
+        if 'name_normalized' not in columns:
+            db.session.execute(text('ALTER TABLE dishes ADD COLUMN name_normalized VARCHAR(100)'))
+            db.session.commit()
+
+        count = 0
+        for dish in Dish.query.all():
+            normalized = normalize_dish_name(dish.name)
+            if dish.name_normalized != normalized:
+                dish.name_normalized = normalized
+                count += 1
+        db.session.commit()
+
+        indexes = {index['name'] for index in inspect(db.engine).get_indexes('dishes')}
+        if 'ix_dishes_name_normalized' not in indexes:
+            db.session.execute(text(
+                'CREATE UNIQUE INDEX ix_dishes_name_normalized ON dishes (name_normalized)'))
+            db.session.commit()
+        click.echo(f'已回填 {count} 个菜品的规范化菜名')
+
+    @app.cli.command('rebuild-daily-nutrition')
+    @click.option('--user-id', type=int, default=None, help='只重建指定用户')
+    @click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='只重建该日期（含）之后的汇总')
+    def rebuild_daily_nutrition_command(user_id, since):
+        """根据用餐记录回填或修复每日营养汇总"""
+        from app.services.daily_rollup import rebuild_daily_rollup
+
+        count = rebuild_daily_rollup(db.session, user_id=user_id,
+                                     since=since.date() if since else None)
+        db.session.commit()
+        click.echo(f'已写入 {count} 行每日营养汇总')
+
+    @app.cli.command('ensure-indexes')
+    def ensure_indexes_command():
+        """为已存在的表补建模型中声明的索引（create_all 不会修改已有表）"""
+        created = 0
+        for table in db.metadata.sorted_tables:
+            if not inspect(db.engine).has_table(table.name):
+                continue
+            existing = {index['name'] for index in inspect(db.engine).get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(bind=db.engine)
+                    created += 1
+                    click.echo(f'已创建索引 {index.name}')
+        click.echo(f'共创建 {created} 个索引')
+
+    @app.cli.command('ensure-columns')
+    def ensure_columns_command():
+        """为已存在的表补充模型中新增的可空列（create_all 不会修改已有表）"""
+        added = 0
+        for table in db.metadata.sorted_tables:
+            if not inspect(db.engine).has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspect(db.engine).get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                db.session.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                db.session.commit()
+                added += 1
+                click.echo(f'已添加列 {table.name}.{column.name}')
+        click.echo(f'共添加 {added} 列')
+
+    @app.cli.command('reconcile-counters')
+    def reconcile_counters_command():
+        """用实际 COUNT 校准管理后台计数器"""
+        from app.services.counters import reconcile_counters
+
+        values = reconcile_counters(db.session)
+        db.session.commit()
+        for name, value in values.items():
+            click.echo(f'{name} = {value}')
+
+    @app.cli.command('compact-weight-samples')
+    @click.option('--raw-age', type=int, default=None, help='压缩早于多少秒前的原始采样')
+    @click.option('--downsample-after-days', type=int, default=None, help='降采样多少天前的数据')
+    @click.option('--resolution-ms', type=int, default=None, help='降采样后的分辨率（毫秒）')
+    def compact_weight_samples_command(raw_age, downsample_after_days, resolution_ms):
+        """压缩原始重量采样并对旧数据降采样（建议由 cron 定期执行）"""
+        import time
+        from app.services.weight_store import downsample_chunks, pack_samples
+
+        raw_age = raw_age if raw_age is not None else app.config['WEIGHT_RAW_MAX_AGE']
+        days = downsample_after_days if downsample_after_days is not None \
+            else app.config['WEIGHT_DOWNSAMPLE_AFTER_DAYS']
+        resolution_ms = resolution_ms or app.config['WEIGHT_DOWNSAMPLE_RESOLUTION_MS']
+
+        now_ms = int(time.time() * 1000)
+        packed, chunks = pack_samples(db.session, now_ms - raw_age * 1000)
+        click.echo(f'已压缩 {packed} 个采样，写入 {chunks} 个数据块')
+        count = downsample_chunks(db.session, now_ms - days * 86400 * 1000, resolution_ms)
+        click.echo(f'已降采样 {count} 个数据块')
+
+    @app.cli.command('track-consumption')
+    @click.option('--from-id', type=int, default=None, help='从该采样 id 之后开始（默认从当前最新的采样开始）')
+    def track_consumption_command(from_id):
+        """持续读取新写入的重量采样并估计进食量（CONSUMPTION_TRACKING = 'worker' 时运行一个实例）"""
+        from app.services.consumption import follow_samples, get_consumption_tracker
+
+        if app.config['CONSUMPTION_TRACKING'] != 'worker':
+            click.echo("提示：CONSUMPTION_TRACKING 不是 'worker'，Web 进程也在估计，结果可能互相覆盖")
+        click.echo('开始估计进食量，按 Ctrl+C 结束')
+        try:
+            follow_samples(app, get_consumption_tracker(app), after_id=from_id,
+                           commit_lag=app.config['CONSUMPTION_COMMIT_LAG'])
+        except KeyboardInterrupt:
+            pass
+
+    @app.cli.command('migrate-weight-log')
+    @click.option('--drop-legacy', is_flag=True,
+                  help='校验紧凑格式与原 JSON 一致后清空 weight_log（不可恢复，建议先备份）')
+    def migrate_weight_log_command(drop_legacy):
+        """为已有的 detection_records 表补充 weight_data 列，并把 JSON 重量日志转换为紧凑格式
+
+        紧凑格式把重量量化到 0.1 克，转换后默认保留原 weight_log；确认无误后再加 --drop-legacy
+        运行一次，只清空逐条校验一致（时间戳相同、重量误差不超过量化精度）的记录。
+        """
+        from app.models.record import DetectionRecord, parse_weight_log
+        from app.services.weight_codec import WEIGHT_SCALE, encode_samples, iter_samples
+
+        columns = {column['name'] for column in inspect(db.engine).get_columns('detection_records')}
+        if 'weight_data' not in columns:
+            column_type = DetectionRecord.__table__.c.weight_data.type.compile(dialect=db.engine.dialect)
+            db.session.execute(text(f'ALTER TABLE detection_records ADD COLUMN weight_data {column_type}'))
+            db.session.commit()
+
+        def batches(*criteria):
+            last_id = 0
+            while True:
+                records = DetectionRecord.query.filter(DetectionRecord.id > last_id, *criteria) \
+                    .order_by(DetectionRecord.id).limit(500).all()
+                if not records:
+                    return
+                yield records
+                db.session.commit()
+                last_id = records[-1].id
+
+        converted = failed = 0
+        for records in batches(DetectionRecord.weight_data.is_(None), DetectionRecord.weight_log.isnot(None)):
+            for record in records:
+                try:
+                    record.weight_data = encode_samples(parse_weight_log(record.weight_log))
+                except (ValueError, TypeError):
+                    failed += 1
+                    continue
+                converted += 1
+        click.echo(f'已转换 {converted} 条识别记录的重量日志，{failed} 条无法解析（保持不变）')
+        if not drop_legacy:
+            return
+
+        tolerance = 0.5 / WEIGHT_SCALE + 1e-9
+        dropped = mismatched = 0
+        for records in batches(DetectionRecord.weight_data.isnot(None), DetectionRecord.weight_log.isnot(None)):
+            for record in records:
+                try:
+                    original = parse_weight_log(record.weight_log)
+                except (ValueError, TypeError):
+                    original = None
+                stored = list(iter_samples(record.weight_data))
+                if original is None or len(original) != len(stored) or any(
+                        ts != stored_ts or abs(weight - stored_weight) > tolerance
+                        for (ts, weight), (stored_ts, stored_weight) in zip(original, stored)):
+                    mismatched += 1
+                    continue
+                record.weight_log = None
+                dropped += 1
+        click.echo(f'已清空 {dropped} 条记录的原重量日志，{mismatched} 条校验不一致（保留原日志）')
+
+    @app.cli.command('export-records')
+    @click.argument('dataset', type=click.Choice(['diet', 'detection']))
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default='csv')
+    @click.option('--gzip', 'compress', is_flag=True, help='gzip 压缩输出')
+    @click.option('--flatten', is_flag=True, help='把 JSON 列展开为每个元素一行')
+    @click.option('--user-id', type=int, default=None, help='只导出指定用户')
+    @click.option('--output', '-o', type=click.Path(dir_okay=False), default='-', help='输出文件，默认标准输出')
+    def export_records_command(dataset, fmt, compress, flatten, user_id, output):
+        """流式导出用餐记录或识别记录"""
+        from app.services.export import export_stream
+
+        with click.open_file(output, 'wb') as f:
+            for chunk in export_stream(db.session, dataset, fmt, compress=compress,
+                                       flatten=flatten, user_id=user_id):
+                f.write(chunk)
+
+    @app.cli.command('import-menu')
+    @click.argument('kind', type=click.Choice(['canteens', 'dishes', 'ingredients',
+                                               'dish_ingredients', 'nutrition_facts']))
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default=None,
+                  help='默认按扩展名判断')
+    @click.option('--chunk-size', type=int, default=2000, help='每批写入的行数')
+    @click.option('--dry-run', is_flag=True, help='只校验不写入')
+    def import_menu_command(kind, path, fmt, chunk_size, dry_run):
+        """从 CSV 或 NDJSON 文件批量导入菜单数据"""
+        from app.services.menu_import import import_records, iter_records
+
+        fmt = fmt or ('ndjson' if path.endswith(('.ndjson', '.jsonl', '.json')) else 'csv')
+        with open(path, 'rb') as f:
+            result = import_records(db.session, kind, iter_records(f, fmt),
+                                    chunk_size=chunk_size, dry_run=dry_run).to_dict()
+        for error in result['errors']:
+            click.echo(f"第 {error['line']} 行：{error['message']}", err=True)
+        click.echo(f"读取 {result['rows']} 行，导入 {result['imported']} 行，错误 {result['error_count']} 行，"
+                   f"耗时 {result['seconds']} 秒（{result['rows_per_sec']} 行/秒）")
+
+    @app.cli.command('backfill-detection-items')
+    @click.option('--batch-size', type=int, default=1000)
+    def backfill_detection_items_command(batch_size):
+        """根据已有识别记录的 detected_objects 回填识别结果表"""
+        import json
+        from app.models.record import DetectionItem, DetectionRecord
+        from app.services.dish_resolver import dish_resolver
+
+        has_items = db.session.query(DetectionItem.id).filter(DetectionItem.record_id == DetectionRecord.id).exists()
+        items_table = DetectionItem.__table__
+        last_id = 0
+        records = items = 0
+        while True:
+            rows = db.session.query(DetectionRecord.id, DetectionRecord.detect_time, DetectionRecord.detected_objects) \
+                .filter(DetectionRecord.id > last_id, ~has_items) \
+                .order_by(DetectionRecord.id).limit(batch_size).all()
+            if not rows:
+                break
+            values = []
+            for record_id, detect_time, detected_objects in rows:
+                for item in json.loads(detected_objects) if detected_objects else []:
+                    if item.get('dish_id') is None:
+                        item['dish_id'] = dish_resolver.resolve_name(db.session, item.get('dish_name'))
+                    values.append(dict(DetectionItem.values_from_result(item, detect_time), record_id=record_id))
+            if values:
+                db.session.execute(items_table.insert(), values)
+            db.session.commit()
+            last_id = rows[-1][0]
+            records += len(rows)
+            items += len(values)
+        click.echo(f'已为 {records} 条识别记录回填 {items} 个识别结果')
+
+    @app.cli.command('sweep-uploads')
+    @click.option('--max-age-days', type=int, default=None)
+    @click.option('--max-bytes', type=int, default=None)
+    def sweep_uploads_command(max_age_days, max_bytes):
+        """按保留天数和总大小配额清理上传图片"""
+        from app.services.upload_store import UploadStore, upload_root
+
+        store = UploadStore(upload_root(app), app.config['UPLOAD_URL_PREFIX'])
+        removed, freed = store.sweep(
+            max_age_days if max_age_days is not None else app.config['UPLOAD_MAX_AGE_DAYS'],
+            max_bytes if max_bytes is not None else app.config['UPLOAD_MAX_BYTES'])
+        click.echo(f'已删除 {removed} 个文件，释放 {freed / 1024 / 1024:.1f} MB')
@@ -0,0 +1,12 @@
+from app import db
+from datetime import datetime
+from sqlalchemy.dialects import mysql
+
+
+class SystemCounter(db.Model):
+    """全局计数器（用户数、识别记录数等），写入时增量维护，定期与实际数量校准"""
+    __tablename__ = 'counters'
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+    # 上次校准时间；写回增量时与各自的提交时间比较，MySQL 上保留微秒
+    reconciled_at = db.Column(db.DateTime().with_variant(mysql.DATETIME(fsp=6), 'mysql'), default=datetime.now)
@@ -1,4 +1,11 @@
 from app import db
+from datetime import datetime
+from sqlalchemy.orm import validates
+
+
+def normalize_dish_name(name):
+    """规范化菜名（去除首尾空白并转小写），用于识别结果与菜品的匹配"""
+    return (name or '').strip().lower()
 
 
 class Canteen(db.Model):
@@ -11,9 +18,16 @@ class Dish(db.Model):
     __tablename__ = 'dishes'
     dish_id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
+    # 规范化菜名，写入 name 时自动同步；唯一索引保证按名称查找走索引
+    name_normalized = db.Column(db.String(100), unique=True, index=True)
     canteen_id = db.Column(db.Integer, db.ForeignKey('canteens.canteen_id'))
     cooking_method = db.Column(db.String(100))  # 烹饪方式
 
+    @validates('name')
+    def _sync_name_normalized(self, key, name):
+        self.name_normalized = normalize_dish_name(name)
+        return name
+
 
 class Ingredient(db.Model):
     __tablename__ = 'ingredients'
@@ -38,3 +52,16 @@ class NutritionFacts(db.Model):
     protein_g = db.Column(db.Float, nullable=False)
     fat_g = db.Column(db.Float, nullable=False)
     carb_g = db.Column(db.Float, nullable=False)
+
+
+class DishNutrition(db.Model):
+    """菜品每100g营养成分，由配方和营养成分表派生，随其变更增量重建"""
+    __tablename__ = 'dish_nutrition'
+    dish_id = db.Column(db.Integer, db.ForeignKey(
+        'dishes.dish_id'), primary_key=True)
+    recipe_weight_g = db.Column(db.Float, nullable=False, default=0.0)  # 配方总重量
+    calories = db.Column(db.Float, nullable=False, default=0.0)
+    protein = db.Column(db.Float, nullable=False, default=0.0)
+    fat = db.Column(db.Float, nullable=False, default=0.0)
+    carb = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime, default=datetime.now)
@@ -1,4 +1,5 @@
 from app import db
+from app.services.weight_codec import encode_samples, iter_samples
 from datetime import datetime
 import json
 
@@ -14,12 +15,16 @@ class DetectionRecord(db.Model):
     __tablename__ = 'detection_records'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
-    plate_id = db.Column(db.String(50), db.ForeignKey('plate.plate_id'))
+    plate_id = db.Column(db.String(50), db.ForeignKey('plate.plate_id'), index=True)
     bind_time = db.Column(db.DateTime)
     current_weight = db.Column(db.Float)
-    weight_log = db.Column(db.Text) # JSON format
+    weight_log = db.Column(db.Text) # JSON format（旧数据）
+    weight_data = db.Column(db.LargeBinary)  # 紧凑编码的重量序列，见 app/services/weight_codec.py
+    served_weight = db.Column(db.Float)    # 根据餐盘重量估计的取餐量（克）
+    consumed_weight = db.Column(db.Float)  # 根据餐盘重量估计的进食量（克）
     detected_objects = db.Column(db.Text) # JSON format
-    detect_time = db.Column(db.DateTime, default=datetime.now)
+    image_key = db.Column(db.String(80))  # 上传图片在内容寻址存储中的键（sha256 + 扩展名）
+    detect_time = db.Column(db.DateTime, default=datetime.now, index=True)
 
     def set_detected_objects(self, data):
         self.detected_objects = json.dumps(data)
@@ -27,8 +32,65 @@ class DetectionRecord(db.Model):
     def get_detected_objects(self):
         return json.loads(self.detected_objects) if self.detected_objects else []
 
+    items = db.relationship('DetectionItem', backref='record', cascade='all, delete-orphan')
+
+    def set_weight_samples(self, samples):
+        """保存重量序列 [(ts_ms, weight_g)]"""
+        self.weight_data = encode_samples(samples)
+
+    def iter_weight_samples(self):
+        """逐个读取重量序列；尚未迁移的记录从 weight_log 读取"""
+        if self.weight_data is not None:
+            return iter_samples(self.weight_data)
+        return iter(parse_weight_log(self.weight_log))
+
+
+class DetectionItem(db.Model):
+    """识别记录中的单个识别结果（与 detected_objects 内容一致，便于在 SQL 中统计）"""
+    __tablename__ = 'detection_items'
+    __table_args__ = (
+        db.Index('ix_detection_items_dish_time', 'dish_id', 'detect_time'),
+        # 按时间范围统计（菜品排行、置信度直方图）：时间在前，并覆盖 dish_id 与 confidence，无需回表
+        db.Index('ix_detection_items_time_dish', 'detect_time', 'dish_id', 'confidence'),
+    )
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    record_id = db.Column(db.Integer, db.ForeignKey('detection_records.id', ondelete='CASCADE'),
+                          nullable=False, index=True)
+    dish_id = db.Column(db.Integer, db.ForeignKey('dishes.dish_id'))  # 未匹配到菜品时为空
+    dish_name = db.Column(db.String(100))
+    class_id = db.Column(db.Integer)
+    confidence = db.Column(db.Float)
+    bbox_x1 = db.Column(db.Float)
+    bbox_y1 = db.Column(db.Float)
+    bbox_x2 = db.Column(db.Float)
+    bbox_y2 = db.Column(db.Float)
+    weight = db.Column(db.Float)
+    detect_time = db.Column(db.DateTime)  # 与所属识别记录相同，按时间统计时无需关联
+
+    @staticmethod
+    def values_from_result(item, detect_time):
+        """识别结果字典转换为列值（缺少的字段为空，兼容旧记录）"""
+        bbox = item.get('bbox') or [None] * 4
+        return {
+            'dish_id': item.get('dish_id'),
+            'dish_name': item.get('dish_name'),
+            'class_id': item.get('class_id'),
+            'confidence': item.get('confidence'),
+            'bbox_x1': bbox[0], 'bbox_y1': bbox[1], 'bbox_x2': bbox[2], 'bbox_y2': bbox[3],
+            'weight': item.get('weight'),
+            'detect_time': detect_time
+        }
+
+    @classmethod
+    def from_result(cls, item, detect_time):
+        return cls(**cls.values_from_result(item, detect_time))
+
 class DietRecord(db.Model):
     __tablename__ = 'diet_records'
+    __table_args__ = (
+        # 按用户 + 时间范围查询（每日记录、趋势统计）
+        db.Index('ix_diet_records_user_time', 'user_id', 'create_time'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     meal_type = db.Column(db.Integer) # 1 = Breakfast, 2 = Lunch, 3 = Dinner
@@ -50,4 +112,66 @@ class DietHabit(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     habit_content = db.Column(db.Text)
-    create_time = db.Column(db.DateTime, default=datetime.now)
\ No newline at end of file
+    create_time = db.Column(db.DateTime, default=datetime.now)
+
+class DailyNutrition(db.Model):
+    """用户每日营养汇总，随用餐记录的保存和删除在同一事务内增量更新"""
+    __tablename__ = 'daily_nutrition'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    total_calorie = db.Column(db.Float, nullable=False, default=0.0)
+    total_protein = db.Column(db.Float, nullable=False, default=0.0)
+    total_fat = db.Column(db.Float, nullable=False, default=0.0)
+    total_carb = db.Column(db.Float, nullable=False, default=0.0)
+    record_count = db.Column(db.Integer, nullable=False, default=0)
+    breakfast_count = db.Column(db.Integer, nullable=False, default=0)  # meal_type = 1
+    lunch_count = db.Column(db.Integer, nullable=False, default=0)      # meal_type = 2
+    dinner_count = db.Column(db.Integer, nullable=False, default=0)     # meal_type = 3
+
+class PlateWeightSample(db.Model):
+    """智能餐盘上报的重量采样，由后台线程批量写入"""
+    __tablename__ = 'plate_weight_samples'
+    __table_args__ = (
+        db.Index('ix_plate_weight_samples_plate_ts', 'plate_id', 'ts'),
+    )
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    plate_id = db.Column(db.String(50), db.ForeignKey('plate.plate_id'), nullable=False)
+    ts = db.Column(db.BigInteger, nullable=False)  # 采样时间（Unix 毫秒），每秒多次采样需要毫秒精度
+    weight = db.Column(db.Float, nullable=False)   # 克
+
+class PlateWeightChunk(db.Model):
+    """压缩后的重量采样：每个餐盘每个时间窗口一行
+
+    resolution_ms 为 0 表示原始采样，否则为降采样后的分辨率。
+    """
+    __tablename__ = 'plate_weight_chunks'
+    __table_args__ = (
+        db.Index('ix_plate_weight_chunks_plate_start', 'plate_id', 'start_ts'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    plate_id = db.Column(db.String(50), db.ForeignKey('plate.plate_id'), nullable=False)
+    start_ts = db.Column(db.BigInteger, nullable=False)  # 窗口起始（含），Unix 毫秒
+    end_ts = db.Column(db.BigInteger, nullable=False)    # 窗口结束（不含）
+    sample_count = db.Column(db.Integer, nullable=False, default=0)
+    resolution_ms = db.Column(db.Integer, nullable=False, default=0)
+    data = db.Column(db.LargeBinary, nullable=False)
+
+
+def parse_weight_log(weight_log):
+    """解析旧的 JSON 重量日志，返回 [(ts_ms, weight_g)]
+
+    兼容 [[ts, weight], ...] 与 [{"time"/"ts": ..., "weight": ...}, ...]，
+    时间可以是毫秒时间戳或 ISO 格式字符串。
+    """
+    if not weight_log:
+        return []
+    samples = []
+    for entry in json.loads(weight_log):
+        if isinstance(entry, dict):
+            ts, weight = entry.get('ts', entry.get('time')), entry.get('weight')
+        else:
+            ts, weight = entry
+        if isinstance(ts, str):
+            ts = int(datetime.fromisoformat(ts).timestamp() * 1000)
+        samples.append((int(ts), float(weight)))
+    return samples
@@ -60,4 +60,11 @@ class User(UserMixin, db.Model):
 
 @login_manager.user_loader
 def load_user(id):
-    return User.query.get(int(id))
+    from flask import current_app
+    from app.services.user_cache import user_cache
+
+    user = user_cache.load(db.session, int(id), current_app.config['USER_CACHE_TTL'])
+    # 已禁用的账号立即视为未登录
+    if user is None or user.status == 0:
+        return None
+    return user
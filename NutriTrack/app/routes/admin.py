@@ -1,17 +1,33 @@
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, current_app, Response
 from flask_login import login_required, current_user
 from app import db
 from app.models.user import User
 from app.models.record import DetectionRecord
+from app.services.counters import get_counter_reader
+from app.services.daily_rollup import day_range
+from app.services.detection import get_batcher
+from app.services.detection_stats import (confidence_histogram, detection_statistics, dish_popularity,
+                                          get_stats_cache)
+from app.services.export import export_response
+from app.services.menu_import import IMPORT_KINDS, import_records, iter_records
+from app.services.metrics import collect_gauges, metrics
+from app.services.keyset import InvalidCursor, keyset_paginate
+from app.services.result_cache import get_result_cache
+from app.services.upload_store import get_upload_store
+from app.services.user_cache import load_authorization
 from functools import wraps
-from datetime import datetime, timedelta
+import hmac
+from collections import Counter
+from datetime import datetime, date, timedelta
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if not current_user.is_authenticated or current_user.is_admin != 1:
+        # 权限以数据库为准：用户缓存只在本进程内失效，其它进程中被禁用或取消管理员的账号应立即失去权限
+        authorization = load_authorization(db.session, current_user.id) if current_user.is_authenticated else None
+        if authorization is None or authorization.status == 0 or authorization.is_admin != 1:
             flash('Access denied. Admin privileges required.', 'danger')
             return redirect(url_for('dashboard.index'))
         return f(*args, **kwargs)
@@ -21,11 +37,13 @@ def admin_required(f):
 @login_required
 @admin_required
 def dashboard():
-    total_users = User.query.count()
-    active_users = User.query.filter_by(status=1).count()
-    detection_count = DetectionRecord.query.count()
-    admin_count = User.query.filter_by(is_admin=1).count()
-    
+    # 计数器随写入增量维护，这里只读内存中的缓存值
+    counters = get_counter_reader(current_app._get_current_object()).get_all(db.session)
+    total_users = counters['users_total']
+    active_users = counters['users_active']
+    detection_count = counters['detections_total']
+    admin_count = counters['users_admin']
+
     return render_template('admin_dashboard.html',
                            total_users=total_users,
                            active_users=active_users,
@@ -36,9 +54,31 @@ def dashboard():
 @login_required
 @admin_required
 def user_manage():
-    page = request.args.get('page', 1, type=int)
-    users = User.query.paginate(page=page, per_page=10)
-    return render_template('admin_user_manage.html', users=users)
+    """用户列表，按 id 游标分页：?after=<next_cursor> / ?before=<prev_cursor>，?format=json 返回 JSON"""
+    try:
+        users = keyset_paginate(User.query, [User.id], per_page=10,
+                                after=request.args.get('after'), before=request.args.get('before'))
+    except InvalidCursor as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    # 总数只作参考，取自增量维护的计数器，不再每次 COUNT(*)
+    approx_total = get_counter_reader(current_app._get_current_object()).get_all(db.session)['users_total']
+
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'status': 'success',
+            'items': [{
+                'id': user.id,
+                'username': user.username,
+                'email': user.email,
+                'is_admin': user.is_admin,
+                'status': user.status,
+                'register_time': user.register_time.strftime('%Y-%m-%d %H:%M:%S') if user.register_time else None
+            } for user in users.items],
+            'next_cursor': users.next_cursor,
+            'prev_cursor': users.prev_cursor,
+            'approx_total': approx_total
+        })
+    return render_template('admin_user_manage.html', users=users, approx_total=approx_total)
 
 @admin_bp.route('/update_user', methods=['POST'])
 @login_required
@@ -67,34 +107,210 @@ def update_user():
 @login_required
 @admin_required
 def detection_records():
-    page = request.args.get('page', 1, type=int)
-    records = DetectionRecord.query.order_by(DetectionRecord.detect_time.desc()).paginate(page=page, per_page=10)
-    return render_template('admin_detection_records.html', records=records)
+    """识别记录，按 (detect_time, id) 倒序游标分页；参数同 user_manage"""
+    try:
+        # detect_time 上的二级索引隐含主键，(detect_time, id) 的定位与排序都可走该索引
+        records = keyset_paginate(DetectionRecord.query, [DetectionRecord.detect_time, DetectionRecord.id],
+                                  per_page=10, descending=True,
+                                  after=request.args.get('after'), before=request.args.get('before'))
+    except InvalidCursor as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    approx_total = get_counter_reader(current_app._get_current_object()).get_all(db.session)['detections_total']
+    store = get_upload_store(current_app._get_current_object())
+
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'status': 'success',
+            'items': [{
+                'id': record.id,
+                'user_id': record.user_id,
+                'plate_id': record.plate_id,
+                'detect_time': record.detect_time.strftime('%Y-%m-%d %H:%M:%S') if record.detect_time else None,
+                'current_weight': record.current_weight,
+                'detected_objects': record.get_detected_objects(),
+                'image_url': store.original_url(record.image_key) if record.image_key else None,
+                'thumb_url': store.thumb_url(record.image_key) if record.image_key else None
+            } for record in records.items],
+            'next_cursor': records.next_cursor,
+            'prev_cursor': records.prev_cursor,
+            'approx_total': approx_total
+        })
+    return render_template('admin_detection_records.html', records=records, approx_total=approx_total,
+                           store=store)
+
+def _date_range_args(default_days):
+    """解析 ?from=YYYY-MM-DD&to=YYYY-MM-DD（闭区间，默认最近 default_days 天），返回半开区间 (start, end)"""
+    try:
+        to_date = datetime.strptime(request.args['to'], '%Y-%m-%d').date() \
+            if request.args.get('to') else date.today()
+        from_date = datetime.strptime(request.args['from'], '%Y-%m-%d').date() \
+            if request.args.get('from') else to_date - timedelta(days=default_days - 1)
+    except ValueError:
+        raise ValueError('日期格式应为 YYYY-MM-DD')
+    if from_date > to_date:
+        raise ValueError('开始日期不能晚于结束日期')
+    return day_range(from_date)[0], day_range(to_date)[1]
 
 @admin_bp.route('/statistics')
 @login_required
 @admin_required
 def statistics():
-    # Last 7 days detection counts
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=6)
-    
-    dates = []
-    counts = []
-    
-    current = start_date
-    while current <= end_date:
-        d_str = current.strftime('%Y-%m-%d')
-        dates.append(d_str)
-        
-        count = DetectionRecord.query.filter(
-            db.func.date(DetectionRecord.detect_time) == current.date()
-        ).count()
-        counts.append(count)
-        
-        current += timedelta(days=1)
-        
+    """识别数量统计：?from=YYYY-MM-DD&to=YYYY-MM-DD&granularity=hour|day|week
+
+    默认最近7天按天统计；已结束的时间桶会被缓存，每次只重新计算当前桶。
+    """
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in ('hour', 'day', 'week'):
+        return jsonify({'status': 'error', 'message': 'granularity 只能是 hour、day 或 week'}), 400
+
+    try:
+        start, end = _date_range_args(default_days=7)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    bucket_count = (end - start) / {'hour': timedelta(hours=1), 'day': timedelta(days=1),
+                                    'week': timedelta(days=7)}[granularity]
+    if bucket_count > current_app.config['STATISTICS_MAX_BUCKETS']:
+        return jsonify({'status': 'error', 'message': '时间范围过大，请缩小范围或使用更粗的粒度'}), 400
+
+    labels, entries = detection_statistics(
+        db.session, get_stats_cache(current_app._get_current_object()), granularity, start, end)
+
+    dish_totals = Counter()
+    for entry in entries:
+        dish_totals.update(entry['dishes'])
+
     return jsonify({
-        'labels': dates,
-        'data': counts
+        'granularity': granularity,
+        'labels': labels,
+        'data': [entry['count'] for entry in entries],
+        'breakdown': [entry['dishes'] for entry in entries],
+        'dish_totals': dict(dish_totals.most_common())
     })
+
+
+@admin_bp.route('/statistics/dishes')
+@login_required
+@admin_required
+def dish_statistics():
+    """菜品识别热度：?from&to（默认最近30天）&limit=20"""
+    try:
+        start, end = _date_range_args(default_days=30)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 500)
+    return jsonify({'status': 'success', 'dishes': dish_popularity(db.session, start, end, limit)})
+
+
+@admin_bp.route('/statistics/confidence')
+@login_required
+@admin_required
+def confidence_statistics():
+    """识别置信度直方图：?from&to（默认最近30天）&bins=10&dish_id="""
+    try:
+        start, end = _date_range_args(default_days=30)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    bins = min(max(request.args.get('bins', 10, type=int), 1), 100)
+    histogram = confidence_histogram(db.session, start, end, bins,
+                                     dish_id=request.args.get('dish_id', type=int))
+    return jsonify({
+        'status': 'success',
+        'bins': [round(i / bins, 3) for i in range(bins + 1)],
+        'counts': histogram
+    })
+
+
+@admin_bp.route('/inference_status')
+@login_required
+@admin_required
+def inference_status():
+    """推理服务健康状态与队列长度"""
+    batcher = get_batcher(current_app._get_current_object())
+    data = {
+        'mode': 'service' if current_app.config['INFERENCE_SERVICE_ADDRESS'] else 'in_process',
+        'local_queue_length': batcher.queue_depth,
+        'avg_batch_size': round(batcher.avg_batch_size, 2),
+        'failed_batches': batcher.failed_batches,
+        'last_error': batcher.last_error
+    }
+
+    if current_app.config['DETECT_CACHE_ENABLED']:
+        data['result_cache'] = get_result_cache(current_app._get_current_object()).stats()
+
+    client = current_app.extensions.get('inference_client')
+    if client is not None:
+        try:
+            data['service'] = client.health()
+        except Exception as e:
+            data['service'] = {'status': 'unreachable', 'message': str(e)}
+
+    return jsonify(data)
+
+
+def metrics_access_required(f):
+    """管理员登录，或携带 Authorization: Bearer <METRICS_TOKEN>（供 Prometheus 抓取）"""
+    admin_view = login_required(admin_required(f))
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        token = current_app.config.get('METRICS_TOKEN')
+        auth = request.headers.get('Authorization', '')
+        if token and auth.startswith('Bearer ') and hmac.compare_digest(auth[7:].encode(), token.encode()):
+            return f(*args, **kwargs)
+        return admin_view(*args, **kwargs)
+    return decorated_function
+
+
+@admin_bp.route('/metrics')
+@metrics_access_required
+def metrics_report():
+    """本进程的性能指标；?format=prometheus 或 Accept 偏好 text/plain 时输出 Prometheus 文本格式"""
+    if not current_app.config['METRICS_ENABLED']:
+        return jsonify({'status': 'error', 'message': '未启用性能指标（METRICS_ENABLED）'}), 404
+
+    gauges = collect_gauges(current_app._get_current_object())
+    output = request.args.get('format')
+    accept = request.headers.get('Accept', '')
+    if output is None and 'text/plain' in accept and 'application/json' not in accept:
+        output = 'prometheus'  # Prometheus 抓取时的 Accept
+    if output == 'prometheus':
+        return Response(metrics.render_prometheus(gauges), mimetype='text/plain; version=0.0.4')
+    return jsonify(metrics.snapshot(gauges))
+
+
+@admin_bp.route('/export/<dataset>')
+@login_required
+@admin_required
+def export_records(dataset):
+    """导出全部用户的记录：dataset 为 diet 或 detection，可加 user_id 只导出单个用户"""
+    try:
+        return export_response(db.session, dataset, request.args,
+                               user_id=request.args.get('user_id', type=int))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+
+@admin_bp.route('/import/<kind>', methods=['POST'])
+@login_required
+@admin_required
+def import_menu(kind):
+    """批量导入菜单数据：kind 为 canteens、dishes、ingredients、dish_ingredients 或 nutrition_facts
+
+    上传字段 file，CSV（带表头）或 NDJSON（按扩展名或 ?format= 判断）；?dry_run=1 只校验不写入。
+    """
+    if kind not in IMPORT_KINDS:
+        return jsonify({'status': 'error', 'message': '不支持的导入类型'}), 400
+    file = request.files.get('file')
+    if file is None or file.filename == '':
+        return jsonify({'status': 'error', 'message': '未上传文件'}), 400
+    fmt = request.args.get('format') or ('ndjson' if file.filename.endswith(('.ndjson', '.jsonl', '.json')) else 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'status': 'error', 'message': 'format 只能是 csv 或 ndjson'}), 400
+
+    try:
+        result = import_records(db.session, kind, iter_records(file.stream, fmt),
+                                dry_run=request.args.get('dry_run') == '1')
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'status': 'error', 'message': f'导入失败：{str(e)}'}), 500
+    return jsonify({'status': 'success', 'result': result.to_dict()})
@@ -1,7 +1,11 @@
 from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
 from flask_login import login_required, current_user
+from sqlalchemy import func
 from app import db
-from app.models.record import DietRecord
+from app.models.record import DailyNutrition, DietRecord
+from app.services.daily_rollup import day_range
+from app.services.export import export_response
+from app.services.time_buckets import bucket_expr, bucket_label, iter_buckets
 from app.models.user import User
 from datetime import datetime, date, timedelta
 
@@ -34,29 +38,30 @@ def index():
     # 计算每日所需营养素
     nutrition_needs = calculate_daily_nutrition(bmr, current_user.health_goal)
 
-    # 获取指定日期的记录
-    records = DietRecord.query.filter(
-        DietRecord.user_id == current_user.id,
-        db.func.date(DietRecord.create_time) == target_date
-    ).all()
+    # 当日营养总量直接读取每日汇总表的一行
+    summary = db.session.get(DailyNutrition, (current_user.id, target_date))
 
     today_nutrition = {
-        'calories': 0,
-        'protein': 0,
-        'fat': 0,
-        'carb': 0
+        'calories': summary.total_calorie if summary else 0,
+        'protein': summary.total_protein if summary else 0,
+        'fat': summary.total_fat if summary else 0,
+        'carb': summary.total_carb if summary else 0
     }
 
     meals = {1: [], 2: [], 3: []}  # Breakfast, Lunch, Dinner
 
-    for record in records:
-        today_nutrition['calories'] += record.total_calorie or 0
-        today_nutrition['protein'] += record.total_protein or 0
-        today_nutrition['fat'] += record.total_fat or 0
-        today_nutrition['carb'] += record.total_carb or 0
+    # 按半开时间区间取当日记录用于分餐展示，可以使用 create_time 上的索引
+    if summary and summary.record_count:
+        day_start, day_end = day_range(target_date)
+        records = DietRecord.query.filter(
+            DietRecord.user_id == current_user.id,
+            DietRecord.create_time >= day_start,
+            DietRecord.create_time < day_end
+        ).order_by(DietRecord.create_time).all()
 
-        if record.meal_type in meals:
-            meals[record.meal_type].append(record)
+        for record in records:
+            if record.meal_type in meals:
+                meals[record.meal_type].append(record)
 
     # 计算营养缺口
     nutrition_gaps = {
@@ -96,6 +101,61 @@ def index():
                            today_date=target_date.strftime('%Y-%m-%d'))
 
 
+@dashboard_bp.route('/dashboard/trends')
+@login_required
+def trends():
+    """营养摄入趋势：?from=YYYY-MM-DD&to=YYYY-MM-DD&bucket=day|week|month
+
+    from/to 为闭区间日期，默认最近30天；返回可直接用于图表的数组。
+    """
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in ('day', 'week', 'month'):
+        return jsonify({'status': 'error', 'message': 'bucket 只能是 day、week 或 month'}), 400
+
+    try:
+        to_date = datetime.strptime(request.args['to'], '%Y-%m-%d').date() \
+            if request.args.get('to') else date.today()
+        from_date = datetime.strptime(request.args['from'], '%Y-%m-%d').date() \
+            if request.args.get('from') else to_date - timedelta(days=29)
+    except ValueError:
+        return jsonify({'status': 'error', 'message': '日期格式应为 YYYY-MM-DD'}), 400
+    if from_date > to_date:
+        return jsonify({'status': 'error', 'message': '开始日期不能晚于结束日期'}), 400
+
+    # 半开区间 [from 0点, to 次日0点)，命中 (user_id, create_time) 复合索引
+    start, _ = day_range(from_date)
+    _, end = day_range(to_date)
+    label = bucket_expr(DietRecord.create_time, bucket, db.session.get_bind().dialect.name)
+
+    rows = db.session.query(
+        label,
+        func.sum(DietRecord.total_calorie),
+        func.sum(DietRecord.total_protein),
+        func.sum(DietRecord.total_fat),
+        func.sum(DietRecord.total_carb),
+        func.count(DietRecord.id)
+    ).filter(
+        DietRecord.user_id == current_user.id,
+        DietRecord.create_time >= start,
+        DietRecord.create_time < end
+    ).group_by(label).all()
+    by_label = {row[0]: row[1:] for row in rows}
+
+    series = {'labels': [], 'calories': [], 'protein': [], 'fat': [], 'carb': [], 'meals': []}
+    for bucket_time in iter_buckets(start, end, bucket):
+        key = bucket_label(bucket_time, bucket)
+        calories, protein, fat, carb, meals = by_label.get(key, (0, 0, 0, 0, 0))
+        series['labels'].append(key)
+        series['calories'].append(round(calories or 0, 1))
+        series['protein'].append(round(protein or 0, 1))
+        series['fat'].append(round(fat or 0, 1))
+        series['carb'].append(round(carb or 0, 1))
+        series['meals'].append(meals)
+
+    return jsonify(dict(series, status='success', bucket=bucket,
+                        **{'from': from_date.isoformat(), 'to': to_date.isoformat()}))
+
+
 def calculate_daily_nutrition(bmr, health_goal):
     """根据BMR和健康目标计算每日所需营养素"""
     # 基础热量需求
@@ -138,6 +198,16 @@ def calculate_daily_nutrition(bmr, health_goal):
     }
 
 
+@dashboard_bp.route('/dashboard/export/<dataset>')
+@login_required
+def export_records(dataset):
+    """导出当前用户的用餐记录（diet）或识别记录（detection），参数见 export_response"""
+    try:
+        return export_response(db.session, dataset, request.args, user_id=current_user.id)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+
 @dashboard_bp.route('/update_health_goal', methods=['POST'])
 @login_required
 def update_health_goal():
@@ -1,12 +1,21 @@
 from flask import Blueprint, render_template, request, jsonify, current_app
 from flask_login import login_required, current_user
 from datetime import datetime
-from sqlalchemy import func
+import functools
 import json
 import os
-from ultralytics import YOLO
-from app.models.record import Plate, DetectionRecord, DietRecord
-from app.models.food import NutritionFacts, Dish, DishIngredient, Ingredient
+import time
+from app.services.consumption import latest_consumption, scale_to_weight
+from app.services.daily_rollup import apply_diet_record
+from app.services.detection import detect_and_record
+from app.services.detect_jobs import get_job_manager
+from app.services.image_pipeline import decode_upload, get_persist_executor
+from app.services.inference_batcher import InferenceQueueFull
+from app.services.nutrition_engine import nutrition_engine
+from app.services.result_cache import dhash
+from app.services.upload_store import get_upload_store
+from app.models.record import DietRecord
+from app.models.food import Dish, DishNutrition
 from app import db
 
 # 创建蓝图
@@ -28,58 +37,21 @@ def index():
 @login_required
 def dish_library():
     """菜品库页面"""
-    # 获取所有菜品，按名称排序
-    dishes = Dish.query.order_by(Dish.name).all()
+    # 每100g营养成分已预先计算，一条查询取出全部菜品及其营养信息
+    rows = db.session.query(Dish, DishNutrition).outerjoin(
+        DishNutrition, DishNutrition.dish_id == Dish.dish_id
+    ).order_by(Dish.name).all()
 
-    # 为每个菜品计算营养信息
     dish_info = []
-    for dish in dishes:
-        # 获取菜品的配料
-        recipe_items = DishIngredient.query.filter_by(
-            dish_id=dish.dish_id).all()
-
-        # 计算每100g的营养成分
+    for dish, nutrition in rows:
+        # 四舍五入保留1位小数
         nutrition_per_100g = {
-            'calories': 0.0,
-            'protein': 0.0,
-            'fat': 0.0,
-            'carb': 0.0
+            'calories': round(nutrition.calories, 1) if nutrition else 0.0,
+            'protein': round(nutrition.protein, 1) if nutrition else 0.0,
+            'fat': round(nutrition.fat, 1) if nutrition else 0.0,
+            'carb': round(nutrition.carb, 1) if nutrition else 0.0
         }
 
-        if recipe_items:
-            # 计算配方总重量
-            recipe_total_weight = sum(item.amount_g for item in recipe_items)
-
-            if recipe_total_weight > 0:
-                # 计算每100g的营养成分
-                for item in recipe_items:
-                    ingredient = Ingredient.query.get(item.ingredient_id)
-                    nutrition = NutritionFacts.query.get(item.ingredient_id)
-
-                    if ingredient and nutrition:
-                        # 计算该配料在100g菜品中的重量
-                        weight_in_100g = (
-                            item.amount_g / recipe_total_weight) * 100
-
-                        # 计算营养成分（按100g计）
-                        nutrition_per_100g['calories'] += (
-                            nutrition.energy_kcal / 100) * weight_in_100g
-                        nutrition_per_100g['protein'] += (
-                            nutrition.protein_g / 100) * weight_in_100g
-                        nutrition_per_100g['fat'] += (
-                            nutrition.fat_g / 100) * weight_in_100g
-                        nutrition_per_100g['carb'] += (
-                            nutrition.carb_g / 100) * weight_in_100g
-
-                # 四舍五入保留1位小数
-                nutrition_per_100g['calories'] = round(
-                    nutrition_per_100g['calories'], 1)
-                nutrition_per_100g['protein'] = round(
-                    nutrition_per_100g['protein'], 1)
-                nutrition_per_100g['fat'] = round(nutrition_per_100g['fat'], 1)
-                nutrition_per_100g['carb'] = round(
-                    nutrition_per_100g['carb'], 1)
-
         dish_info.append({
             'dish': dish,
             'nutrition': nutrition_per_100g
@@ -101,7 +73,8 @@ def delete_record(record_id):
         if not record:
             return jsonify({'status': 'error', 'message': '记录不存在或无权限删除'})
 
-        # 删除记录
+        # 删除记录，并在同一事务内从当日汇总中扣除
+        apply_diet_record(db.session, record, sign=-1)
         db.session.delete(record)
         db.session.commit()
 
@@ -122,51 +95,64 @@ def detect_dish():
     if file.filename == '':
         return jsonify({'status': 'error', 'message': '未选择文件'})
 
-    upload_dir = os.path.join(current_app.static_folder, 'uploads')
-    os.makedirs(upload_dir, exist_ok=True)
-    filename = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename.replace(' ', '_')}"
-    save_path = os.path.join(upload_dir, filename)
+    # 使用独立推理服务时模型文件由服务端负责
+    model_path = current_app.config['YOLO_MODEL_PATH']
+    if not current_app.config['INFERENCE_SERVICE_ADDRESS'] and not os.path.exists(model_path):
+        return jsonify({
+            'status': 'error',
+            'message': f'模型文件不存在：{model_path}'
+        })
 
+    app = current_app._get_current_object()
+
+    # 在内存中解码并缩放到模型输入尺寸，推理不再经过磁盘
     try:
-        from PIL import Image
-        img = Image.open(file)
-        img = img.convert('RGB')
-        img.save(save_path, format='JPEG')
+        upload = decode_upload(file, app.config['YOLO_IMGSZ'])
     except Exception:
-        file.save(save_path)
-
-    image_url = f"/static/uploads/{filename}"
+        return jsonify({'status': 'error', 'message': '无法解析图片，请上传有效的图片文件'})
+    timings = upload.timings
+
+    # 感知哈希用于命中重拍/重复上传的识别结果缓存
+    image_hash = dhash(upload.image) if app.config['DETECT_CACHE_ENABLED'] else None
+
+    # 按内容哈希保存原图和/或缩略图：相同图片只存一份，写入默认在后台线程完成
+    image_url = None
+    image_key = None
+    persist_mode = app.config['DETECT_PERSIST']
+    if persist_mode in ('original', 'thumbnail'):
+        start = time.perf_counter()
+        store = get_upload_store(app)
+        image_key = store.make_key(upload.data, upload.format)
+        if persist_mode == 'original':
+            persist = functools.partial(store.put, image_key, upload.data, upload.image)
+            image_url = store.original_url(image_key)
+        else:
+            persist = functools.partial(store.put, image_key, None, upload.image)
+            image_url = store.thumb_url(image_key)
+        if app.config['DETECT_PERSIST_ASYNC']:
+            get_persist_executor(app).submit(persist)
+        else:
+            persist()
+        timings['persist_ms'] = round((time.perf_counter() - start) * 1000, 2)
+
+    # 异步模式：立即返回任务ID，识别与记录写入在后台线程完成
+    if request.args.get('async') == '1':
+        # 任务持有耗时的副本，后台线程写入自己的副本，避免序列化时字典被并发修改
+        detect = functools.partial(detect_and_record, image_hash=image_hash, image_key=image_key)
+        job = get_job_manager(app).submit(
+            current_user.id, detect, app, upload.array, current_user.id,
+            image_url=image_url, timings=timings)
+        return jsonify(job.to_dict()), 202
 
-    model_path = os.path.join(current_app.static_folder, 'best.pt')
-    if not os.path.exists(model_path):
+    try:
+        # 并发请求由调度器合并为批量推理，模型在进程内只加载一次
+        detected_items = detect_and_record(app, upload.array, current_user.id, timings, image_hash, image_key)
+    except InferenceQueueFull:
         return jsonify({
             'status': 'error',
-            'message': f'模型文件不存在：{model_path}',
+            'message': '识别服务繁忙，请稍后重试',
             'image_url': image_url
         })
-
-    try:
-        model = YOLO(model_path)
-        results = model(save_path, conf=0.3)
-        detected_items = []
-
-        for box in results[0].boxes:
-            cls_id = int(box.cls[0])
-            conf = round(float(box.conf[0]), 2)
-            class_name = model.names[cls_id]
-
-            target_name = class_name.strip().lower()
-            dish = Dish.query.filter(
-                func.lower(func.trim(Dish.name)) == target_name
-            ).first()
-
-            detected_items.append({
-                'dish_name': class_name,
-                'confidence': conf,
-                'weight': 100,
-                'has_db_data': True if dish else False
-            })
-
     except Exception as e:
         return jsonify({
             'status': 'error',
@@ -174,21 +160,36 @@ def detect_dish():
             'image_url': image_url
         })
 
-    new_record = DetectionRecord(
-        user_id=current_user.id,
-        detected_objects=json.dumps(detected_items),
-        detect_time=datetime.now()
-    )
-    db.session.add(new_record)
-    db.session.commit()
-
     return jsonify({
         'status': 'success',
         'results': detected_items,
-        'image_url': image_url
+        'image_url': image_url,
+        'timings': timings
     })
 
 
+# ====================== 识别任务查询接口 ======================
+@meal_track_bp.route('/detect_jobs/<job_id>')
+@login_required
+def detect_job_status(job_id):
+    """查询异步识别任务；传入 wait 参数（秒）时最多等待 DETECT_JOB_MAX_WAIT 秒直到任务结束
+
+    任务只保存在提交它的进程中，多进程部署需要会话粘滞，否则查询会落到其它进程而返回 404。
+    """
+    job = get_job_manager(current_app).get(job_id, user_id=current_user.id)
+    if not job:
+        return jsonify({
+            'status': 'error',
+            'message': '任务不存在或已过期（任务只能在提交它的服务进程中查询），请重新识别'
+        }), 404
+
+    wait = request.args.get('wait', 0, type=float)
+    if wait > 0 and not job.finished:
+        job.wait(min(wait, current_app.config['DETECT_JOB_MAX_WAIT']))
+
+    return jsonify(job.to_dict())
+
+
 # ====================== 营养计算接口（核心修复） ======================
 @meal_track_bp.route('/calculate_nutrition', methods=['POST'])
 # @login_required
@@ -196,86 +197,53 @@ def calculate_nutrition():
     data = request.get_json()
     dishes = data.get('dishes', [])
 
-    total_nutrition = {
-        'calories': 0.0,
-        'protein': 0.0,
-        'fat': 0.0,
-        'carb': 0.0
-    }
-    dish_details = []
-
-    for dish_input in dishes:
-        dish_name = dish_input.get('dish_name', '')
-        actual_weight = float(dish_input.get('weight', 0))
-
-        single_dish = {
-            'dish_name': dish_name,
-            'calories': 0.0,
-            'protein': 0.0,
-            'fat': 0.0,
-            'carb': 0.0,
-            'weight': actual_weight
-        }
-
-        target_name = dish_name.strip().lower()
-        dish = Dish.query.filter(
-            func.lower(func.trim(Dish.name)) == target_name
-        ).first()
-
-        if not dish:
-            dish_details.append(single_dish)
-            continue
-
-        recipe_items = DishIngredient.query.filter_by(
-            dish_id=dish.dish_id).all()
-        if not recipe_items:
-            dish_details.append(single_dish)
-            continue
-
-        recipe_total_weight = sum(item.amount_g for item in recipe_items)
-        if recipe_total_weight <= 0:
-            dish_details.append(single_dish)
-            continue
-
-        scale_ratio = actual_weight / recipe_total_weight
+    # use_plate：按智能餐盘估计的进食量重新分配各菜品重量（需要登录）
+    consumed_weight = None
+    if data.get('use_plate') and dishes and current_user.is_authenticated:
+        consumption = latest_consumption(db.session, current_user.id)
+        if consumption is not None:
+            consumed_weight = consumption[1]
+            dishes = scale_to_weight(dishes, consumed_weight)
 
-        for item in recipe_items:
-            ingredient = Ingredient.query.get(item.ingredient_id)
-            nutrition = NutritionFacts.query.get(item.ingredient_id)
+    # 每克营养含量矩阵常驻内存，热路径上不访问数据库
+    total_nutrition, dish_details = nutrition_engine.calculate(
+        db.session, dishes, ttl=current_app.config['NUTRITION_ENGINE_TTL'])
 
-            if not ingredient or not nutrition:
-                continue
-
-            actual_ing_weight = item.amount_g * scale_ratio
-            factor = actual_ing_weight / 100
-
-            single_dish['calories'] += nutrition.energy_kcal * factor
-            single_dish['protein'] += nutrition.protein_g * factor
-            single_dish['fat'] += nutrition.fat_g * factor
-            single_dish['carb'] += nutrition.carb_g * factor
+    response = {
+        'status': 'success',
+        'total': total_nutrition,
+        'details': dish_details
+    }
+    if consumed_weight is not None:
+        response['consumed_weight'] = consumed_weight
+    return jsonify(response)
 
-        # 四舍五入保留1位小数
-        single_dish['calories'] = round(single_dish['calories'], 1)
-        single_dish['protein'] = round(single_dish['protein'], 1)
-        single_dish['fat'] = round(single_dish['fat'], 1)
-        single_dish['carb'] = round(single_dish['carb'], 1)
 
-        total_nutrition['calories'] += single_dish['calories']
-        total_nutrition['protein'] += single_dish['protein']
-        total_nutrition['fat'] += single_dish['fat']
-        total_nutrition['carb'] += single_dish['carb']
+# ====================== 批量营养计算接口 ======================
+@meal_track_bp.route('/calculate_nutrition_batch', methods=['POST'])
+def calculate_nutrition_batch():
+    """一次计算多餐的营养：{"meals": [{"id": ..., "dishes": [...]}, ...]}"""
+    data = request.get_json(silent=True) or {}
+    meals = data.get('meals', [])
 
-        dish_details.append(single_dish)
+    if not isinstance(meals, list):
+        return jsonify({'status': 'error', 'message': 'meals 必须是列表'}), 400
+    if len(meals) > current_app.config['NUTRITION_BATCH_MAX_MEALS']:
+        return jsonify({'status': 'error', 'message': '单次请求的餐数过多'}), 400
 
-    total_nutrition['calories'] = round(total_nutrition['calories'], 1)
-    total_nutrition['protein'] = round(total_nutrition['protein'], 1)
-    total_nutrition['fat'] = round(total_nutrition['fat'], 1)
-    total_nutrition['carb'] = round(total_nutrition['carb'], 1)
+    try:
+        results = nutrition_engine.calculate_many(
+            db.session, [meal.get('dishes', []) for meal in meals],
+            ttl=current_app.config['NUTRITION_ENGINE_TTL'])
+    except (AttributeError, TypeError, ValueError):
+        return jsonify({'status': 'error', 'message': '请求数据格式错误'}), 400
 
     return jsonify({
         'status': 'success',
-        'total': total_nutrition,
-        'details': dish_details
+        'results': [
+            {'id': meal.get('id', index), 'total': total, 'details': details}
+            for index, (meal, (total, details)) in enumerate(zip(meals, results))
+        ]
     })
 
 
@@ -300,6 +268,8 @@ def save_meal_record():
     )
 
     db.session.add(new_record)
+    # 在同一事务内计入当日汇总
+    apply_diet_record(db.session, new_record, sign=1)
     db.session.commit()
 
     return jsonify({'status': 'success', 'message': '记录保存成功'})
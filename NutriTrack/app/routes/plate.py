@@ -0,0 +1,75 @@
+from flask import Blueprint, request, jsonify, current_app
+from functools import wraps
+import hmac
+from app import db
+from app.services.weight_ingest import IngestBackpressure, get_weight_ingestor
+
+# 创建蓝图
+plate_bp = Blueprint('plate', __name__, url_prefix='/plate')
+
+
+def plate_token_required(f):
+    """智能餐盘接口使用共享令牌认证：Authorization: Bearer <PLATE_INGEST_TOKEN>"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        token = current_app.config.get('PLATE_INGEST_TOKEN')
+        if not token:
+            return jsonify({'status': 'error', 'message': '未启用餐盘数据接口'}), 403
+        auth = request.headers.get('Authorization', '')
+        supplied = auth[7:] if auth.startswith('Bearer ') else ''
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            return jsonify({'status': 'error', 'message': '令牌无效'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+# ====================== 重量采样上报 ======================
+@plate_bp.route('/samples', methods=['POST'])
+@plate_token_required
+def ingest_samples():
+    """批量上报重量采样
+
+    请求体：{"plates": [{"plate_id": "P001", "samples": [[ts_ms, weight_g], ...]}, ...]}
+    数据进入内存缓冲后立即返回 202，由后台线程批量写入；缓冲区满时返回 429。
+    """
+    data = request.get_json(silent=True) or {}
+    plates = data.get('plates')
+    if not isinstance(plates, list):
+        return jsonify({'status': 'error', 'message': 'plates 必须是列表'}), 400
+
+    samples = []
+    try:
+        for entry in plates:
+            plate_id = str(entry['plate_id'])
+            for ts, weight in entry['samples']:
+                samples.append((plate_id, int(ts), float(weight)))
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'status': 'error', 'message': '采样格式应为 [时间戳(毫秒), 重量(克)]'}), 400
+    if len(samples) > current_app.config['PLATE_INGEST_MAX_SAMPLES']:
+        return jsonify({'status': 'error', 'message': '单次上报的采样过多'}), 413
+
+    ingestor = get_weight_ingestor(current_app._get_current_object())
+    plate_ids = {plate_id for plate_id, _, _ in samples}
+    known = ingestor.known_plates(db.session, plate_ids)
+    if known != plate_ids:
+        samples = [sample for sample in samples if sample[0] in known]
+
+    try:
+        ingestor.offer(samples)
+    except IngestBackpressure as e:
+        response = jsonify({'status': 'error', 'message': str(e)})
+        response.headers['Retry-After'] = '1'
+        return response, 429
+
+    return jsonify({
+        'status': 'success',
+        'accepted': len(samples),
+        'unknown_plates': sorted(plate_ids - known)
+    }), 202
+
+
+@plate_bp.route('/ingest_stats')
+@plate_token_required
+def ingest_stats():
+    """当前进程的采样缓冲与写入状态（含写入延迟）"""
+    return jsonify(get_weight_ingestor(current_app._get_current_object()).stats())
@@ -0,0 +1,292 @@
+# app/services/consumption.py - 根据餐盘重量流在线估计进食量
+
+import threading
+import time
+
+from sqlalchemy import bindparam, func, update
+
+from app import db
+from app.models.record import DetectionRecord, Plate
+
+_records = DetectionRecord.__table__
+
+
+class PlateEstimator:
+    """单个餐盘的在线估计器，每个采样 O(1) 时间、固定大小的状态
+
+    - 指数滑动平均滤除称重噪声，读数连续 settle_samples 次贴近平均值视为稳定；
+    - 读数跌到 empty_weight 以下视为餐盘被抬起，期间的读数忽略，放回后重新滤波；
+      抬起超过 lift_timeout_ms 仍未放回则按清空处理；
+    - 稳定重量每下降一次计入进食量，上升（加菜）计入取餐量。
+    """
+
+    __slots__ = ('alpha', 'noise', 'settle_samples', 'min_change', 'empty_weight', 'lift_timeout_ms',
+                 'ema', 'stable', 'level', 'last_ts', 'lifted_since',
+                 'record_id', 'served', 'added', 'consumed', 'lifts', 'dirty')
+
+    def __init__(self, alpha=0.3, noise=3.0, settle_samples=5, min_change=2.0,
+                 empty_weight=5.0, lift_timeout_ms=10000):
+        self.alpha = alpha
+        self.noise = noise
+        self.settle_samples = settle_samples
+        self.min_change = min_change
+        self.empty_weight = empty_weight
+        self.lift_timeout_ms = lift_timeout_ms
+
+        self.ema = None           # 滤波后的重量
+        self.stable = 0           # 连续稳定的采样数
+        self.level = None         # 最近一次确认的稳定重量
+        self.last_ts = None
+        self.lifted_since = None  # 抬起开始时间
+
+        self.record_id = None     # 当前这一餐对应的识别记录
+        self.served = None        # 开始时的稳定重量
+        self.added = 0.0
+        self.consumed = 0.0
+        self.lifts = 0
+        self.dirty = False
+
+    def start_meal(self, record_id):
+        """开始新的一餐：以当前稳定重量为取餐量起点
+
+        此时还没有任何进食量的观测，不标记为待写回；第一次稳定重量变化后才写入记录，
+        避免新记录在刚识别完时就被写成进食量 0。
+        """
+        self.record_id = record_id
+        self.served = self.level
+        self.added = 0.0
+        self.consumed = 0.0
+        self.lifts = 0
+        self.dirty = False
+
+    def update(self, ts, weight):
+        if self.last_ts is not None and ts <= self.last_ts:
+            return  # 重复或乱序的采样
+        self.last_ts = ts
+
+        if weight < self.empty_weight and self.level is not None and self.level >= self.empty_weight:
+            if self.lifted_since is None:
+                self.lifted_since = ts
+                self.lifts += 1
+            if ts - self.lifted_since < self.lift_timeout_ms:
+                self.stable = 0
+                return
+        elif self.lifted_since is not None:
+            # 放回：丢弃抬起前后的过渡读数，从新读数开始滤波
+            self.lifted_since = None
+            self.ema = weight
+            self.stable = 0
+            return
+
+        ema = weight if self.ema is None else self.ema + self.alpha * (weight - self.ema)
+        self.ema = ema
+        self.stable = self.stable + 1 if abs(weight - ema) <= self.noise else 0
+        if self.stable < self.settle_samples:
+            return
+
+        if self.level is None:
+            self.level = ema
+        elif abs(ema - self.level) >= self.min_change:
+            delta = ema - self.level
+            if delta < 0:
+                self.consumed -= delta
+            else:
+                self.added += delta
+            self.level = ema
+        else:
+            return
+        if self.served is None:
+            self.served = self.level
+        self.dirty = True
+
+    def estimate(self):
+        return {
+            'served_weight': round((self.served or 0.0) + self.added, 1),
+            'consumed_weight': round(self.consumed, 1),
+            'remaining_weight': round(self.level, 1) if self.level is not None else None,
+            'lifts': self.lifts
+        }
+
+
+class ConsumptionTracker:
+    """所有餐盘的估计器，调用 feed() 输入已写入数据库的采样
+
+    每个餐盘最新的识别记录即当前这一餐：记录变化时估计器重新开始计数，
+    估计结果合并为一次批量 UPDATE 写回识别记录。识别请求与采样写入可以在不同进程中。
+
+    估计器的状态在进程内存中，同一餐盘的采样必须全部交给同一个 tracker，
+    否则多个进程会对同一条记录写入互相矛盾的结果：
+    - CONSUMPTION_TRACKING = 'inline'：由接收采样的 Web 进程在写入后直接估计，
+      仅适用于只有一个进程接收 /plate/samples 的部署；
+    - CONSUMPTION_TRACKING = 'worker'：Web 进程只负责写入，由单独运行的
+      flask track-consumption 按 id 顺序读取新采样并估计（多 worker 部署使用）。
+    """
+
+    def __init__(self, app, **params):
+        self.app = app
+        self.params = params
+        self._plates = {}
+        self._lock = threading.Lock()
+
+    def feed(self, samples):
+        plate_ids = {plate_id for plate_id, _, _ in samples}
+        with self.app.app_context():
+            current = dict(
+                db.session.query(DetectionRecord.plate_id, func.max(DetectionRecord.id))
+                .filter(DetectionRecord.plate_id.in_(plate_ids))
+                .group_by(DetectionRecord.plate_id)
+            )
+
+            with self._lock:
+                for plate_id, ts, weight in samples:
+                    estimator = self._plates.get(plate_id)
+                    if estimator is None:
+                        estimator = self._plates[plate_id] = PlateEstimator(**self.params)
+                    record_id = current.get(plate_id)
+                    if record_id is not None and record_id != estimator.record_id:
+                        estimator.start_meal(record_id)
+                    estimator.update(ts, weight)
+
+                changes = []
+                for plate_id in plate_ids:
+                    estimator = self._plates[plate_id]
+                    if estimator.dirty and estimator.record_id is not None:
+                        estimate = estimator.estimate()
+                        changes.append({'b_id': estimator.record_id,
+                                        'b_served': estimate['served_weight'],
+                                        'b_consumed': estimate['consumed_weight']})
+                        estimator.dirty = False
+
+            if changes:
+                db.session.execute(
+                    update(_records).where(_records.c.id == bindparam('b_id'))
+                    .values(served_weight=bindparam('b_served'), consumed_weight=bindparam('b_consumed')),
+                    changes
+                )
+                db.session.commit()
+
+    def estimate(self, plate_id):
+        with self._lock:
+            estimator = self._plates.get(plate_id)
+            return estimator.estimate() if estimator is not None else None
+
+
+class SampleFollower:
+    """按 id 顺序读取新写入的采样，容忍多个写入进程乱序提交
+
+    多个写入进程并发时，较小的 id 可能晚于较大的 id 提交。读到的 id 出现空洞时，
+    空洞之后的采样先暂存，等空洞被补上或等待超过 commit_lag 秒（事务回滚、自增跳号）
+    后再按 id 顺序交出，因此晚提交的采样不会被跳过；超过 commit_lag 才提交的采样会被忽略。
+    """
+
+    def __init__(self, after_id, commit_lag=5.0, batch_size=5000):
+        self.after_id = after_id   # 不大于该 id 的采样都已交出或放弃
+        self.commit_lag = commit_lag
+        self.batch_size = batch_size
+        self._held = {}            # id -> (plate_id, ts, weight)，等待前面的空洞
+        self._blocked_since = None
+        self.backlog = False
+
+    def poll(self, session, now=None):
+        """读取一批新采样，返回可以交给 tracker 的 [(plate_id, ts, weight)]（按 id 顺序）"""
+        from app.models.record import PlateWeightSample
+
+        now = time.monotonic() if now is None else now
+        # 已暂存的采样会再次读到，放宽 LIMIT 使每次至少能读到 batch_size 条新采样
+        limit = self.batch_size + len(self._held)
+        rows = session.query(PlateWeightSample.id, PlateWeightSample.plate_id,
+                             PlateWeightSample.ts, PlateWeightSample.weight) \
+            .filter(PlateWeightSample.id > self.after_id) \
+            .order_by(PlateWeightSample.id).limit(limit).all()
+        for sample_id, plate_id, ts, weight in rows:
+            self._held.setdefault(sample_id, (plate_id, ts, weight))
+        self.backlog = len(rows) >= limit  # 还有没读完的采样，不必等待下一轮
+
+        ready = []
+        held = self._held
+        while held:
+            next_id = self.after_id + 1
+            if next_id in held:
+                ready.append(held.pop(next_id))
+                self.after_id = next_id
+                self._blocked_since = None
+                continue
+            if self._blocked_since is None:
+                self._blocked_since = now
+            if now - self._blocked_since < self.commit_lag:
+                break
+            # 空洞等待超时：视为回滚或跳号，直接跳到下一条已读到的采样
+            self.after_id = min(held) - 1
+            self._blocked_since = None
+        return ready
+
+
+def follow_samples(app, tracker, after_id=None, batch_size=5000, poll_interval=1.0, commit_lag=5.0, stop=None):
+    """持续读取新写入的采样交给 tracker，作为全部餐盘唯一的估计者（见 SampleFollower）
+
+    after_id 为 None 时从当前最大 id 之后开始；stop 为 threading.Event 时可用于结束循环。
+    """
+    from app.models.record import PlateWeightSample
+
+    with app.app_context():
+        if after_id is None:
+            after_id = db.session.query(func.max(PlateWeightSample.id)).scalar() or 0
+        db.session.remove()
+
+    follower = SampleFollower(after_id, commit_lag=commit_lag, batch_size=batch_size)
+    while stop is None or not stop.is_set():
+        with app.app_context():
+            samples = follower.poll(db.session)
+            db.session.remove()
+        if samples:
+            # 同一餐盘的采样按时间排序后输入，批量写入时不同餐盘的 id 可能交错
+            tracker.feed(sorted(samples, key=lambda sample: (sample[0], sample[1])))
+        if not follower.backlog:
+            if stop is not None:
+                stop.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+    return follower.after_id
+
+
+def latest_consumption(session, user_id):
+    """用户当前绑定餐盘上最近一次识别记录的 (取餐量, 进食量)
+
+    还没有观测到进食（进食量未写入或为 0）时返回 None，调用方应保留原有重量。
+    """
+    row = session.query(DetectionRecord.served_weight, DetectionRecord.consumed_weight) \
+        .join(Plate, Plate.plate_id == DetectionRecord.plate_id) \
+        .filter(Plate.user_id == user_id, Plate.bind_status == 1, DetectionRecord.user_id == user_id) \
+        .order_by(DetectionRecord.id.desc()).first()
+    if row is None or not row.consumed_weight or row.consumed_weight <= 0:
+        return None
+    return row.served_weight, row.consumed_weight
+
+
+def scale_to_weight(dishes, total_weight):
+    """按各菜品重量的比例把 total_weight 分配到菜品（重量全为 0 时平均分配）"""
+    weights = [float(dish.get('weight', 0)) for dish in dishes]
+    total = sum(weights)
+    scaled = []
+    for dish, weight in zip(dishes, weights):
+        share = weight / total if total > 0 else 1 / len(dishes)
+        scaled.append(dict(dish, weight=round(total_weight * share, 1)))
+    return scaled
+
+
+def get_consumption_tracker(app):
+    """获取应用对应的进食量估计（每个进程一个）"""
+    tracker = app.extensions.get('consumption_tracker')
+    if tracker is None:
+        config = app.config
+        tracker = ConsumptionTracker(
+            app,
+            alpha=config['CONSUMPTION_EMA_ALPHA'],
+            noise=config['CONSUMPTION_NOISE_G'],
+            settle_samples=config['CONSUMPTION_SETTLE_SAMPLES'],
+            min_change=config['CONSUMPTION_MIN_CHANGE_G'],
+            empty_weight=config['CONSUMPTION_EMPTY_G'],
+            lift_timeout_ms=config['CONSUMPTION_LIFT_TIMEOUT_MS']
+        )
+        tracker = app.extensions.setdefault('consumption_tracker', tracker)
+    return tracker
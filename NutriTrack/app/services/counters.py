@@ -0,0 +1,261 @@
+# app/services/counters.py - 管理后台计数器
+
+import atexit
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func, inspect, select, update
+from sqlalchemy.orm import Session, object_session
+
+from app.models.counter import SystemCounter
+from app.models.record import DetectionRecord
+from app.models.user import User
+
+# 计数器名称 -> 实际数量的查询（用于校准）
+COUNTER_QUERIES = {
+    'users_total': lambda session: session.query(func.count(User.id)).scalar(),
+    'users_active': lambda session: session.query(func.count(User.id)).filter(User.status == 1).scalar(),
+    'users_admin': lambda session: session.query(func.count(User.id)).filter(User.is_admin == 1).scalar(),
+    'detections_total': lambda session: session.query(func.count(DetectionRecord.id)).scalar()
+}
+
+_counters = SystemCounter.__table__
+
+
+class _PendingDeltas:
+    """已提交但尚未写入 counters 表的增量，按数据库引擎累计
+
+    写入事务只在 session.info 中记下增量，提交成功后连同提交时间并入这里，由后台线程每
+    flush_interval 秒用一个独立的短事务写回；热点计数行不再出现在业务事务里，
+    识别记录等写入不会因为同一行的行锁而串行。进程异常退出时未写回的增量会丢失，
+    由定期校准修正。
+
+    写回时跳过提交时间早于该计数器 reconciled_at 的增量：它们已经包含在校准时的 COUNT 中，
+    其它进程做的校准也不会被重复计入。提交时间取各进程的本地时钟，各服务器需要时钟同步。
+    """
+
+    def __init__(self):
+        self._deltas = {}  # engine -> [(提交时间, {name: delta})]
+        self._lock = threading.Lock()
+        self._thread = None
+        self.flush_interval = 2.0
+
+    def add(self, engine, deltas, committed_at=None):
+        entry = (committed_at or datetime.now(), dict(deltas))
+        with self._lock:
+            self._deltas.setdefault(engine, []).append(entry)
+        self._ensure_worker()
+
+    def take(self, engine=None):
+        """取出并清空增量；engine 为 None 时取出全部引擎的增量"""
+        with self._lock:
+            if engine is None:
+                taken, self._deltas = self._deltas, {}
+                return taken
+            return {engine: self._deltas.pop(engine, [])}
+
+    def flush(self, engine=None):
+        """把累计的增量写回 counters 表，每个引擎一个短事务；失败的增量放回下次重试"""
+        error = None
+        for target, entries in self.take(engine).items():
+            if not entries:
+                continue
+            try:
+                with target.begin() as connection:
+                    # 锁住计数行，写回期间校准不会改变 reconciled_at
+                    reconciled = dict(connection.execute(
+                        select(_counters.c.name, _counters.c.reconciled_at).with_for_update()).all())
+                    totals = {}
+                    for committed_at, deltas in entries:
+                        for name, delta in deltas.items():
+                            reconciled_at = reconciled.get(name)
+                            if reconciled_at is not None and committed_at < reconciled_at:
+                                continue  # 已包含在校准结果中
+                            totals[name] = totals.get(name, 0) + delta
+                    for name, delta in totals.items():
+                        if delta:
+                            connection.execute(
+                                update(_counters).where(_counters.c.name == name)
+                                .values(value=_counters.c.value + delta)
+                            )
+            except Exception as e:
+                with self._lock:
+                    self._deltas[target] = entries + self._deltas.get(target, [])
+                error = error or e
+        if error is not None:
+            raise error
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='counter-flush', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                pass  # 数据库暂时不可用时保留增量，下一轮重试
+
+
+pending_deltas = _PendingDeltas()
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        pending_deltas.flush()
+    except Exception:
+        pass
+
+
+def _bump(connection, deltas, target):
+    """把增量记到触发写入的会话上，提交成功后才计入，回滚时丢弃"""
+    session = object_session(target)
+    if session is None:
+        return
+    pending = session.info.setdefault('counter_deltas', {})
+    for name, delta in deltas.items():
+        if delta:
+            pending[name] = pending.get(name, 0) + delta
+
+
+@event.listens_for(Session, 'after_commit')
+def _deltas_committed(session):
+    deltas = session.info.pop('counter_deltas', None)
+    if deltas:
+        pending_deltas.add(session.get_bind(), deltas)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _deltas_rolled_back(session):
+    session.info.pop('counter_deltas', None)
+
+
+def flush_pending_counters(engine=None):
+    """立即写回本进程累计的计数增量（测试、命令行与进程退出时使用）"""
+    pending_deltas.flush(engine)
+
+
+def _user_flags(status, is_admin):
+    # 与模型默认值一致：status 默认 1（启用），is_admin 默认 0
+    active = 1 if (status if status is not None else 1) == 1 else 0
+    admin = 1 if is_admin == 1 else 0
+    return active, admin
+
+
+# ====================== 增量维护 ======================
+@event.listens_for(User, 'after_insert')
+def _user_inserted(mapper, connection, target):
+    active, admin = _user_flags(target.status, target.is_admin)
+    _bump(connection, {'users_total': 1, 'users_active': active, 'users_admin': admin}, target)
+
+
+@event.listens_for(User, 'after_delete')
+def _user_deleted(mapper, connection, target):
+    active, admin = _user_flags(target.status, target.is_admin)
+    _bump(connection, {'users_total': -1, 'users_active': -active, 'users_admin': -admin}, target)
+
+
+# 属性过期（例如提交之后）时直接赋值不会加载旧值；active_history 让赋值前先取回旧值，
+# after_update 中才能从 history 得知状态变化前的取值
+@event.listens_for(User.status, 'set', active_history=True)
+@event.listens_for(User.is_admin, 'set', active_history=True)
+def _load_previous_value(target, value, oldvalue, initiator):
+    return value
+
+
+@event.listens_for(User, 'after_update')
+def _user_updated(mapper, connection, target):
+    state = inspect(target)
+    status_history = state.attrs.status.history
+    admin_history = state.attrs.is_admin.history
+    if not (status_history.has_changes() or admin_history.has_changes()):
+        return
+
+    old_status = status_history.deleted[0] if status_history.deleted else target.status
+    old_admin = admin_history.deleted[0] if admin_history.deleted else target.is_admin
+    old_active, old_is_admin = _user_flags(old_status, old_admin)
+    new_active, new_is_admin = _user_flags(target.status, target.is_admin)
+    _bump(connection, {'users_active': new_active - old_active, 'users_admin': new_is_admin - old_is_admin},
+          target)
+
+
+@event.listens_for(DetectionRecord, 'after_insert')
+def _detection_inserted(mapper, connection, target):
+    _bump(connection, {'detections_total': 1}, target)
+
+
+@event.listens_for(DetectionRecord, 'after_delete')
+def _detection_deleted(mapper, connection, target):
+    _bump(connection, {'detections_total': -1}, target)
+
+
+# ====================== 校准与读取 ======================
+def reconcile_counters(session):
+    """用实际 COUNT 校准全部计数器（不存在的计数器会被创建），返回校准后的值
+
+    reconciled_at 取开始计数之前的时间：各进程中在此之前提交、尚未写回的增量已经包含在
+    COUNT 结果里，写回时按提交时间跳过（见 _PendingDeltas）。计数期间提交的少量写入
+    可能被重复计入，由下一次校准修正。
+    """
+    now = datetime.now()
+    values = {}
+    for name, query in COUNTER_QUERIES.items():
+        values[name] = query(session) or 0
+        session.merge(SystemCounter(name=name, value=values[name], reconciled_at=now))
+    return values
+
+
+class CounterReader:
+    """从内存读取计数器：每 ttl 秒从 counters 表刷新一次，
+    超过 reconcile_interval 秒未校准时先执行一次校准"""
+
+    def __init__(self, ttl=10, reconcile_interval=3600):
+        self.ttl = ttl
+        self.reconcile_interval = reconcile_interval
+        self._values = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._values = None
+
+    def get_all(self, session):
+        values = self._values
+        if values is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return values
+
+        with self._lock:
+            if self._values is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return self._values
+
+            # 使用独立的会话：读取路径不能提交（或回滚）调用方的会话
+            with Session(bind=session.get_bind()) as own:
+                rows = own.query(SystemCounter).all()
+                stale_before = datetime.now() - timedelta(seconds=self.reconcile_interval)
+                if (len(rows) < len(COUNTER_QUERIES)
+                        or any(row.reconciled_at is None or row.reconciled_at < stale_before for row in rows)):
+                    values = reconcile_counters(own)
+                    own.commit()
+                else:
+                    values = {row.name: row.value for row in rows}
+
+            self._values = values
+            self._loaded_at = time.monotonic()
+            return values
+
+
+def get_counter_reader(app):
+    """获取应用对应的计数器读取器（每个进程一个）"""
+    reader = app.extensions.get('counter_reader')
+    if reader is None:
+        reader = CounterReader(ttl=app.config['COUNTER_CACHE_TTL'],
+                               reconcile_interval=app.config['COUNTER_RECONCILE_INTERVAL'])
+        reader = app.extensions.setdefault('counter_reader', reader)
+    return reader
@@ -0,0 +1,122 @@
+# app/services/daily_rollup.py - 每日营养汇总的增量维护与重建
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import case, func
+from sqlalchemy.exc import IntegrityError
+
+from app.models.record import DailyNutrition, DietRecord
+
+# meal_type -> 计数列
+MEAL_COUNT_COLUMNS = {
+    1: 'breakfast_count',
+    2: 'lunch_count',
+    3: 'dinner_count'
+}
+
+
+def _deltas(record, sign):
+    values = {
+        'total_calorie': sign * (record.total_calorie or 0),
+        'total_protein': sign * (record.total_protein or 0),
+        'total_fat': sign * (record.total_fat or 0),
+        'total_carb': sign * (record.total_carb or 0),
+        'record_count': sign
+    }
+    try:
+        column = MEAL_COUNT_COLUMNS.get(int(record.meal_type))
+    except (TypeError, ValueError):
+        column = None
+    if column:
+        values[column] = sign
+    return values
+
+
+def apply_diet_record(session, record, sign=1):
+    """把一条用餐记录计入（sign=1）或移出（sign=-1）当日汇总
+
+    使用 col = col + delta 的原子更新，由调用方在同一事务内提交。
+    """
+    day = (record.create_time or datetime.now()).date()
+    deltas = _deltas(record, sign)
+    key = (DailyNutrition.user_id == record.user_id) & (DailyNutrition.day == day)
+    update = {getattr(DailyNutrition, name): getattr(DailyNutrition, name) + value
+              for name, value in deltas.items()}
+
+    updated = session.query(DailyNutrition).filter(key).update(update, synchronize_session=False)
+    if sign < 0:
+        # 当日记录全部删除后归零，避免浮点累加误差残留
+        session.query(DailyNutrition).filter(key, DailyNutrition.record_count <= 0).update({
+            DailyNutrition.total_calorie: 0.0,
+            DailyNutrition.total_protein: 0.0,
+            DailyNutrition.total_fat: 0.0,
+            DailyNutrition.total_carb: 0.0
+        }, synchronize_session=False)
+        return
+    if updated:
+        return
+
+    try:
+        # 并发请求可能同时插入当日第一行，冲突时改为更新
+        with session.begin_nested():
+            session.add(DailyNutrition(user_id=record.user_id, day=day, **deltas))
+    except IntegrityError:
+        session.query(DailyNutrition).filter(key).update(update, synchronize_session=False)
+
+
+def rebuild_daily_rollup(session, user_id=None, since=None):
+    """根据用餐记录重建每日汇总（回填或修复），返回写入的行数"""
+    day_column = func.date(DietRecord.create_time)
+
+    def meal_count(meal_type):
+        return func.sum(case((DietRecord.meal_type == meal_type, 1), else_=0))
+
+    query = session.query(
+        DietRecord.user_id,
+        day_column,
+        func.sum(func.coalesce(DietRecord.total_calorie, 0)),
+        func.sum(func.coalesce(DietRecord.total_protein, 0)),
+        func.sum(func.coalesce(DietRecord.total_fat, 0)),
+        func.sum(func.coalesce(DietRecord.total_carb, 0)),
+        func.count(DietRecord.id),
+        meal_count(1),
+        meal_count(2),
+        meal_count(3)
+    ).filter(DietRecord.create_time.isnot(None)).group_by(DietRecord.user_id, day_column)
+
+    delete = session.query(DailyNutrition)
+    if user_id is not None:
+        query = query.filter(DietRecord.user_id == user_id)
+        delete = delete.filter(DailyNutrition.user_id == user_id)
+    if since is not None:
+        query = query.filter(DietRecord.create_time >= datetime.combine(since, datetime.min.time()))
+        delete = delete.filter(DailyNutrition.day >= since)
+
+    rows = []
+    for uid, day, calorie, protein, fat, carb, count, breakfast, lunch, dinner in query:
+        if isinstance(day, str):
+            # SQLite 的 DATE() 返回字符串
+            day = date.fromisoformat(day)
+        rows.append({
+            'user_id': uid,
+            'day': day,
+            'total_calorie': calorie or 0.0,
+            'total_protein': protein or 0.0,
+            'total_fat': fat or 0.0,
+            'total_carb': carb or 0.0,
+            'record_count': count,
+            'breakfast_count': breakfast or 0,
+            'lunch_count': lunch or 0,
+            'dinner_count': dinner or 0
+        })
+
+    delete.delete(synchronize_session=False)
+    if rows:
+        session.bulk_insert_mappings(DailyNutrition, rows)
+    return len(rows)
+
+
+def day_range(day):
+    """某一天的半开区间 [当天 0 点, 次日 0 点)，可以使用 create_time 上的索引"""
+    start = datetime.combine(day, datetime.min.time())
+    return start, start + timedelta(days=1)
@@ -0,0 +1,123 @@
+# app/services/detect_jobs.py - 异步识别任务
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# 任务状态
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_SUCCESS = 'success'
+JOB_ERROR = 'error'
+
+
+class DetectionJob:
+    """一次异步识别任务"""
+
+    def __init__(self, user_id, image_url=None, timings=None):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.image_url = image_url
+        self.timings = timings
+        self.status = JOB_PENDING
+        self.results = None
+        self.message = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._done = threading.Event()
+
+    @property
+    def finished(self):
+        return self._done.is_set()
+
+    def wait(self, timeout):
+        """阻塞等待任务结束（用于长轮询），返回任务是否已结束"""
+        return self._done.wait(timeout)
+
+    def to_dict(self):
+        data = {
+            'status': self.status,
+            'job_id': self.id,
+            'image_url': self.image_url
+        }
+        if self.timings is not None:
+            data['timings'] = self.timings
+        if self.status == JOB_SUCCESS:
+            data['results'] = self.results
+        elif self.status == JOB_ERROR:
+            data['message'] = self.message
+        return data
+
+    def _finish(self, status, results=None, message=None, timings=None):
+        self.status = status
+        self.results = results
+        self.message = message
+        if timings is not None:
+            # 整体替换而不是原地修改：并发的 to_dict() 只会看到提交时或完成时的完整快照
+            self.timings = timings
+        self.finished_at = time.time()
+        self._done.set()
+
+
+class DetectionJobManager:
+    """后台线程池执行识别任务，任务状态保存在当前进程内存中
+
+    任务只能在提交它的进程中查询，多进程部署时需要会话粘滞。
+    """
+
+    def __init__(self, max_workers=4, ttl=300):
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='detect-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, user_id, fn, *args, image_url=None, timings=None):
+        """提交任务；fn(*args) 返回识别结果列表，抛出异常视为失败
+
+        传入 timings 时任务保存其副本，并以 fn(*args, timings=另一份副本) 调用；
+        后台线程只写自己的副本，任务结束时作为最终耗时保存到任务上。
+        """
+        job = DetectionJob(user_id, image_url=image_url, timings=dict(timings) if timings is not None else None)
+        with self._lock:
+            self._purge_expired()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn, args)
+        return job
+
+    def get(self, job_id, user_id=None):
+        """查询任务；指定 user_id 时只返回该用户提交的任务"""
+        job = self._jobs.get(job_id)
+        if job is None or (user_id is not None and job.user_id != user_id):
+            return None
+        return job
+
+    def _run(self, job, fn, args):
+        job.status = JOB_RUNNING
+        timings = dict(job.timings) if job.timings is not None else None
+        try:
+            results = fn(*args, timings=timings) if timings is not None else fn(*args)
+        except Exception as e:
+            job._finish(JOB_ERROR, message=f'识别失败：{str(e)}', timings=timings)
+        else:
+            job._finish(JOB_SUCCESS, results=results, timings=timings)
+
+    def _purge_expired(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and now - job.finished_at > self.ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+def get_job_manager(app):
+    """获取应用对应的任务管理器（每个进程一个）"""
+    manager = app.extensions.get('detect_jobs')
+    if manager is None:
+        manager = DetectionJobManager(
+            max_workers=app.config['DETECT_JOB_WORKERS'],
+            ttl=app.config['DETECT_JOB_TTL']
+        )
+        manager = app.extensions.setdefault('detect_jobs', manager)
+    return manager
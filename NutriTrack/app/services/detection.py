@@ -0,0 +1,168 @@
+# app/services/detection.py - 菜品识别推理入口
+
+import functools
+import json
+import time
+from datetime import datetime
+
+from app import db
+from app.models.record import DetectionItem, DetectionRecord, Plate
+from app.services.dish_resolver import dish_resolver
+from app.services.inference_batcher import InferenceBatcher
+from app.services.inference_service import InferenceClient
+from app.services.metrics import observe_span, span
+from app.services.result_cache import get_result_cache
+
+
+def extract_boxes(result, names):
+    """将单张图片的 ultralytics 结果转换为普通字典列表，便于跨线程传递"""
+    boxes = []
+    for box in result.boxes:
+        cls_id = int(box.cls[0])
+        boxes.append({
+            'class_id': cls_id,
+            'class_name': names[cls_id],
+            'confidence': round(float(box.conf[0]), 2),
+            'bbox': [round(float(x), 1) for x in box.xyxy[0].tolist()]
+        })
+    return boxes
+
+
+def local_predict_batch(model_path, images, conf):
+    """在当前进程内对一批图片执行一次前向推理"""
+    # 延迟导入：使用独立推理服务时，Web 进程无需加载 torch
+    from app.services.model_registry import model_registry
+
+    loaded = model_registry.get(model_path)
+    results = loaded.predict(images, conf=conf)
+    return [extract_boxes(result, loaded.names) for result in results]
+
+
+def get_batcher(app):
+    """获取应用对应的推理调度器（每个进程一个）"""
+    batcher = app.extensions.get('inference_batcher')
+    if batcher is None:
+        config = app.config
+        if config['INFERENCE_SERVICE_ADDRESS']:
+            # 推理交给独立的推理服务，Web 进程只负责凑批与转发
+            if not config['INFERENCE_SERVICE_AUTHKEY']:
+                raise RuntimeError('使用推理服务时必须设置 INFERENCE_SERVICE_AUTHKEY')
+            client = InferenceClient(
+                config['INFERENCE_SERVICE_ADDRESS'],
+                config['INFERENCE_SERVICE_AUTHKEY'].encode(),
+                timeout=config['DETECT_TIMEOUT']
+            )
+            app.extensions.setdefault('inference_client', client)
+            predict_batch = client.predict_batch
+        else:
+            predict_batch = functools.partial(local_predict_batch, config['YOLO_MODEL_PATH'])
+
+        batcher = InferenceBatcher(
+            predict_batch,
+            max_batch_size=config['DETECT_BATCH_SIZE'],
+            max_wait_ms=config['DETECT_BATCH_WAIT_MS'],
+            max_queue_size=config['DETECT_QUEUE_SIZE']
+        )
+        batcher = app.extensions.setdefault('inference_batcher', batcher)
+    return batcher
+
+
+def current_model_info(app):
+    """当前模型的 (版本, 类别名称字典)；版本用于区分不同模型的缓存结果"""
+    if app.config['INFERENCE_SERVICE_ADDRESS']:
+        get_batcher(app)  # 确保客户端已创建
+        info = app.extensions['inference_client'].model_info()
+        return info['version'], info['names']
+
+    from app.services.model_registry import model_registry
+
+    loaded = model_registry.get(app.config['YOLO_MODEL_PATH'])
+    return loaded.version, loaded.names
+
+
+def detect_items(app, image, timings=None, image_hash=None):
+    """推理并把检测框解析为菜品识别结果；传入 image_hash 时优先查结果缓存"""
+    conf = app.config['DETECT_CONF']
+    with span('detect.model_info'):
+        version, names = current_model_info(app)
+
+    cache = get_result_cache(app) if app.config['DETECT_CACHE_ENABLED'] and image_hash is not None else None
+    if cache is not None:
+        cached = cache.get(version, conf, image_hash)
+        if timings is not None:
+            timings['cache_hit'] = cached is not None
+        if cached is not None:
+            return cached
+
+    start = time.perf_counter()
+    boxes = get_batcher(app).predict(image, conf, timeout=app.config['DETECT_TIMEOUT'])
+    elapsed = time.perf_counter() - start
+    observe_span('detect.inference', elapsed)  # 含排队等待
+    if timings is not None:
+        timings['inference_ms'] = round(elapsed * 1000, 2)
+
+    # 类别ID -> dish_id 映射按模型版本预先生成，每个检测框只需一次字典查找
+    class_map = dish_resolver.class_map(db.session, version, names)
+
+    detected_items = []
+    for box in boxes:
+        dish_id = class_map.get(box['class_id'])
+
+        detected_items.append({
+            'dish_name': box['class_name'],
+            'dish_id': dish_id,
+            'class_id': box['class_id'],
+            'confidence': box['confidence'],
+            'bbox': box['bbox'],
+            'weight': 100,
+            'has_db_data': dish_id is not None
+        })
+
+    if cache is not None:
+        cache.put(version, conf, image_hash, detected_items)
+    return detected_items
+
+
+def apply_plate_weight(detected_items, plate_weight):
+    """用餐盘上的实际重量代替默认的 100 克，平均分配到识别出的菜品"""
+    share = round(plate_weight / len(detected_items), 1)
+    return [dict(item, weight=share, weight_source='plate') for item in detected_items]
+
+
+def detect_and_record(app, image, user_id, timings=None, image_hash=None, image_key=None):
+    """识别图片中的菜品，写入识别记录并返回识别结果列表
+
+    同时供同步请求和后台任务线程调用，因此自行推入应用上下文。
+    传入 timings 字典时记录推理耗时（含排队等待），image_key 为上传图片在存储中的键。
+    用户绑定了智能餐盘时，识别记录关联到该餐盘，之后的进食量由重量流估计并写回记录。
+    """
+    with app.app_context():
+        detected_items = detect_items(app, image, timings=timings, image_hash=image_hash)
+
+        with span('detect.plate_lookup'):
+            plate = Plate.query.filter_by(user_id=user_id, bind_status=1).first()
+        if plate is not None and plate.current_weight and detected_items:
+            detected_items = apply_plate_weight(detected_items, plate.current_weight)
+
+        detect_time = datetime.now()
+        new_record = DetectionRecord(
+            user_id=user_id,
+            plate_id=plate.plate_id if plate is not None else None,
+            current_weight=plate.current_weight if plate is not None else None,
+            detected_objects=json.dumps(detected_items),
+            image_key=image_key,
+            detect_time=detect_time
+        )
+        # 每个识别结果另存一行，统计时直接在 SQL 中聚合
+        for item in detected_items:
+            new_record.items.append(DetectionItem.from_result(item, detect_time))
+        db.session.add(new_record)
+        with span('detect.commit'):
+            try:
+                db.session.commit()
+            except Exception:
+                # 后台任务线程中没有请求结束时的清理，失败的事务必须在这里回滚
+                db.session.rollback()
+                raise
+
+        return detected_items
@@ -0,0 +1,148 @@
+# app/services/detection_stats.py - 识别记录的分时段统计
+
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import Integer, case, cast, func
+
+from app.models.food import Dish
+from app.models.record import DetectionItem, DetectionRecord
+from app.services.time_buckets import bucket_expr, bucket_label, iter_buckets, next_bucket
+
+
+class DetectionStatsCache:
+    """已结束时间桶的统计结果缓存
+
+    历史桶的数据不会再变化，只需计算一次；当前桶（以及结束不足 grace 秒的桶，
+    防止边界处尚未提交的记录被遗漏）每次请求都重新计算。
+    """
+
+    def __init__(self, max_entries=20000, grace=60):
+        self.max_entries = max_entries
+        self.grace = timedelta(seconds=grace)
+        self._entries = OrderedDict()  # (granularity, bucket_start) -> {'count', 'dishes'}
+        self._lock = threading.Lock()
+
+    def get(self, granularity, start):
+        with self._lock:
+            entry = self._entries.get((granularity, start))
+            if entry is not None:
+                self._entries.move_to_end((granularity, start))
+            return entry
+
+    def put(self, granularity, start, entry, now):
+        if next_bucket(start, granularity) > now - self.grace:
+            return  # 桶尚未结束，不缓存
+        with self._lock:
+            self._entries[(granularity, start)] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _compute_buckets(session, granularity, start, end):
+    """计算 [start, end) 内各桶的识别次数与菜品分布"""
+    dialect = session.get_bind().dialect.name
+    label = bucket_expr(DetectionRecord.detect_time, granularity, dialect)
+    in_range = (DetectionRecord.detect_time >= start) & (DetectionRecord.detect_time < end)
+
+    # 次数：一条按桶分组的聚合查询
+    counts = dict(session.query(label, func.count(DetectionRecord.id)).filter(in_range).group_by(label))
+
+    # 菜品分布：按 (桶, 菜名) 对识别结果表分组
+    item_label = bucket_expr(DetectionItem.detect_time, granularity, dialect)
+    dishes = {}
+    rows = session.query(item_label, DetectionItem.dish_name, func.count(DetectionItem.id)) \
+        .filter(DetectionItem.detect_time >= start, DetectionItem.detect_time < end) \
+        .group_by(item_label, DetectionItem.dish_name)
+    for key, dish_name, count in rows:
+        dishes.setdefault(key, {})[dish_name] = count
+
+    return {
+        key: {'count': counts.get(key, 0), 'dishes': dishes.get(key, {})}
+        for key in set(counts) | set(dishes)
+    }
+
+
+def detection_statistics(session, cache, granularity, start, end, now=None):
+    """返回 [start, end) 内按 granularity 分桶的 (labels, entries)"""
+    now = now or datetime.now()
+    buckets = list(iter_buckets(start, end, granularity))
+
+    entries = {}
+    missing = []
+    for bucket in buckets:
+        entry = cache.get(granularity, bucket)
+        if entry is None:
+            missing.append(bucket)
+        else:
+            entries[bucket] = entry
+
+    if missing:
+        # 通常只有当前桶缺失；一次查询覆盖所有缺失桶所在的连续区间
+        computed = _compute_buckets(session, granularity, missing[0], next_bucket(missing[-1], granularity))
+        for bucket in missing:
+            entry = computed.get(bucket_label(bucket, granularity), {'count': 0, 'dishes': {}})
+            entries[bucket] = entry
+            cache.put(granularity, bucket, entry, now)
+
+    labels = [bucket_label(bucket, granularity) for bucket in buckets]
+    return labels, [entries[bucket] for bucket in buckets]
+
+
+def dish_popularity(session, start, end, limit=20):
+    """[start, end) 内各菜品被识别的次数与平均置信度，按次数降序
+
+    按 dish_id 分组，菜品改名前后的识别计为同一菜品，名称取菜品表中的当前名称；
+    未匹配到菜品（dish_id 为空）的识别按识别出的名称分组。
+    """
+    count = func.count(DetectionItem.id)
+    unmatched_name = case((DetectionItem.dish_id.is_(None), DetectionItem.dish_name))
+    rows = session.query(DetectionItem.dish_id, unmatched_name, func.max(DetectionItem.dish_name), count,
+                         func.avg(DetectionItem.confidence)) \
+        .filter(DetectionItem.detect_time >= start, DetectionItem.detect_time < end) \
+        .group_by(DetectionItem.dish_id, unmatched_name) \
+        .order_by(count.desc()).limit(limit).all()
+
+    dish_ids = [row[0] for row in rows if row[0] is not None]
+    names = dict(session.query(Dish.dish_id, Dish.name).filter(Dish.dish_id.in_(dish_ids))) if dish_ids else {}
+    return [
+        {'dish_name': names.get(dish_id, detected_name) if dish_id is not None else unmatched,
+         'dish_id': dish_id, 'count': total,
+         'avg_confidence': round(avg, 3) if avg is not None else None}
+        for dish_id, unmatched, detected_name, total, avg in rows
+    ]
+
+
+def confidence_histogram(session, start, end, bins=10, dish_id=None):
+    """[start, end) 内识别置信度的直方图，返回长度为 bins 的计数列表（区间 [i/bins, (i+1)/bins)）"""
+    scaled = DetectionItem.confidence * bins
+    # MySQL 的 CAST 会四舍五入，需用 FLOOR；SQLite 的 CAST 对正数即截断
+    if session.get_bind().dialect.name == 'mysql':
+        index = func.floor(scaled)
+    else:
+        index = cast(scaled, Integer)
+    index = case((DetectionItem.confidence >= 1, bins - 1), else_=index)
+
+    query = session.query(index, func.count(DetectionItem.id)) \
+        .filter(DetectionItem.detect_time >= start, DetectionItem.detect_time < end,
+                DetectionItem.confidence.isnot(None))
+    if dish_id is not None:
+        query = query.filter(DetectionItem.dish_id == dish_id)
+
+    histogram = [0] * bins
+    for i, count in query.group_by(index):
+        histogram[min(max(int(i), 0), bins - 1)] += count
+    return histogram
+
+
+def get_stats_cache(app):
+    """获取应用对应的统计缓存（每个进程一个）"""
+    cache = app.extensions.get('detection_stats_cache')
+    if cache is None:
+        cache = app.extensions.setdefault('detection_stats_cache', DetectionStatsCache())
+    return cache
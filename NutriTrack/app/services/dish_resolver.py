@@ -0,0 +1,53 @@
+# app/services/dish_resolver.py - 识别类别到菜品的映射
+
+import threading
+
+from app.models.food import Dish, normalize_dish_name
+from app.services.nutrition_table import on_nutrition_data_committed
+
+
+class DishResolver:
+    """把模型类别ID解析为 dish_id
+
+    规范化菜名 -> dish_id 的索引用一次查询加载；每个模型版本在第一次使用时
+    根据 model.names 预先生成 class_id -> dish_id 映射，解析检测框只需一次字典查找。
+    菜品数据变更提交后整体失效。
+    """
+
+    def __init__(self):
+        self._name_index = None
+        self._class_maps = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._name_index = None
+            self._class_maps = {}
+
+    def name_index(self, session):
+        index = self._name_index
+        if index is None:
+            index = {key: dish_id for dish_id, key in
+                     session.query(Dish.dish_id, Dish.name_normalized)}
+            self._name_index = index
+        return index
+
+    def class_map(self, session, model_version, names):
+        """获取（必要时生成）模型类别ID到 dish_id 的映射，找不到的类别映射为 None"""
+        class_map = self._class_maps.get(model_version)
+        if class_map is None:
+            index = self.name_index(session)
+            class_map = {int(class_id): index.get(normalize_dish_name(name))
+                         for class_id, name in names.items()}
+            with self._lock:
+                self._class_maps[model_version] = class_map
+        return class_map
+
+    def resolve_name(self, session, name):
+        """按菜名查找 dish_id"""
+        return self.name_index(session).get(normalize_dish_name(name))
+
+
+# 进程内共享的菜品解析器
+dish_resolver = DishResolver()
+on_nutrition_data_committed(dish_resolver.invalidate)
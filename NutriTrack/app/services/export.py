@@ -0,0 +1,197 @@
+# app/services/export.py - 用餐记录与识别记录的流式导出
+
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+
+from flask import Response, stream_with_context
+
+from app.models.record import DetectionRecord, DietRecord
+from app.services.daily_rollup import day_range
+
+# 输出缓冲达到该大小时产出一块数据
+CHUNK_SIZE = 64 * 1024
+# 服务端游标每次取回的行数
+FETCH_SIZE = 1000
+
+
+class ExportDataset:
+    def __init__(self, model, columns, time_column, json_column, item_fields):
+        self.model = model
+        self.columns = columns          # 导出的普通列
+        self.time_column = time_column  # 按日期筛选的列
+        self.json_column = json_column  # JSON 列，展开模式下每个元素一行
+        self.item_fields = item_fields  # 展开后取的元素字段
+
+    def fields(self, flatten):
+        if flatten:
+            return self.columns + [f'item_{field}' for field in self.item_fields] + ['item_error']
+        return self.columns + [self.json_column]
+
+
+DATASETS = {
+    'diet': ExportDataset(
+        DietRecord,
+        ['id', 'user_id', 'meal_type', 'total_calorie', 'total_protein', 'total_fat', 'total_carb',
+         'create_time'],
+        'create_time', 'dish_list',
+        ['dish_name', 'weight', 'calories', 'protein', 'fat', 'carb']
+    ),
+    'detection': ExportDataset(
+        DetectionRecord,
+        ['id', 'user_id', 'plate_id', 'current_weight', 'served_weight', 'consumed_weight', 'detect_time'],
+        'detect_time', 'detected_objects',
+        ['dish_name', 'confidence', 'weight']
+    )
+}
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson')
+}
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+
+def _load_items(raw):
+    """解析 JSON 列，返回 (元素列表, 错误说明)；旧数据可能格式错误，不能让一行坏数据中断整个下载"""
+    if not raw:
+        return [], None
+    try:
+        items = json.loads(raw)
+    except ValueError:
+        return None, f'JSON 无法解析：{raw[:200]}'
+    if not isinstance(items, list):
+        return None, f'不是 JSON 数组：{raw[:200]}'
+    return items, None
+
+
+def iter_rows(session, dataset, user_id=None, start=None, end=None, flatten=False, json_as_text=False):
+    """按 id 顺序逐行产出字典；通过服务端游标分批读取，内存占用与行数无关
+
+    不展开时 JSON 列默认解析为对象，json_as_text 为 True 时保留原始文本（用于 CSV），
+    无法解析时同样输出原始文本；展开时无法解析的行或元素输出一行，原因写在 item_error 中。
+    """
+    model = dataset.model
+    columns = [getattr(model, name) for name in dataset.columns + [dataset.json_column]]
+    query = session.query(*columns)
+    if user_id is not None:
+        query = query.filter(model.user_id == user_id)
+    if start is not None:
+        query = query.filter(getattr(model, dataset.time_column) >= start)
+    if end is not None:
+        query = query.filter(getattr(model, dataset.time_column) < end)
+
+    empty = {f'item_{field}': None for field in dataset.item_fields}
+    for row in query.order_by(model.id).yield_per(FETCH_SIZE):
+        base = {name: _plain(value) for name, value in zip(dataset.columns, row)}
+        raw = row[-1]
+        if not flatten:
+            if json_as_text:
+                base[dataset.json_column] = raw
+            else:
+                items, error = _load_items(raw)
+                base[dataset.json_column] = raw if error else items
+            yield base
+            continue
+        items, error = _load_items(raw)
+        if error:
+            yield dict(base, **empty, item_error=error)
+            continue
+        if not items:
+            yield dict(base, **empty, item_error=None)
+        for item in items:
+            if not isinstance(item, dict):
+                yield dict(base, **empty, item_error=f'元素不是对象：{json.dumps(item, ensure_ascii=False)[:200]}')
+                continue
+            yield dict(base, **{f'item_{field}': item.get(field) for field in dataset.item_fields}, item_error=None)
+
+
+def csv_chunks(rows, fields):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def ndjson_chunks(rows):
+    parts, size = [], 0
+    for row in rows:
+        line = json.dumps(row, ensure_ascii=False) + '\n'
+        parts.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(parts).encode('utf-8')
+            parts, size = [], 0
+    if parts:
+        yield ''.join(parts).encode('utf-8')
+
+
+def gzip_chunks(chunks):
+    """边产出边压缩为 gzip 格式（wbits=31 生成 gzip 头和尾）"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(session, dataset_name, fmt='csv', compress=False, flatten=False,
+                  user_id=None, start=None, end=None):
+    """返回导出内容的字节块迭代器"""
+    dataset = DATASETS[dataset_name]
+    rows = iter_rows(session, dataset, user_id=user_id, start=start, end=end, flatten=flatten,
+                     json_as_text=fmt == 'csv')
+    if fmt == 'csv':
+        chunks = csv_chunks(rows, dataset.fields(flatten))
+    else:
+        chunks = ndjson_chunks(rows)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def export_filename(dataset_name, fmt, compress):
+    name = f"{dataset_name}_records_{datetime.now().strftime('%Y%m%d%H%M%S')}.{FORMATS[fmt][1]}"
+    return name + '.gz' if compress else name
+
+
+def export_response(session, dataset_name, args, user_id=None):
+    """根据请求参数生成流式下载响应
+
+    参数：format=csv|ndjson，gzip=1 压缩，flatten=1 把 JSON 列展开为每个元素一行，
+    from/to=YYYY-MM-DD 闭区间日期。参数无效时抛出 ValueError。
+    """
+    if dataset_name not in DATASETS:
+        raise ValueError('不支持的导出类型')
+    fmt = args.get('format', 'csv')
+    if fmt not in FORMATS:
+        raise ValueError('format 只能是 csv 或 ndjson')
+    compress = args.get('gzip') == '1'
+    flatten = args.get('flatten') == '1'
+    try:
+        start = day_range(datetime.strptime(args['from'], '%Y-%m-%d').date())[0] if args.get('from') else None
+        end = day_range(datetime.strptime(args['to'], '%Y-%m-%d').date())[1] if args.get('to') else None
+    except ValueError:
+        raise ValueError('日期格式应为 YYYY-MM-DD')
+
+    chunks = export_stream(session, dataset_name, fmt, compress=compress, flatten=flatten,
+                           user_id=user_id, start=start, end=end)
+    filename = export_filename(dataset_name, fmt, compress)
+    return Response(
+        stream_with_context(chunks),
+        mimetype='application/gzip' if compress else FORMATS[fmt][0],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
@@ -0,0 +1,129 @@
+# app/services/inference_batcher.py - 推理微批调度器
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from app.services.metrics import metrics
+
+
+class InferenceQueueFull(Exception):
+    """推理队列已满"""
+
+
+class _PendingRequest:
+    __slots__ = ('image', 'conf', 'future', 'enqueue_time')
+
+    def __init__(self, image, conf):
+        self.image = image
+        self.conf = conf
+        self.future = Future()
+        self.enqueue_time = time.monotonic()
+
+
+class InferenceBatcher:
+    """将并发的单图识别请求合并为批量推理
+
+    predict_batch(images, conf) 需返回与 images 等长的列表，每项为该图片的检测框列表。
+    每一批最多 max_batch_size 张图，第一张图入队后最多等待 max_wait_ms 毫秒凑批。
+    """
+
+    def __init__(self, predict_batch, max_batch_size=8, max_wait_ms=10, max_queue_size=64):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        # 运行统计
+        self.batch_count = 0
+        self.item_count = 0
+        self.failed_batches = 0
+        self.last_error = None  # {'error', 'time'}
+
+    @property
+    def queue_depth(self):
+        """当前排队等待推理的请求数"""
+        return self._queue.qsize()
+
+    @property
+    def avg_batch_size(self):
+        return self.item_count / self.batch_count if self.batch_count else 0.0
+
+    def submit(self, image, conf):
+        """提交一张图片，返回 Future；队列已满时抛出 InferenceQueueFull"""
+        self._ensure_worker()
+        pending = _PendingRequest(image, conf)
+        try:
+            self._queue.put_nowait(pending)
+        except queue.Full:
+            raise InferenceQueueFull('推理队列已满')
+        return pending.future
+
+    def predict(self, image, conf, timeout=None):
+        """提交并等待该图片的检测结果"""
+        return self.submit(image, conf).result(timeout=timeout)
+
+    def _ensure_worker(self):
+        # 延迟到第一次提交时才启动线程，避免 fork 前创建线程
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='inference-batcher', daemon=True)
+                self._thread.start()
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = batch[0].enqueue_time + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    # 窗口已过，只取已经在排队的请求
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+
+            # 置信度阈值不同的请求不能放进同一次前向计算
+            groups = {}
+            for pending in batch:
+                groups.setdefault(pending.conf, []).append(pending)
+
+            for conf, items in groups.items():
+                self._process(items, conf)
+
+    def _process(self, items, conf):
+        items = [p for p in items if p.future.set_running_or_notify_cancel()]
+        if not items:
+            return
+        if metrics.enabled:
+            now = time.monotonic()
+            for pending in items:
+                metrics.observe_span('inference.queue_wait', now - pending.enqueue_time)
+        try:
+            with metrics.span('inference.batch'):
+                outputs = self.predict_batch([p.image for p in items], conf)
+            if len(outputs) != len(items):
+                raise RuntimeError('批量推理返回的结果数量与输入不一致')
+        except Exception as e:
+            self.failed_batches += 1
+            self.last_error = {'error': str(e), 'time': time.time()}
+            for pending in items:
+                pending.future.set_exception(e)
+            return
+
+        self.batch_count += 1
+        self.item_count += len(items)
+        for pending, boxes in zip(items, outputs):
+            pending.future.set_result(boxes)
@@ -0,0 +1,346 @@
+# app/services/inference_service.py - 独立进程的推理服务
+#
+# Web 进程只作为客户端，通过本地 socket 把批量图片发给推理服务；
+# 推理服务维护 N 个各自持有一份模型的工作进程，负责健康检查与崩溃重启。
+
+import itertools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import get_context
+from multiprocessing.connection import Client, Listener
+
+from app.services.inference_batcher import InferenceQueueFull
+
+
+def parse_address(address):
+    """'host:port' 解析为 TCP 地址，其余视为 Unix socket 路径"""
+    if ':' in address and not address.startswith('/'):
+        host, port = address.rsplit(':', 1)
+        return host, int(port)
+    return address
+
+
+def _worker_main(worker_id, model_path, num_threads, imgsz, task_queue, result_queue):
+    """推理工作进程入口（spawn 方式启动）"""
+    # 必须在导入 torch 之前限制线程数
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = str(num_threads)
+
+    import torch
+    torch.set_num_threads(num_threads)
+
+    from app.services.detection import extract_boxes
+    from app.services.model_registry import ModelRegistry
+
+    registry = ModelRegistry(warmup_size=imgsz)
+    try:
+        loaded = registry.get(model_path)
+    except Exception as e:
+        # 上报原因后退出，由主进程按退避策略决定是否重启
+        result_queue.put(('failed', worker_id, None, None, f'模型加载失败：{e}'))
+        return
+    info = {'version': loaded.version, 'names': loaded.names}
+    result_queue.put(('ready', worker_id, None, info, None))
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        request_id, images, conf = task
+        result_queue.put(('taken', worker_id, request_id, None, None))
+        try:
+            loaded = registry.get(model_path)
+            results = loaded.predict(images, conf=conf)
+            outputs = [extract_boxes(result, loaded.names) for result in results]
+        except Exception as e:
+            result_queue.put(('done', worker_id, request_id, None, str(e)))
+        else:
+            result_queue.put(('done', worker_id, request_id, outputs, None))
+
+
+class InferenceService:
+    """推理服务：N 个工作进程 + 本地 socket 前端"""
+
+    # 重启间隔的上限（秒）
+    MAX_RESTART_BACKOFF = 60.0
+
+    def __init__(self, model_path, address, authkey, num_workers=2,
+                 threads_per_worker=2, max_queue_size=128, imgsz=640, timeout=60,
+                 restart_backoff=1.0, max_failures=5):
+        if not authkey:
+            raise ValueError('推理服务必须设置 INFERENCE_SERVICE_AUTHKEY')
+        self.model_path = model_path
+        self.address = parse_address(address)
+        self.authkey = authkey
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker
+        self.imgsz = imgsz
+        self.timeout = timeout
+        self.restart_backoff = restart_backoff
+        self.max_failures = max_failures
+
+        self._ctx = get_context('spawn')
+        self._task_queue = self._ctx.Queue(maxsize=max_queue_size)
+        self._result_queue = self._ctx.Queue()
+        self._workers = {}
+        self._ready = set()
+        self._assigned = {}  # worker_id -> 正在处理的 request_id
+        self._pending = {}   # request_id -> Future
+        self._queued = 0
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._stopping = threading.Event()
+        self.restarts = 0
+        self._failures = {}      # worker_id -> 连续失败次数
+        self._restart_at = {}    # worker_id -> 计划重启的 monotonic 时间
+        self._given_up = set()   # 连续失败次数达到上限、不再重启的工作进程
+        self._spawned_at = {}    # worker_id -> 最近一次启动的时间
+        self.last_error = None   # {'worker', 'error', 'time'}
+        self.started_at = None
+        self.model_info = None  # 工作进程加载模型后上报的版本与类别名称
+
+    # ---------------------- 生命周期 ----------------------
+    def start(self):
+        self.started_at = time.time()
+        for worker_id in range(self.num_workers):
+            self._spawn(worker_id)
+        threading.Thread(target=self._dispatch_results, name='inference-results', daemon=True).start()
+        threading.Thread(target=self._supervise, name='inference-supervisor', daemon=True).start()
+
+    def serve_forever(self):
+        """启动工作进程并阻塞处理客户端连接"""
+        self.start()
+        with Listener(self.address, authkey=self.authkey) as listener:
+            while not self._stopping.is_set():
+                try:
+                    conn = listener.accept()
+                except Exception:
+                    continue
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+    def stop(self):
+        self._stopping.set()
+        for _ in self._workers:
+            self._task_queue.put(None)
+        for process in self._workers.values():
+            process.join(timeout=5)
+
+    def _spawn(self, worker_id):
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self.model_path, self.threads_per_worker, self.imgsz,
+                  self._task_queue, self._result_queue),
+            name=f'inference-worker-{worker_id}',
+            daemon=True
+        )
+        self._spawned_at[worker_id] = time.time()
+        process.start()
+        self._workers[worker_id] = process
+
+    def _supervise(self):
+        # 定期检查工作进程：崩溃的进程按指数退避重启，其正在处理的请求返回失败；
+        # 连续失败达到上限（例如模型文件损坏）后不再重启，原因见 health()
+        while not self._stopping.wait(1.0):
+            for worker_id, process in list(self._workers.items()):
+                if worker_id in self._given_up or process.is_alive():
+                    continue
+                if worker_id not in self._restart_at:
+                    self._on_worker_exit(worker_id, process)
+                    continue
+                if time.monotonic() >= self._restart_at[worker_id]:
+                    del self._restart_at[worker_id]
+                    self.restarts += 1
+                    self._spawn(worker_id)
+
+    def _on_worker_exit(self, worker_id, process):
+        with self._lock:
+            self._ready.discard(worker_id)
+            request_id = self._assigned.pop(worker_id, None)
+            future = self._pending.pop(request_id, None)
+            failures = self._failures[worker_id] = self._failures.get(worker_id, 0) + 1
+            # 进程退出前已上报原因（如模型加载失败）时保留该原因
+            reported = (self.last_error is not None and self.last_error['worker'] == worker_id
+                        and self.last_error['time'] >= self._spawned_at.get(worker_id, 0))
+            if not reported:
+                self._record_error(worker_id, f'推理进程异常退出（exit code {process.exitcode}）')
+        if future is not None:
+            future.set_exception(RuntimeError('推理进程异常退出'))
+
+        if failures >= self.max_failures:
+            self._given_up.add(worker_id)
+            return
+        delay = min(self.restart_backoff * 2 ** (failures - 1), self.MAX_RESTART_BACKOFF)
+        self._restart_at[worker_id] = time.monotonic() + delay
+
+    def _record_error(self, worker_id, error):
+        self.last_error = {'worker': worker_id, 'error': error, 'time': time.time()}
+
+    def _dispatch_results(self):
+        while True:
+            kind, worker_id, request_id, outputs, error = self._result_queue.get()
+            with self._lock:
+                if kind == 'ready':
+                    self._ready.add(worker_id)
+                    self.model_info = outputs
+                    continue
+                if kind == 'failed':
+                    self._record_error(worker_id, error)
+                    continue
+                if kind == 'taken':
+                    self._queued -= 1
+                    self._assigned[worker_id] = request_id
+                    continue
+                self._assigned.pop(worker_id, None)
+                if error is None:
+                    self._failures[worker_id] = 0  # 正常完成请求，重新计算连续失败次数
+                future = self._pending.pop(request_id, None)
+            if future is None:
+                continue
+            if error is not None:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(outputs)
+
+    # ---------------------- 请求处理 ----------------------
+    def health(self):
+        with self._lock:
+            if self._ready:
+                status = 'ok'
+            elif len(self._given_up) >= self.num_workers:
+                status = 'failed'
+            else:
+                status = 'starting'
+            return {
+                'status': status,
+                'workers': self.num_workers,
+                'workers_alive': sum(1 for p in self._workers.values() if p.is_alive()),
+                'workers_ready': len(self._ready),
+                'queue_length': self._queued,
+                'in_flight': len(self._assigned),
+                'restarts': self.restarts,
+                'failed_workers': sorted(self._given_up),
+                'last_error': self.last_error,
+                'uptime': round(time.time() - self.started_at, 1) if self.started_at else 0
+            }
+
+    def predict_batch(self, images, conf):
+        request_id = next(self._ids)
+        future = Future()
+        with self._lock:
+            self._pending[request_id] = future
+            self._queued += 1
+        try:
+            self._task_queue.put_nowait((request_id, images, conf))
+        except queue.Full:
+            with self._lock:
+                self._pending.pop(request_id, None)
+                self._queued -= 1
+            raise InferenceQueueFull('推理服务队列已满')
+        try:
+            return future.result(timeout=self.timeout)
+        finally:
+            with self._lock:
+                self._pending.pop(request_id, None)
+
+    def _serve_connection(self, conn):
+        with conn:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    return
+                conn.send(self._handle(message))
+
+    def _handle(self, message):
+        op = message.get('op')
+        if op == 'health':
+            return {'ok': True, 'health': self.health()}
+        if op == 'model_info':
+            if self.model_info is None:
+                return {'ok': False, 'error': '模型尚未加载完成'}
+            return {'ok': True, 'model_info': self.model_info}
+        if op == 'detect':
+            try:
+                outputs = self.predict_batch(message['images'], message['conf'])
+            except InferenceQueueFull:
+                return {'ok': False, 'busy': True, 'error': '推理服务队列已满'}
+            except Exception as e:
+                return {'ok': False, 'error': str(e)}
+            return {'ok': True, 'outputs': outputs}
+        return {'ok': False, 'error': f'未知操作：{op}'}
+
+
+class InferenceClient:
+    """推理服务客户端；每个线程复用一条连接"""
+
+    # 模型信息的本地缓存时间（秒），服务端更换模型后最多延迟这么久生效
+    MODEL_INFO_TTL = 30
+
+    def __init__(self, address, authkey, timeout=30):
+        self.address = parse_address(address)
+        self.authkey = authkey
+        self.timeout = timeout
+        self._local = threading.local()
+        self._model_info = None
+        self._model_info_at = 0.0
+
+    def predict_batch(self, images, conf):
+        response = self._call({'op': 'detect', 'images': images, 'conf': conf})
+        if not response['ok']:
+            if response.get('busy'):
+                raise InferenceQueueFull(response['error'])
+            raise RuntimeError(response['error'])
+        return response['outputs']
+
+    def health(self):
+        return self._call({'op': 'health'})['health']
+
+    def model_info(self):
+        """服务端模型的 {'version': ..., 'names': {class_id: name}}"""
+        if self._model_info is None or time.monotonic() - self._model_info_at > self.MODEL_INFO_TTL:
+            response = self._call({'op': 'model_info'})
+            if not response['ok']:
+                raise RuntimeError(response['error'])
+            self._model_info = response['model_info']
+            self._model_info_at = time.monotonic()
+        return self._model_info
+
+    def _call(self, message):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = Client(self.address, authkey=self.authkey)
+            self._local.conn = conn
+        try:
+            conn.send(message)
+            if not conn.poll(self.timeout):
+                raise TimeoutError('推理服务响应超时')
+            return conn.recv()
+        except Exception:
+            # 连接状态未知，丢弃后下次重连
+            self._local.conn = None
+            conn.close()
+            raise
+
+
+def serve_inference(config):
+    """按应用配置启动推理服务（阻塞）"""
+    if not config['INFERENCE_SERVICE_AUTHKEY']:
+        raise SystemExit('请通过环境变量 INFERENCE_SERVICE_AUTHKEY 设置推理服务密钥（服务端与 Web 进程一致）')
+    service = InferenceService(
+        model_path=config['YOLO_MODEL_PATH'],
+        address=config['INFERENCE_SERVICE_ADDRESS'] or '127.0.0.1:6001',
+        authkey=config['INFERENCE_SERVICE_AUTHKEY'].encode(),
+        num_workers=config['INFERENCE_WORKERS'],
+        threads_per_worker=config['INFERENCE_THREADS_PER_WORKER'],
+        max_queue_size=config['INFERENCE_SERVICE_QUEUE_SIZE'],
+        imgsz=config['YOLO_IMGSZ'],
+        restart_backoff=config['INFERENCE_WORKER_RESTART_BACKOFF'],
+        max_failures=config['INFERENCE_WORKER_MAX_FAILURES']
+    )
+    try:
+        service.serve_forever()
+    finally:
+        service.stop()
@@ -0,0 +1,108 @@
+# app/services/keyset.py - 基于游标（keyset）的分页
+
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    """把排序键编码为不透明的 URL 安全字符串"""
+    payload = [{'dt': v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def _decode_value(value):
+    # 排序键只可能是整数、字符串、空值或编码后的时间
+    if isinstance(value, dict):
+        if set(value) != {'dt'} or not isinstance(value['dt'], str):
+            raise InvalidCursor('无效的分页游标')
+        return datetime.fromisoformat(value['dt'])
+    if value is None or (isinstance(value, (int, str)) and not isinstance(value, bool)):
+        return value
+    raise InvalidCursor('无效的分页游标')
+
+
+def decode_cursor(token, size, types=None):
+    """解码游标；types 为各排序列的 Python 类型时逐个校验，防止篡改的游标进入比较条件"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != size:
+            raise InvalidCursor('无效的分页游标')
+        values = [_decode_value(v) for v in payload]
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor('无效的分页游标')
+    for value, expected in zip(values, types or ()):
+        if value is not None and expected is not None and not isinstance(value, expected):
+            raise InvalidCursor('无效的分页游标')
+    return values
+
+
+def _python_type(column):
+    try:
+        return column.type.python_type
+    except NotImplementedError:
+        return None
+
+
+def _seek(columns, values, descending):
+    """(c1, c2, ...) 严格位于游标之后的条件，展开为 OR/AND 以便走复合索引"""
+    clauses = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        step = column < value if descending else column > value
+        clauses.append(and_(*[c == v for c, v in zip(columns[:i], values[:i])], step))
+    return or_(*clauses)
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, prev_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def keyset_paginate(query, columns, per_page, after=None, before=None, descending=False):
+    """按 columns 排序取一页
+
+    after / before 为上一页返回的 next_cursor / prev_cursor；无论翻到第几页，
+    都只是一次索引定位加 LIMIT，代价与第一页相同。columns 最后一列须唯一（通常是主键）。
+    """
+    backward = before is not None
+    token = before if backward else after
+    if token:
+        values = decode_cursor(token, len(columns), [_python_type(c) for c in columns])
+        query = query.filter(_seek(columns, values, descending != backward))
+
+    # 向前翻页时反向排序取最近的 per_page 条，再翻转回正常顺序
+    reverse = descending != backward
+    query = query.order_by(*[c.desc() if reverse else c.asc() for c in columns])
+    items = query.limit(per_page + 1).all()
+    has_more = len(items) > per_page
+    items = items[:per_page]
+    if backward:
+        items.reverse()
+
+    def key(item):
+        return encode_cursor([getattr(item, c.key) for c in columns])
+
+    if not items:
+        return KeysetPage(items, None, None)
+    # 向后翻页时，游标之后一定还有记录（来时的那一页）；向前翻页同理
+    next_cursor = key(items[-1]) if backward or has_more else None
+    prev_cursor = key(items[0]) if (has_more if backward else token) else None
+    return KeysetPage(items, next_cursor, prev_cursor)
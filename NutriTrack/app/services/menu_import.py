@@ -0,0 +1,237 @@
+# app/services/menu_import.py - 食堂、菜品、配料、配方与营养成分的批量导入
+
+import csv
+import io
+import json
+import time
+
+from app.models.food import (Canteen, Dish, DishIngredient, Ingredient, NutritionFacts,
+                             normalize_dish_name)
+from app.services.nutrition_table import mark_nutrition_data_changed, rebuild_dish_nutrition
+
+# 每批写入的行数（一次 executemany）
+CHUNK_SIZE = 2000
+# 结果中最多保留的错误条数
+MAX_ERRORS = 100
+# 受影响的菜品/配料超过该数量时全量重建营养成分表
+FULL_REBUILD_THRESHOLD = 1000
+
+
+class _Kind:
+    def __init__(self, model, keys, fields):
+        self.model = model
+        self.table = model.__table__
+        self.keys = keys      # 冲突判断的主键列
+        self.fields = fields  # 列名 -> (类型转换, 是否必填)
+
+
+IMPORT_KINDS = {
+    'canteens': _Kind(Canteen, ['canteen_id'], {
+        'canteen_id': (int, True), 'name': (str, True)}),
+    'dishes': _Kind(Dish, ['dish_id'], {
+        'dish_id': (int, True), 'name': (str, True), 'canteen_id': (int, False),
+        'cooking_method': (str, False)}),
+    'ingredients': _Kind(Ingredient, ['ingredient_id'], {
+        'ingredient_id': (int, True), 'ingredient_name': (str, True)}),
+    # 配方与营养成分可以用名称代替ID引用菜品和配料
+    'dish_ingredients': _Kind(DishIngredient, ['dish_id', 'ingredient_id'], {
+        'dish_id': (int, True), 'ingredient_id': (int, True), 'amount_g': (float, True)}),
+    'nutrition_facts': _Kind(NutritionFacts, ['ingredient_id'], {
+        'ingredient_id': (int, True), 'energy_kcal': (float, True), 'protein_g': (float, True),
+        'fat_g': (float, True), 'carb_g': (float, True)})
+}
+
+
+class ImportResult:
+    def __init__(self, kind):
+        self.kind = kind
+        self.rows = 0
+        self.imported = 0
+        self.errors = []
+        self.error_count = 0
+        self.seconds = 0.0
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({'line': line, 'message': message})
+
+    def to_dict(self):
+        return {
+            'kind': self.kind,
+            'rows': self.rows,
+            'imported': self.imported,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'seconds': round(self.seconds, 3),
+            'rows_per_sec': round(self.rows / self.seconds, 1) if self.seconds else None
+        }
+
+
+def iter_records(stream, fmt):
+    """从二进制流逐行读取 (行号, 字典)；fmt 为 csv 或 ndjson"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='' if fmt == 'csv' else None)
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_num, line in enumerate(text, start=1):
+        if line.strip():
+            try:
+                yield line_num, json.loads(line)
+            except ValueError:
+                yield line_num, None
+
+
+def _upsert(session, kind, rows):
+    """批量插入，主键已存在时更新（MySQL ON DUPLICATE KEY / SQLite ON CONFLICT）"""
+    dialect = session.get_bind().dialect.name
+    columns = [column for column in rows[0] if column not in kind.keys]
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(kind.table)
+        stmt = stmt.on_duplicate_key_update({column: stmt.inserted[column] for column in columns})
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(kind.table)
+        stmt = stmt.on_conflict_do_update(index_elements=kind.keys,
+                                          set_={column: stmt.excluded[column] for column in columns})
+    else:
+        raise ValueError(f'不支持的数据库类型：{dialect}')
+    session.execute(stmt, rows)
+
+
+class _Lookups:
+    """导入开始时一次性加载的名称 -> ID 映射，校验时不再逐行查询"""
+
+    def __init__(self, session, kind_name):
+        self.dishes = {}
+        self.ingredients = {}
+        self.canteen_ids = set()
+        self.file_dish_names = {}  # 本次文件中出现过的规范化菜名 -> (dish_id, 行号)
+        if kind_name in ('dishes', 'dish_ingredients'):
+            self.dishes = {key: dish_id for dish_id, key in session.query(Dish.dish_id, Dish.name_normalized)}
+        if kind_name == 'dishes':
+            # 外键在写入前校验：否则坏数据会在中途的某一批报错，之前的批次已经提交
+            self.canteen_ids = {canteen_id for (canteen_id,) in session.query(Canteen.canteen_id)}
+        if kind_name in ('dish_ingredients', 'nutrition_facts'):
+            for ingredient_id, name in session.query(Ingredient.ingredient_id, Ingredient.ingredient_name):
+                self.ingredients[name.strip()] = ingredient_id
+        self.ingredient_ids = set(self.ingredients.values())
+        self.dish_ids = set(self.dishes.values())
+
+
+def _validate(kind_name, kind, record, lookups, line=None):
+    """把一行输入转换为可写入的字典，不合法时抛出 ValueError"""
+    record = {key: value for key, value in record.items() if key is not None}
+    if kind_name in ('dish_ingredients', 'nutrition_facts') and not record.get('ingredient_id'):
+        name = (record.get('ingredient_name') or '').strip()
+        if name not in lookups.ingredients:
+            raise ValueError(f'配料不存在：{name}')
+        record['ingredient_id'] = lookups.ingredients[name]
+    if kind_name == 'dish_ingredients' and not record.get('dish_id'):
+        name = normalize_dish_name(record.get('dish_name'))
+        if name not in lookups.dishes:
+            raise ValueError(f'菜品不存在：{record.get("dish_name")}')
+        record['dish_id'] = lookups.dishes[name]
+
+    row = {}
+    for column, (convert, required) in kind.fields.items():
+        value = record.get(column)
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == '':
+            if required:
+                raise ValueError(f'缺少字段 {column}')
+            row[column] = None
+            continue
+        try:
+            row[column] = convert(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'字段 {column} 的值无效：{value}')
+
+    if kind_name == 'dish_ingredients':
+        if row['dish_id'] not in lookups.dish_ids:
+            raise ValueError(f'菜品不存在：{row["dish_id"]}')
+        if row['ingredient_id'] not in lookups.ingredient_ids:
+            raise ValueError(f'配料不存在：{row["ingredient_id"]}')
+    elif kind_name == 'nutrition_facts' and row['ingredient_id'] not in lookups.ingredient_ids:
+        raise ValueError(f'配料不存在：{row["ingredient_id"]}')
+    elif kind_name == 'dishes':
+        # Core 写入不经过 @validates，规范化菜名在这里同步
+        key = normalize_dish_name(row['name'])
+        # name_normalized 唯一：MySQL 的 upsert 会在该索引冲突时改写另一道菜，SQLite 则直接报错，
+        # 因此与其他菜品重名（文件内或库中已有）的行作为错误跳过
+        seen = lookups.file_dish_names.get(key)
+        if seen is not None and seen[0] != row['dish_id']:
+            raise ValueError(f'菜名与第 {seen[1]} 行的菜品 {seen[0]} 重复：{row["name"]}')
+        existing = lookups.dishes.get(key)
+        if existing is not None and existing != row['dish_id']:
+            raise ValueError(f'菜名已被菜品 {existing} 使用：{row["name"]}')
+        if row['canteen_id'] is not None and row['canteen_id'] not in lookups.canteen_ids:
+            raise ValueError(f'食堂不存在：{row["canteen_id"]}')
+        # 随导入更新名称映射：改名释放的旧名称可以被后面的行使用，新名称之后视为已占用
+        for old_key in [k for k, dish_id in lookups.dishes.items() if dish_id == row['dish_id'] and k != key]:
+            del lookups.dishes[old_key]
+        lookups.dishes[key] = row['dish_id']
+        lookups.file_dish_names[key] = (row['dish_id'], line)
+        row['name_normalized'] = key
+    return row
+
+
+def import_records(session, kind_name, records, chunk_size=CHUNK_SIZE, dry_run=False):
+    """校验并分批导入 (行号, 字典) 序列，每批一条 upsert 语句并提交
+
+    不合法的行跳过并记录在结果中。Core 写入不触发 ORM 事件，全部写入后再统一
+    重建受影响菜品的营养成分表，进程内的营养计算与菜品解析缓存在提交后失效。
+    """
+    kind = IMPORT_KINDS[kind_name]
+    result = ImportResult(kind_name)
+    lookups = _Lookups(session, kind_name)
+    started = time.perf_counter()
+
+    batch = {}  # 主键 -> 行；同一批内重复的主键以最后一行为准
+    changed_dishes = set()
+    changed_ingredients = set()
+
+    def write():
+        rows = list(batch.values())
+        batch.clear()
+        if dry_run or not rows:
+            result.imported += len(rows)
+            return
+        _upsert(session, kind, rows)
+        session.commit()
+        if kind_name in ('dishes', 'dish_ingredients'):
+            changed_dishes.update(row['dish_id'] for row in rows)
+        elif kind_name in ('ingredients', 'nutrition_facts'):
+            changed_ingredients.update(row['ingredient_id'] for row in rows)
+        result.imported += len(rows)
+
+    for line, record in records:
+        result.rows += 1
+        if not isinstance(record, dict):
+            result.error(line, '无法解析该行')
+            continue
+        try:
+            row = _validate(kind_name, kind, record, lookups, line)
+        except ValueError as e:
+            result.error(line, str(e))
+            continue
+        batch[tuple(row[key] for key in kind.keys)] = row
+        if len(batch) >= chunk_size:
+            write()
+    write()
+
+    # 全部写入后统一重建一次派生的营养成分表；涉及范围较大时直接全量重建
+    if changed_dishes or changed_ingredients:
+        if len(changed_dishes) + len(changed_ingredients) > FULL_REBUILD_THRESHOLD:
+            rebuild_dish_nutrition(session)
+            mark_nutrition_data_changed(session)
+        else:
+            mark_nutrition_data_changed(session, dish_ids=changed_dishes, ingredient_ids=changed_ingredients)
+        session.commit()
+
+    result.seconds = time.perf_counter() - started
+    return result
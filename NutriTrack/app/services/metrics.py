@@ -0,0 +1,313 @@
+# app/services/metrics.py - 进程内的性能指标：请求耗时、SQL 统计、计时区段与队列深度
+#
+# 指标只在当前进程内累计；多进程部署时需分别抓取每个工作进程，或在上游汇总。
+# METRICS_ENABLED 关闭时不注册任何请求钩子和 SQL 事件，span() 返回共享的空上下文。
+
+import bisect
+import contextlib
+import threading
+import time
+
+from flask import request
+from sqlalchemy import event
+
+# 直方图桶上界（秒）：Prometheus 客户端的默认值，另加 1ms、2.5ms 两档以区分亚毫秒级的区段
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class Histogram:
+    """固定桶的耗时直方图（非线程安全，由 Metrics 加锁）"""
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一格为 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """按桶内线性插值估计分位数（秒），不超过实际观测到的最大值"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if index == len(self.buckets):
+                    return self.max
+                lower = self.buckets[index - 1] if index else 0.0
+                return min(lower + (self.buckets[index] - lower) * (rank - seen) / count, self.max)
+            seen += count
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(self.sum / self.count * 1000, 3) if self.count else 0.0,
+            'p50_ms': round(self.quantile(0.5) * 1000, 3),
+            'p95_ms': round(self.quantile(0.95) * 1000, 3),
+            'p99_ms': round(self.quantile(0.99) * 1000, 3),
+            'max_ms': round(self.max * 1000, 3)
+        }
+
+
+class _RequestState:
+    __slots__ = ('start', 'sql_count', 'sql_seconds')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+
+
+class _Span:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe_span(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """请求耗时直方图、每个接口的 SQL 条数与耗时、命名计时区段"""
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._requests = {}   # (endpoint, method) -> Histogram
+            self._statuses = {}   # (endpoint, method, status) -> 次数
+            self._sql = {}        # endpoint -> [条数, 秒]
+            self._sql_total = [0, 0.0]  # 包括后台线程中的 SQL
+            self._spans = {}      # name -> Histogram
+            self.started_at = time.time()
+
+    # ---------------------- 计时区段 ----------------------
+    def span(self, name):
+        """with metrics.span('detect.inference'): ...；未启用时几乎没有开销"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def observe_span(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._spans.get(name)
+            if histogram is None:
+                histogram = self._spans[name] = Histogram()
+            histogram.observe(seconds)
+
+    # ---------------------- 请求 ----------------------
+    def begin_request(self):
+        self._local.state = _RequestState()
+
+    def end_request(self, endpoint, method, status):
+        state = getattr(self._local, 'state', None)
+        if state is None:
+            return
+        self._local.state = None
+        elapsed = time.perf_counter() - state.start
+        with self._lock:
+            histogram = self._requests.get((endpoint, method))
+            if histogram is None:
+                histogram = self._requests[(endpoint, method)] = Histogram()
+            histogram.observe(elapsed)
+            key = (endpoint, method, status)
+            self._statuses[key] = self._statuses.get(key, 0) + 1
+            sql = self._sql.setdefault(endpoint, [0, 0.0])
+            sql[0] += state.sql_count
+            sql[1] += state.sql_seconds
+
+    def discard_request(self):
+        self._local.state = None
+
+    # ---------------------- SQL ----------------------
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled:
+            context._metrics_start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, '_metrics_start', None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        state = getattr(self._local, 'state', None)
+        if state is not None:
+            state.sql_count += 1
+            state.sql_seconds += elapsed
+        with self._lock:
+            self._sql_total[0] += 1
+            self._sql_total[1] += elapsed
+
+    def instrument_engine(self, engine):
+        if not event.contains(engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    # ---------------------- 输出 ----------------------
+    def snapshot(self, gauges=()):
+        """JSON 格式的全部指标"""
+        with self._lock:
+            routes = {}
+            for (endpoint, method), histogram in sorted(self._requests.items()):
+                entry = histogram.to_dict()
+                sql_count, sql_seconds = self._sql.get(endpoint, (0, 0.0))
+                calls = sum(h.count for (e, _), h in self._requests.items() if e == endpoint)
+                entry['sql_queries_per_request'] = round(sql_count / calls, 2) if calls else 0.0
+                entry['sql_ms_per_request'] = round(sql_seconds / calls * 1000, 3) if calls else 0.0
+                entry['statuses'] = {str(status): n for (e, m, status), n in self._statuses.items()
+                                     if e == endpoint and m == method}
+                routes[f'{method} {endpoint}'] = entry
+            return {
+                'uptime': round(time.time() - self.started_at, 1),
+                'routes': routes,
+                'sql': {'queries': self._sql_total[0], 'total_ms': round(self._sql_total[1] * 1000, 3)},
+                'spans': {name: histogram.to_dict() for name, histogram in sorted(self._spans.items())},
+                'gauges': {name: value for name, _, _, value in gauges}
+            }
+
+    def render_prometheus(self, gauges=(), prefix='nutritrack'):
+        """Prometheus 文本格式（0.0.4）"""
+        lines = []
+        with self._lock:
+            _histogram_lines(lines, f'{prefix}_http_request_duration_seconds', '请求处理耗时',
+                             [({'endpoint': e, 'method': m}, h) for (e, m), h in sorted(self._requests.items())])
+
+            name = f'{prefix}_http_requests_total'
+            lines += [f'# HELP {name} 请求次数（按状态码）', f'# TYPE {name} counter']
+            for (endpoint, method, status), count in sorted(self._statuses.items()):
+                lines.append(f'{name}{_labels(endpoint=endpoint, method=method, status=status)} {count}')
+
+            name = f'{prefix}_sql_queries_total'
+            lines += [f'# HELP {name} 请求内执行的 SQL 条数', f'# TYPE {name} counter']
+            for endpoint, (count, _) in sorted(self._sql.items()):
+                lines.append(f'{name}{_labels(endpoint=endpoint)} {count}')
+
+            name = f'{prefix}_sql_duration_seconds_total'
+            lines += [f'# HELP {name} 请求内 SQL 的累计耗时', f'# TYPE {name} counter']
+            for endpoint, (_, seconds) in sorted(self._sql.items()):
+                lines.append(f'{name}{_labels(endpoint=endpoint)} {seconds:.6f}')
+
+            # 进程内全部 SQL（含后台线程），与上面按接口的统计分开，避免聚合时重复计算
+            name = f'{prefix}_sql_process_queries_total'
+            lines += [f'# HELP {name} 进程内执行的全部 SQL 条数', f'# TYPE {name} counter',
+                      f'{name} {self._sql_total[0]}']
+            name = f'{prefix}_sql_process_duration_seconds_total'
+            lines += [f'# HELP {name} 进程内全部 SQL 的累计耗时', f'# TYPE {name} counter',
+                      f'{name} {self._sql_total[1]:.6f}']
+
+            _histogram_lines(lines, f'{prefix}_span_duration_seconds', '命名计时区段耗时',
+                             [({'span': n}, h) for n, h in sorted(self._spans.items())])
+
+        for gauge_name, kind, help_text, value in gauges:
+            name = f'{prefix}_{gauge_name}'
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {value}']
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _histogram_lines(lines, name, help_text, series):
+    lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for labels, histogram in series:
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{_labels(**labels, le=bound)} {cumulative}')
+        lines.append(f'{name}_bucket{_labels(**labels, le="+Inf")} {histogram.count}')
+        lines.append(f'{name}_sum{_labels(**labels)} {histogram.sum:.6f}')
+        lines.append(f'{name}_count{_labels(**labels)} {histogram.count}')
+
+
+def collect_gauges(app):
+    """当前的队列深度等瞬时值：[(名称, 类型, 说明, 值)]；只读取已创建的组件，不会触发初始化"""
+    gauges = []
+    batcher = app.extensions.get('inference_batcher')
+    gauges.append(('inference_queue_depth', 'gauge', '等待推理的请求数',
+                   batcher.queue_depth if batcher is not None else 0))
+    if batcher is not None:
+        gauges.append(('inference_batches_total', 'counter', '已执行的推理批次数', batcher.batch_count))
+        gauges.append(('inference_batch_items_total', 'counter', '已推理的图片数', batcher.item_count))
+
+    cache = app.extensions.get('detect_result_cache')
+    if cache is not None:
+        stats = cache.stats()
+        gauges.append(('detect_result_cache_entries', 'gauge', '识别结果缓存条目数', stats['entries']))
+        gauges.append(('detect_result_cache_hits_total', 'counter', '识别结果缓存命中次数', stats['hits']))
+
+    ingestor = app.extensions.get('weight_ingestor')
+    if ingestor is not None:
+        stats = ingestor.stats()
+        gauges.append(('plate_ingest_buffered', 'gauge', '等待写入的重量采样数', stats['buffered']))
+    return gauges
+
+
+# 进程内共享的指标
+metrics = Metrics()
+
+
+def span(name):
+    """命名计时区段，结果计入 /admin/metrics 的 spans"""
+    return metrics.span(name)
+
+
+def observe_span(name, seconds):
+    """记录一段已经测得的耗时（秒）"""
+    metrics.observe_span(name, seconds)
+
+
+def _before_request():
+    metrics.begin_request()
+
+
+def _after_request(response):
+    rule = request.url_rule
+    metrics.end_request(rule.endpoint if rule is not None else 'unmatched', request.method, response.status_code)
+    return response
+
+
+def _teardown_request(exc):
+    metrics.discard_request()
+
+
+def init_metrics(app):
+    """METRICS_ENABLED 时注册请求钩子与 SQL 事件；流式响应只统计到响应对象返回为止"""
+    # 指标对象是进程内共享的：同一进程中后创建的应用（测试、基准）关闭指标时也要同步关闭
+    metrics.enabled = app.config['METRICS_ENABLED']
+    if not metrics.enabled:
+        return
+    from app import db
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    with app.app_context():
+        metrics.instrument_engine(db.engine)
@@ -0,0 +1,75 @@
+# app/services/model_registry.py - 进程级YOLO模型注册表
+
+import os
+import threading
+
+import numpy as np
+from ultralytics import YOLO
+
+from app.services.metrics import span
+
+
+class LoadedModel:
+    """已加载的模型及其元数据"""
+
+    def __init__(self, model_path, model, mtime):
+        self.model_path = model_path
+        self.model = model
+        self.mtime = mtime
+        # model.names 在模型生命周期内不变，缓存一份普通字典
+        self.names = dict(model.names)
+        # 以文件修改时间作为模型版本号，供结果缓存等使用
+        self.version = f"{os.path.basename(model_path)}@{int(mtime)}"
+        # ultralytics 的 predictor 不是线程安全的，同一模型的推理需串行
+        self.lock = threading.Lock()
+
+    def predict(self, source, **kwargs):
+        """执行推理（线程安全）"""
+        with self.lock:
+            return self.model(source, verbose=False, **kwargs)
+
+
+class ModelRegistry:
+    """按模型路径懒加载、预热并复用YOLO模型；模型文件更新后自动重新加载"""
+
+    def __init__(self, warmup_size=640):
+        self.warmup_size = warmup_size
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_path):
+        """获取已加载的模型；文件不存在时抛出 FileNotFoundError"""
+        mtime = os.path.getmtime(model_path)
+
+        entry = self._entries.get(model_path)
+        if entry is not None and entry.mtime == mtime:
+            return entry
+
+        with self._lock:
+            # 双重检查，避免并发请求重复加载
+            entry = self._entries.get(model_path)
+            if entry is None or entry.mtime != mtime:
+                entry = self._load(model_path, mtime)
+                self._entries[model_path] = entry
+        return entry
+
+    def clear(self):
+        """清空已加载的模型"""
+        with self._lock:
+            self._entries.clear()
+
+    def _load(self, model_path, mtime):
+        with span('model.load'):
+            model = YOLO(model_path)
+            entry = LoadedModel(model_path, model, mtime)
+
+        # 用空白图片预热一次，触发层融合与内存分配
+        if self.warmup_size:
+            with span('model.warmup'):
+                dummy = np.zeros((self.warmup_size, self.warmup_size, 3), dtype=np.uint8)
+                entry.predict(dummy, imgsz=self.warmup_size)
+        return entry
+
+
+# 进程内共享的模型注册表
+model_registry = ModelRegistry()
@@ -0,0 +1,131 @@
+# app/services/nutrition_engine.py - 内存中的向量化营养计算引擎
+
+import threading
+import time
+
+import numpy as np
+
+from app.models.food import Dish, normalize_dish_name
+from app.services.metrics import span
+from app.services.nutrition_table import compute_dish_nutrition, on_nutrition_data_committed
+
+MACROS = ('calories', 'protein', 'fat', 'carb')
+
+
+class _Snapshot:
+    """一次加载得到的只读数据，整体替换以保证并发读取的一致性"""
+
+    def __init__(self, index, matrix, loaded_at):
+        self.index = index    # 规范化菜名 -> 矩阵行号
+        self.matrix = matrix  # (菜品数 + 1) x 4，每克营养含量，最后一行全 0
+        self.loaded_at = loaded_at
+
+
+class NutritionEngine:
+    """菜品 × 营养素矩阵（每克热量、蛋白质、脂肪、碳水）
+
+    一次性从配方和营养成分表加载，之后的营养计算不访问数据库。
+    配方变更提交后自动失效；也可调用 invalidate() / refresh() 显式控制。
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """标记数据已过期，下一次计算前重新加载"""
+        self._snapshot = None
+
+    def refresh(self, session):
+        """立即从数据库重新加载"""
+        with span('nutrition.refresh'):
+            return self._load(session)
+
+    def _load(self, session):
+        per_100g = compute_dish_nutrition(session)
+
+        index = {}
+        rows = []
+        for dish_id, key in session.query(Dish.dish_id, Dish.name_normalized):
+            nutrition = per_100g.get(dish_id)
+            if nutrition is None or nutrition['recipe_weight_g'] <= 0:
+                index[key] = -1  # 无配方：营养计为 0
+                continue
+            index[key] = len(rows)
+            rows.append([nutrition[macro] / 100 for macro in MACROS])
+
+        matrix = np.zeros((len(rows) + 1, len(MACROS)), dtype=np.float64)
+        if rows:
+            matrix[:-1] = rows
+
+        snapshot = _Snapshot(index, matrix, time.monotonic())
+        self._snapshot = snapshot
+        return snapshot
+
+    def snapshot(self, session, ttl=None):
+        snapshot = self._snapshot
+        if snapshot is not None and (not ttl or time.monotonic() - snapshot.loaded_at < ttl):
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or (ttl and time.monotonic() - snapshot.loaded_at >= ttl):
+                snapshot = self.refresh(session)
+        return snapshot
+
+    def calculate(self, session, dishes, ttl=None):
+        """计算一餐的营养，返回 (total, details)
+
+        dishes 为 [{'dish_name': ..., 'weight': ...}]；找不到或无配方的菜品营养为 0。
+        与逐条计算相同：每道菜四舍五入保留1位小数，总计为各菜品取整后之和再取整。
+        """
+        return self.calculate_many(session, [dishes], ttl)[0]
+
+    def calculate_many(self, session, meals, ttl=None):
+        """批量计算多餐的营养，返回与 meals 对应的 [(total, details)]
+
+        所有餐的菜品合并为一次向量化计算，相同菜名只解析一次。
+        """
+        snapshot = self.snapshot(session, ttl)
+        with span('nutrition.calculate'):
+            return self._calculate(snapshot, meals)
+
+    def _calculate(self, snapshot, meals):
+        names = []
+        weights = []
+        for dishes in meals:
+            for dish in dishes:
+                names.append(dish.get('dish_name', ''))
+                weights.append(float(dish.get('weight', 0)))
+
+        # 每个不同的菜名只查一次索引
+        rows_by_name = {}
+        for name in names:
+            if name not in rows_by_name:
+                rows_by_name[name] = snapshot.index.get(normalize_dish_name(name), -1)
+        rows = np.fromiter((rows_by_name[name] for name in names), dtype=np.intp, count=len(names))
+
+        # 行号 -1 指向最后的全 0 行；一次向量化乘法得到每道菜的四项营养
+        values = (snapshot.matrix[rows] * np.asarray(weights, dtype=np.float64)[:, None]).tolist()
+
+        results = []
+        offset = 0
+        for dishes in meals:
+            total = dict.fromkeys(MACROS, 0.0)
+            details = []
+            for i in range(offset, offset + len(dishes)):
+                single_dish = {'dish_name': names[i], 'weight': weights[i]}
+                for macro, value in zip(MACROS, values[i]):
+                    single_dish[macro] = round(value, 1)
+                    total[macro] += single_dish[macro]
+                details.append(single_dish)
+            offset += len(dishes)
+
+            for macro in MACROS:
+                total[macro] = round(total[macro], 1)
+            results.append((total, details))
+        return results
+
+
+# 进程内共享的营养计算引擎
+nutrition_engine = NutritionEngine()
+on_nutrition_data_committed(nutrition_engine.invalidate)
@@ -0,0 +1,163 @@
+# app/services/nutrition_table.py - 菜品每100g营养成分表的计算与增量维护
+
+from datetime import datetime
+
+from sqlalchemy import case, event, func
+from sqlalchemy.orm import Session
+
+from app.models.food import Dish, DishIngredient, DishNutrition, Ingredient, NutritionFacts
+
+# session.info 中记录待重建的菜品/配料ID
+_DIRTY_DISHES = 'dish_nutrition_dirty_dishes'
+_DIRTY_INGREDIENTS = 'dish_nutrition_dirty_ingredients'
+# 本次事务是否修改了菜品/配方/营养数据（提交后使内存缓存失效）
+_CHANGED = 'nutrition_data_changed'
+
+# 菜品/配方/营养数据变更提交后需要调用的失效回调
+_invalidation_callbacks = []
+
+
+def on_nutrition_data_committed(callback):
+    """注册回调：菜品、配方或营养成分的变更提交后调用（无参数）"""
+    _invalidation_callbacks.append(callback)
+    return callback
+
+
+def mark_nutrition_data_changed(session, dish_ids=(), ingredient_ids=()):
+    """登记绕过 ORM 的批量写入（Core insert/update 不触发 flush 事件）
+
+    提交时与 ORM 变更一样重建受影响菜品的营养成分行，并在提交后使内存缓存失效。
+    """
+    session.info[_CHANGED] = True
+    session.info.setdefault(_DIRTY_DISHES, set()).update(dish_ids)
+    session.info.setdefault(_DIRTY_INGREDIENTS, set()).update(ingredient_ids)
+
+
+def compute_dish_nutrition(session, dish_ids=None):
+    """用一条聚合查询计算菜品每100g营养成分
+
+    与逐条计算的口径一致：配方总重量包含全部配料，营养成分只累加同时存在
+    配料信息和营养成分信息的配料。返回 {dish_id: dict}，无配方的菜品不返回。
+    """
+    # 配料或营养成分缺失时 CASE 返回 NULL，SUM 会忽略它
+    has_facts = Ingredient.ingredient_id.isnot(None) & NutritionFacts.ingredient_id.isnot(None)
+
+    def weighted(column):
+        return func.sum(case((has_facts, DishIngredient.amount_g * column)))
+
+    query = session.query(
+        DishIngredient.dish_id,
+        func.sum(DishIngredient.amount_g),
+        weighted(NutritionFacts.energy_kcal),
+        weighted(NutritionFacts.protein_g),
+        weighted(NutritionFacts.fat_g),
+        weighted(NutritionFacts.carb_g)
+    ).outerjoin(
+        Ingredient, Ingredient.ingredient_id == DishIngredient.ingredient_id
+    ).outerjoin(
+        NutritionFacts, NutritionFacts.ingredient_id == DishIngredient.ingredient_id
+    ).group_by(DishIngredient.dish_id)
+
+    if dish_ids is not None:
+        query = query.filter(DishIngredient.dish_id.in_(dish_ids))
+
+    table = {}
+    for dish_id, total, energy, protein, fat, carb in query:
+        total = total or 0.0
+        row = {
+            'dish_id': dish_id,
+            'recipe_weight_g': total,
+            'calories': 0.0,
+            'protein': 0.0,
+            'fat': 0.0,
+            'carb': 0.0
+        }
+        if total > 0:
+            # sum(amount_g / total * 100 * 营养值 / 100) = sum(amount_g * 营养值) / total
+            row['calories'] = (energy or 0.0) / total
+            row['protein'] = (protein or 0.0) / total
+            row['fat'] = (fat or 0.0) / total
+            row['carb'] = (carb or 0.0) / total
+        table[dish_id] = row
+    return table
+
+
+def rebuild_dish_nutrition(session, dish_ids=None):
+    """重建指定菜品（默认全部）的每100g营养成分行，返回重建的菜品数"""
+    if dish_ids is not None:
+        dish_ids = list(dish_ids)
+        if not dish_ids:
+            return 0
+
+    rows = compute_dish_nutrition(session, dish_ids)
+
+    # 菜品可能已被删除，只为仍然存在的菜品写入
+    existing = session.query(Dish.dish_id)
+    if dish_ids is not None:
+        existing = existing.filter(Dish.dish_id.in_(dish_ids))
+    existing = {dish_id for dish_id, in existing}
+
+    now = datetime.now()
+    mappings = [dict(row, updated_at=now) for dish_id, row in rows.items() if dish_id in existing]
+
+    delete = session.query(DishNutrition)
+    if dish_ids is not None:
+        delete = delete.filter(DishNutrition.dish_id.in_(dish_ids))
+    delete.delete(synchronize_session=False)
+    if mappings:
+        session.bulk_insert_mappings(DishNutrition, mappings)
+    return len(dish_ids) if dish_ids is not None else len(existing)
+
+
+def dishes_using_ingredients(session, ingredient_ids):
+    """查询使用了指定配料的菜品ID"""
+    if not ingredient_ids:
+        return set()
+    rows = session.query(DishIngredient.dish_id).filter(
+        DishIngredient.ingredient_id.in_(list(ingredient_ids))
+    ).distinct()
+    return {dish_id for dish_id, in rows}
+
+
+# ====================== 增量维护 ======================
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    """记录本次事务中配方、配料、营养成分的变更"""
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Dish, DishIngredient, Ingredient, NutritionFacts)):
+            session.info[_CHANGED] = True
+
+        if isinstance(obj, DishIngredient):
+            session.info.setdefault(_DIRTY_DISHES, set()).add(obj.dish_id)
+        elif isinstance(obj, (NutritionFacts, Ingredient)):
+            session.info.setdefault(_DIRTY_INGREDIENTS, set()).add(obj.ingredient_id)
+        elif isinstance(obj, Dish) and obj in session.deleted:
+            session.info.setdefault(_DIRTY_DISHES, set()).add(obj.dish_id)
+
+
+@event.listens_for(Session, 'before_commit')
+def _rebuild_changed(session):
+    """提交前在同一事务内重建受影响菜品的营养成分行"""
+    # 先 flush，确保尚未写出的变更也被 after_flush 收集到
+    session.flush()
+
+    dish_ids = session.info.pop(_DIRTY_DISHES, set())
+    ingredient_ids = session.info.pop(_DIRTY_INGREDIENTS, set())
+    dish_ids |= dishes_using_ingredients(session, ingredient_ids)
+    dish_ids.discard(None)
+    if dish_ids:
+        rebuild_dish_nutrition(session, dish_ids)
+
+
+@event.listens_for(Session, 'after_commit')
+def _notify_committed(session):
+    if session.info.pop(_CHANGED, False):
+        for callback in _invalidation_callbacks:
+            callback()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _reset_changes(session):
+    session.info.pop(_DIRTY_DISHES, None)
+    session.info.pop(_DIRTY_INGREDIENTS, None)
+    session.info.pop(_CHANGED, None)
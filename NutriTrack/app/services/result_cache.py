@@ -0,0 +1,115 @@
+# app/services/result_cache.py - 基于感知哈希的识别结果缓存
+
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image
+
+
+def dhash(image, hash_size=8):
+    """计算图片的差值哈希（64 位整数）
+
+    先转灰度并缩小到 (hash_size + 1) x hash_size，比较相邻像素亮度，
+    对轻微的缩放、压缩和曝光变化不敏感，适合识别重拍或重复上传的餐盘照片。
+    """
+    small = image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+class DetectionResultCache:
+    """识别结果缓存，键为 (模型版本, 置信度阈值, 图片哈希)
+
+    max_distance > 0 时，汉明距离不超过该值的近似图片也视为命中。
+    按 LRU 淘汰，条目超过 ttl 秒后失效。
+    """
+
+    def __init__(self, max_entries=512, ttl=600, max_distance=4):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self._entries = OrderedDict()  # key -> (items, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model_version, conf, image_hash):
+        """查找缓存；未命中返回 None"""
+        now = time.monotonic()
+        with self._lock:
+            key = self._find(model_version, conf, image_hash, now)
+            if key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            items = self._entries[key][0]
+        # 返回副本，调用方修改结果不会污染缓存
+        return [dict(item) for item in items]
+
+    def put(self, model_version, conf, image_hash, items):
+        key = (model_version, conf, image_hash)
+        with self._lock:
+            self._entries[key] = ([dict(item) for item in items], time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0
+        }
+
+    def _find(self, model_version, conf, image_hash, now):
+        key = (model_version, conf, image_hash)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[1] > now:
+                return key
+            del self._entries[key]
+
+        if self.max_distance <= 0:
+            return None
+
+        # 近似匹配：在同一模型版本与阈值下找汉明距离最小的条目
+        best_key, best_distance = None, self.max_distance + 1
+        expired = []
+        for candidate, (_, expires_at) in self._entries.items():
+            if candidate[0] != model_version or candidate[1] != conf:
+                continue
+            if expires_at <= now:
+                expired.append(candidate)
+                continue
+            distance = (candidate[2] ^ image_hash).bit_count()
+            if distance < best_distance:
+                best_key, best_distance = candidate, distance
+        for candidate in expired:
+            del self._entries[candidate]
+        return best_key
+
+
+def get_result_cache(app):
+    """获取应用对应的识别结果缓存（每个进程一个）"""
+    cache = app.extensions.get('detect_result_cache')
+    if cache is None:
+        cache = DetectionResultCache(
+            max_entries=app.config['DETECT_CACHE_SIZE'],
+            ttl=app.config['DETECT_CACHE_TTL'],
+            max_distance=app.config['DETECT_CACHE_MAX_DISTANCE']
+        )
+        cache = app.extensions.setdefault('detect_result_cache', cache)
+    return cache
@@ -0,0 +1,73 @@
+# app/services/time_buckets.py - 按小时/天/周/月分桶的时间聚合工具
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+BUCKETS = ('hour', 'day', 'week', 'month')
+
+# 桶的标签统一为桶起始时间的字符串，SQL 与 Python 两侧格式一致
+_LABEL_FORMATS = {
+    'hour': '%Y-%m-%d %H:00',
+    'day': '%Y-%m-%d',
+    'week': '%Y-%m-%d',   # 周一
+    'month': '%Y-%m-01'
+}
+
+
+def bucket_expr(column, bucket, dialect):
+    """返回把时间列转换为桶标签字符串的 SQL 表达式（支持 MySQL 与 SQLite）"""
+    if bucket not in BUCKETS:
+        raise ValueError(f'不支持的时间粒度：{bucket}')
+
+    if dialect == 'mysql':
+        if bucket == 'week':
+            return func.date_format(func.subdate(column, func.weekday(column)), _LABEL_FORMATS['day'])
+        return func.date_format(column, _LABEL_FORMATS[bucket])
+
+    if dialect == 'sqlite':
+        if bucket == 'week':
+            # 'weekday 0' 前进到周日（当天是周日则不变），再回退 6 天即为周一
+            return func.date(column, 'weekday 0', '-6 days')
+        return func.strftime(_LABEL_FORMATS[bucket], column)
+
+    raise ValueError(f'不支持的数据库类型：{dialect}')
+
+
+def bucket_start(value, bucket):
+    """value 所在桶的起始时间"""
+    if bucket == 'hour':
+        return value.replace(minute=0, second=0, microsecond=0)
+    day = datetime(value.year, value.month, value.day)
+    if bucket == 'day':
+        return day
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    raise ValueError(f'不支持的时间粒度：{bucket}')
+
+
+def next_bucket(start, bucket):
+    """下一个桶的起始时间"""
+    if bucket == 'hour':
+        return start + timedelta(hours=1)
+    if bucket == 'day':
+        return start + timedelta(days=1)
+    if bucket == 'week':
+        return start + timedelta(days=7)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def bucket_label(start, bucket):
+    return start.strftime(_LABEL_FORMATS[bucket])
+
+
+def iter_buckets(start, end, bucket):
+    """覆盖半开区间 [start, end) 的所有桶起始时间"""
+    current = bucket_start(start, bucket)
+    while current < end:
+        yield current
+        current = next_bucket(current, bucket)
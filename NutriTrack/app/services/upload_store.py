@@ -0,0 +1,160 @@
+# app/services/upload_store.py - 按内容寻址的上传图片存储与过期清理
+
+import hashlib
+import os
+import threading
+import time
+
+from app.services.image_pipeline import save_original, save_thumbnail
+
+# PIL 格式名 -> 原图扩展名
+_EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp', 'BMP': '.bmp', 'GIF': '.gif'}
+
+
+class UploadStore:
+    """以内容的 sha256 为键保存上传图片
+
+    原图保存在 originals/ab/cd/<sha256>.<ext>，缩略图保存在 thumbs/ab/cd/<sha256>.jpg，
+    按哈希前缀分两级子目录。相同内容只写一次，再次上传时只刷新修改时间（用于过期清理）。
+    """
+
+    def __init__(self, root, url_prefix, thumb_size=320, thumb_quality=80):
+        self.root = root
+        self.url_prefix = url_prefix.rstrip('/')
+        self.thumb_size = thumb_size
+        self.thumb_quality = thumb_quality
+
+    @staticmethod
+    def make_key(data, image_format=None):
+        return hashlib.sha256(data).hexdigest() + _EXTENSIONS.get(image_format, '.jpg')
+
+    @staticmethod
+    def _relative(kind, key):
+        return f'{kind}/{key[:2]}/{key[2:4]}/{key}'
+
+    def _thumb_relative(self, key):
+        return self._relative('thumbs', os.path.splitext(key)[0] + '.jpg')
+
+    def original_url(self, key):
+        return f'{self.url_prefix}/{self._relative("originals", key)}'
+
+    def thumb_url(self, key):
+        return f'{self.url_prefix}/{self._thumb_relative(key)}'
+
+    def put(self, key, data=None, image=None):
+        """保存原图（传入 data 时）与缩略图（传入 image 时），已存在的文件不重复写入"""
+        if data is not None:
+            self._write(self._relative('originals', key), lambda path: save_original(data, path))
+        if image is not None:
+            self._write(self._thumb_relative(key),
+                        lambda path: save_thumbnail(image, path, self.thumb_size, self.thumb_quality))
+
+    def _write(self, relative, writer):
+        path = os.path.join(self.root, relative)
+        try:
+            os.utime(path)
+            return
+        except FileNotFoundError:
+            # 不存在，或刚被清理删除：重新写入
+            pass
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再原子替换，并发写入同一内容也不会留下不完整的文件
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            writer(tmp)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def sweep(self, max_age_days=None, max_bytes=None):
+        """删除超过保留天数的文件，总大小仍超过配额时按修改时间从旧到新删除
+
+        返回 (删除的文件数, 释放的字节数)。其它进程同时清理时已被删除的文件直接跳过。
+        """
+        now = time.time()
+        files = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        removed = freed = 0
+        total = sum(size for _, size, _ in files)
+        files.sort()
+        for mtime, size, path in files:
+            expired = max_age_days is not None and now - mtime > max_age_days * 86400
+            over_quota = max_bytes is not None and total > max_bytes
+            if not (expired or over_quota):
+                # 已按时间排序：之后的文件更新，且总量已在配额内
+                break
+            try:
+                # 扫描之后又被上传刷新过的文件保留
+                if os.stat(path).st_mtime != mtime:
+                    continue
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            else:
+                removed += 1
+                freed += size
+            total -= size
+        return removed, freed
+
+
+class RetentionSweeper:
+    """后台线程定期执行 UploadStore.sweep，不占用请求线程
+
+    只应在一个进程中启用（UPLOAD_SWEEP_INTERVAL），否则每个 Web 工作进程都会重复扫描整个目录；
+    多进程部署推荐改用定时任务执行 flask sweep-uploads。
+    """
+
+    def __init__(self, store, interval, max_age_days, max_bytes, logger=None):
+        self.store = store
+        self.interval = interval
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        self.logger = logger
+        self.last_run = None
+        self.last_result = None
+        self._thread = threading.Thread(target=self._run, name='upload-sweeper', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.last_result = self.store.sweep(self.max_age_days, self.max_bytes)
+                self.last_run = time.time()
+            except Exception:
+                if self.logger is not None:
+                    self.logger.exception('上传图片清理失败')
+
+
+def upload_root(app):
+    return app.config['UPLOAD_ROOT'] or os.path.join(app.static_folder, 'uploads')
+
+
+def get_upload_store(app):
+    """获取应用对应的上传存储（每个进程一个），配置了 UPLOAD_SWEEP_INTERVAL 时首次获取即启动过期清理线程"""
+    store = app.extensions.get('upload_store')
+    if store is None:
+        created = UploadStore(
+            upload_root(app),
+            app.config['UPLOAD_URL_PREFIX'],
+            thumb_size=app.config['UPLOAD_THUMB_SIZE']
+        )
+        store = app.extensions.setdefault('upload_store', created)
+        if store is created and app.config['UPLOAD_SWEEP_INTERVAL']:
+            sweeper = RetentionSweeper(store, app.config['UPLOAD_SWEEP_INTERVAL'],
+                                       app.config['UPLOAD_MAX_AGE_DAYS'], app.config['UPLOAD_MAX_BYTES'],
+                                       logger=app.logger)
+            app.extensions['upload_sweeper'] = sweeper
+            sweeper.start()
+    return store
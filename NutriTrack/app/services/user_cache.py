@@ -0,0 +1,92 @@
+# app/services/user_cache.py - 登录用户缓存
+
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+
+from app.models.user import User
+
+_COLUMNS = [attr.key for attr in inspect(User).column_attrs]
+
+
+class UserCache:
+    """user_loader 的跨请求缓存：user_id -> 用户各列的快照（TTL + LRU）
+
+    命中时用快照重建对象并以 merge(load=False) 放入当前 session，不产生查询；
+    BMR、健康目标等字段都已加载，可直接使用。同一请求内 Flask-Login 会把结果保存在 g 中，
+    user_loader 每个请求最多调用一次。用户被修改或删除的事务提交后对应条目失效。
+
+    失效只发生在本进程内，其它进程最多在 TTL 内仍使用旧的快照；因此授权判断（管理员接口）
+    不依赖快照中的 status / is_admin，而是通过 load_authorization() 每次从数据库读取。
+    """
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # user_id -> (快照, 加载时间)
+        self._lock = threading.Lock()
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def load(self, session, user_id, ttl):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and time.monotonic() - entry[1] < ttl:
+                self._entries.move_to_end(user_id)
+                data = entry[0]
+            else:
+                data = None
+
+        if data is not None:
+            user = User(**data)
+            make_transient_to_detached(user)
+            return session.merge(user, load=False)
+
+        user = session.get(User, user_id)
+        if user is None:
+            return None
+        data = {key: getattr(user, key) for key in _COLUMNS}
+        with self._lock:
+            self._entries[user_id] = (data, time.monotonic())
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return user
+
+
+# 进程内共享的用户缓存
+user_cache = UserCache()
+
+
+def load_authorization(session, user_id):
+    """不经过缓存读取用户的 (status, is_admin)；用户不存在时返回 None"""
+    return session.query(User.status, User.is_admin).filter(User.id == user_id).first()
+
+
+# ====================== 失效 ======================
+# flush 时立即失效并记录，事务提交后再失效一次：避免其它请求在提交前读到旧数据并重新缓存
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('_user_cache_changed', set()).add(target.id)
+    user_cache.invalidate(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed(session):
+    for user_id in session.info.pop('_user_cache_changed', ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('_user_cache_changed', None)
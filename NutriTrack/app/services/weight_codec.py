@@ -0,0 +1,74 @@
+# app/services/weight_codec.py - 重量时间序列的紧凑二进制编码
+#
+# 格式：1 字节版本号，之后每个采样依次是
+#   zigzag varint(时间戳差值，毫秒) + zigzag varint(重量差值，0.1 克)
+# 首个采样的差值相对 0 计算。采样间隔与重量变化都很小，通常每个采样只占 2~4 字节，
+# 且可以从头顺序解码，无需一次性解析整段数据。
+
+FORMAT_VERSION = 1
+WEIGHT_SCALE = 10  # 重量以 0.1 克为单位保存
+
+
+def _write_varint(buf, value):
+    value = value << 1 if value >= 0 else (-value << 1) - 1  # zigzag
+    while value >= 0x80:
+        buf.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def encode_samples(samples):
+    """把 [(ts_ms, weight_g)] 编码为 bytes"""
+    buf = bytearray((FORMAT_VERSION,))
+    prev_ts = prev_weight = 0
+    for ts, weight in samples:
+        ts = int(ts)
+        weight = int(round(weight * WEIGHT_SCALE))
+        _write_varint(buf, ts - prev_ts)
+        _write_varint(buf, weight - prev_weight)
+        prev_ts, prev_weight = ts, weight
+    return bytes(buf)
+
+
+def iter_samples(data):
+    """逐个解码 (ts_ms, weight_g)"""
+    if not data:
+        return
+    if data[0] != FORMAT_VERSION:
+        raise ValueError(f'不支持的重量数据格式版本：{data[0]}')
+
+    values = [0, 0]  # 当前的时间戳与重量（0.1 克）
+    field = 0
+    value = shift = 0
+    for byte in memoryview(data)[1:]:
+        value |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        values[field] += (value >> 1) if not value & 1 else -((value + 1) >> 1)
+        value = shift = 0
+        if field:
+            yield values[0], values[1] / WEIGHT_SCALE
+        field ^= 1
+    if field or shift:
+        raise ValueError('重量数据不完整')
+
+
+def decode_samples(data):
+    return list(iter_samples(data))
+
+
+def downsample(samples, resolution_ms):
+    """按 resolution_ms 分桶取平均，逐桶产出 (桶起始时间, 平均重量)；samples 需按时间排序"""
+    bucket = None
+    total = count = 0
+    for ts, weight in samples:
+        start = ts - ts % resolution_ms
+        if start != bucket:
+            if count:
+                yield bucket, round(total / count, 1)
+            bucket, total, count = start, 0.0, 0
+        total += weight
+        count += 1
+    if count:
+        yield bucket, round(total / count, 1)
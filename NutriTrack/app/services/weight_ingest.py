@@ -0,0 +1,282 @@
+# app/services/weight_ingest.py - 智能餐盘重量采样的缓冲与批量写入
+
+import atexit
+import threading
+import time
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.exc import DBAPIError, DisconnectionError, InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app import db
+from app.models.record import Plate, PlateWeightSample
+
+_samples = PlateWeightSample.__table__
+_plates = Plate.__table__
+
+
+def _is_transient(error):
+    """连接断开、锁等待超时、死锁等可以通过重试解决的数据库错误"""
+    if isinstance(error, DBAPIError) and error.connection_invalidated:
+        return True
+    return isinstance(error, (OperationalError, InterfaceError, DisconnectionError, PoolTimeoutError))
+
+
+def _latest_of(samples):
+    latest = {}
+    for plate_id, ts, weight in samples:
+        previous = latest.get(plate_id)
+        if previous is None or ts >= previous[0]:
+            latest[plate_id] = (ts, weight)
+    return latest
+
+
+class IngestBackpressure(Exception):
+    """缓冲区已满，调用方应稍后重试"""
+    pass
+
+
+class WeightIngestor:
+    """采样先进入内存缓冲，由后台线程按数量或时间触发批量写入
+
+    - 一次 executemany 插入整批采样；
+    - 同一餐盘在一批内只更新一次 Plate.current_weight（取时间戳最新的采样）；
+    - 缓冲区超过 max_buffer 时拒绝新数据（由接口返回 429）；
+    - 临时性的数据库错误最多重试 max_attempts 次，其他错误只丢弃出错餐盘的采样。
+    缓冲区在进程内存中，进程退出时尽力写入剩余数据。
+    """
+
+    # 遇到未知餐盘时重新加载餐盘列表的最小间隔（秒）
+    KNOWN_PLATES_RELOAD = 5
+
+    def __init__(self, app, max_buffer=100000, flush_size=5000, flush_interval=1.0, max_attempts=5):
+        self.app = app
+        self.max_buffer = max_buffer
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+
+        self._buffer = []          # [(plate_id, ts, weight)]
+        self._latest = {}          # plate_id -> (ts, weight)，合并后的最新重量
+        self._buffered_since = None  # 缓冲区中最早一条数据的接收时间
+        self._retry = None         # 因临时错误待重试的批次：(batch, latest, 已尝试次数)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._flush_listeners = []
+
+        self._known_plates = None
+        self._known_loaded_at = 0.0
+
+        self.received = 0
+        self.written = 0
+        self.rejected = 0
+        self.dead_lettered = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.last_flush_ms = 0.0
+        self.last_flush_size = 0
+        self.last_written_ts = None  # 已写入采样中最新的时间戳
+
+    # ---------------------- 接收 ----------------------
+    def known_plates(self, session, plate_ids):
+        """返回 plate_ids 中已登记的餐盘；出现未知餐盘时（限频）重新加载餐盘列表"""
+        known = self._known_plates
+        if known is None or (not plate_ids <= known
+                             and time.monotonic() - self._known_loaded_at > self.KNOWN_PLATES_RELOAD):
+            known = {plate_id for (plate_id,) in session.query(Plate.plate_id)}
+            self._known_plates = known
+            self._known_loaded_at = time.monotonic()
+        return plate_ids & known
+
+    def offer(self, samples):
+        """放入一批 (plate_id, ts, weight) 采样，缓冲区已满时抛出 IngestBackpressure"""
+        if not samples:
+            return
+        with self._lock:
+            retrying = len(self._retry[0]) if self._retry is not None else 0
+            if len(self._buffer) + retrying + len(samples) > self.max_buffer:
+                self.rejected += len(samples)
+                raise IngestBackpressure('采样缓冲区已满，请稍后重试')
+            if not self._buffer:
+                self._buffered_since = time.monotonic()
+            self._buffer.extend(samples)
+            latest = self._latest
+            for plate_id, ts, weight in samples:
+                previous = latest.get(plate_id)
+                if previous is None or ts >= previous[0]:
+                    latest[plate_id] = (ts, weight)
+            self.received += len(samples)
+            full = len(self._buffer) >= self.flush_size
+
+        self._ensure_started()
+        if full:
+            self._wake.set()
+
+    def on_flush(self, callback):
+        """注册写入成功后的回调 callback(samples)，在写入线程中按接收顺序调用"""
+        self._flush_listeners.append(callback)
+
+    # ---------------------- 写入 ----------------------
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='weight-ingest', daemon=True)
+                    self._thread.start()
+                    atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """把当前缓冲区写入数据库，返回写入的采样数
+
+        上次因临时错误（连接断开、锁超时等）失败的批次先单独重试，数据库仍不可用时新数据继续留在缓冲区；
+        其他错误（如餐盘已删除导致外键失败）按餐盘拆开重写，只有出错餐盘的采样进入死信。
+        """
+        with self._flush_lock:
+            written = 0
+            if self._retry is not None:
+                batch, latest, attempts = self._retry
+                self._retry = None
+                written = self._write(batch, latest, attempts)
+                if self._retry is not None:
+                    return written
+
+            with self._lock:
+                batch, latest = self._buffer, self._latest
+                self._buffer, self._latest = [], {}
+                self._buffered_since = None
+            if batch:
+                written += self._write(batch, latest, 0)
+            return written
+
+    def _write(self, batch, latest, attempts):
+        started = time.perf_counter()
+        try:
+            self._execute(batch, latest)
+        except Exception as e:
+            self.failed_flushes += 1
+            if _is_transient(e):
+                self.app.logger.warning('重量采样写入失败（第 %d 次），稍后重试：%s', attempts + 1, e)
+                self._defer(batch, latest, attempts + 1)
+                return 0
+            self.app.logger.exception('重量采样写入失败，按餐盘拆分重写')
+            batch, latest = self._write_by_plate(batch)
+            if not batch:
+                return 0
+
+        self.flushes += 1
+        self.written += len(batch)
+        self.last_flush_size = len(batch)
+        self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+        newest = max(ts for ts, _ in latest.values())
+        if self.last_written_ts is None or newest > self.last_written_ts:
+            self.last_written_ts = newest
+
+        for callback in self._flush_listeners:
+            try:
+                callback(batch)
+            except Exception:
+                self.app.logger.exception('重量采样回调失败')
+        return len(batch)
+
+    def _execute(self, batch, latest):
+        with self.app.app_context():
+            db.session.execute(_samples.insert(), [
+                {'plate_id': plate_id, 'ts': ts, 'weight': weight}
+                for plate_id, ts, weight in batch
+            ])
+            db.session.execute(
+                update(_plates).where(_plates.c.plate_id == bindparam('b_plate_id'))
+                .values(current_weight=bindparam('b_weight')),
+                [{'b_plate_id': plate_id, 'b_weight': weight}
+                 for plate_id, (ts, weight) in latest.items()]
+            )
+            db.session.commit()
+
+    def _write_by_plate(self, batch):
+        # 每个餐盘单独一个事务；返回写入成功的采样及其最新重量
+        by_plate = {}
+        for sample in batch:
+            by_plate.setdefault(sample[0], []).append(sample)
+
+        written, retry = [], []
+        for plate_id, samples in by_plate.items():
+            try:
+                self._execute(samples, _latest_of(samples))
+            except Exception as e:
+                if _is_transient(e):
+                    retry.extend(samples)
+                else:
+                    self._dead_letter(samples, e)
+            else:
+                written.extend(samples)
+        if retry:
+            self._defer(retry, _latest_of(retry), 1)
+        return written, _latest_of(written)
+
+    def _defer(self, batch, latest, attempts):
+        # 临时错误：留待下次写入时重试，超过次数后进入死信
+        if attempts >= self.max_attempts:
+            self._dead_letter(batch, f'重试 {attempts} 次后仍失败')
+            return
+        self._retry = (batch, latest, attempts)
+        with self._lock:
+            if self._buffered_since is None:
+                self._buffered_since = time.monotonic()
+
+    def _dead_letter(self, samples, reason):
+        # 无法写入的采样只记录日志和数量，不再重试，避免一批坏数据堵住缓冲区
+        plate_ids = sorted({plate_id for plate_id, _, _ in samples})
+        self.app.logger.error('丢弃 %d 条无法写入的重量采样（餐盘 %s）：%s',
+                              len(samples), ', '.join(plate_ids[:20]), reason)
+        self.dead_lettered += len(samples)
+
+    # ---------------------- 状态 ----------------------
+    def stats(self):
+        with self._lock:
+            buffered = len(self._buffer)
+            since = self._buffered_since
+        now_ms = int(time.time() * 1000)
+        return {
+            'buffered': buffered,
+            'max_buffer': self.max_buffer,
+            'received': self.received,
+            'written': self.written,
+            'rejected': self.rejected,
+            'dead_lettered': self.dead_lettered,
+            'retrying': len(self._retry[0]) if self._retry is not None else 0,
+            'flushes': self.flushes,
+            'failed_flushes': self.failed_flushes,
+            'last_flush_size': self.last_flush_size,
+            'last_flush_ms': self.last_flush_ms,
+            # 接收到写入的延迟：缓冲区中最早一条数据已等待的时间
+            'buffer_lag_ms': round((time.monotonic() - since) * 1000, 1) if since is not None else 0,
+            # 采样时间到当前的延迟：已写入的最新采样距今多久
+            'event_lag_ms': now_ms - self.last_written_ts if self.last_written_ts is not None else None
+        }
+
+
+def get_weight_ingestor(app):
+    """获取应用对应的采样写入器（每个进程一个）"""
+    ingestor = app.extensions.get('weight_ingestor')
+    if ingestor is None:
+        created = WeightIngestor(
+            app,
+            max_buffer=app.config['PLATE_INGEST_BUFFER'],
+            flush_size=app.config['PLATE_INGEST_FLUSH_SIZE'],
+            flush_interval=app.config['PLATE_INGEST_FLUSH_INTERVAL'],
+            max_attempts=app.config['PLATE_INGEST_MAX_ATTEMPTS']
+        )
+        ingestor = app.extensions.setdefault('weight_ingestor', created)
+        if ingestor is created and app.config['CONSUMPTION_TRACKING'] == 'inline':
+            # 写入成功的采样直接交给本进程的进食量估计（只适用于单个接收进程）
+            from app.services.consumption import get_consumption_tracker
+            ingestor.on_flush(get_consumption_tracker(app).feed)
+    return ingestor
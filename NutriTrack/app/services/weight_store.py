@@ -0,0 +1,128 @@
+# app/services/weight_store.py - 重量采样的压缩、降采样与流式读取
+
+import heapq
+
+from sqlalchemy import func
+
+from app.models.record import PlateWeightChunk, PlateWeightSample
+from app.services.weight_codec import downsample, encode_samples, iter_samples
+
+# 每个压缩块覆盖的时间窗口（毫秒）
+CHUNK_SPAN_MS = 3600 * 1000
+
+
+def _window_start(ts):
+    return ts - ts % CHUNK_SPAN_MS
+
+
+def pack_samples(session, before_ts):
+    """把 ts < before_ts 的原始采样按 (餐盘, 时间窗口) 压缩为块并删除原始行
+
+    每个窗口的采样一次性读出（不使用流式游标：MySQL 的非缓冲游标在同一连接上执行
+    其他语句时会丢弃未读完的行），写入块后只删除同一条件范围内的行，并逐窗口提交。
+    窗口内已有块时（迟到的采样）合并后重写。返回 (压缩的采样数, 写入的块数)。
+    """
+    # 只处理开始时已存在的行，避免删除处理过程中新写入的采样
+    max_id = session.query(func.max(PlateWeightSample.id)).scalar()
+    if max_id is None:
+        return 0, 0
+    old = (PlateWeightSample.ts < before_ts) & (PlateWeightSample.id <= max_id)
+    window_expr = PlateWeightSample.ts - PlateWeightSample.ts % CHUNK_SPAN_MS
+    windows = session.query(PlateWeightSample.plate_id, window_expr).filter(old) \
+        .distinct().order_by(PlateWeightSample.plate_id, window_expr).all()
+
+    packed = chunks = 0
+    for plate_id, window in windows:
+        window = int(window)
+        in_window = old & (PlateWeightSample.plate_id == plate_id) & \
+            (PlateWeightSample.ts >= window) & (PlateWeightSample.ts < window + CHUNK_SPAN_MS)
+        samples = [(ts, weight) for ts, weight in session.query(
+            PlateWeightSample.ts, PlateWeightSample.weight).filter(in_window).order_by(PlateWeightSample.ts)]
+        if not samples:
+            continue
+        _store_chunk(session, plate_id, window, samples)
+        session.query(PlateWeightSample).filter(in_window).delete(synchronize_session=False)
+        session.commit()
+        packed += len(samples)
+        chunks += 1
+    return packed, chunks
+
+
+def _store_chunk(session, plate_id, window, samples):
+    """写入一个窗口的采样；窗口已有块时合并，已降采样的块合并后按原分辨率重新降采样"""
+    chunk = session.query(PlateWeightChunk).filter_by(plate_id=plate_id, start_ts=window) \
+        .order_by(PlateWeightChunk.id).first()
+    if chunk is None:
+        chunk = PlateWeightChunk(plate_id=plate_id, start_ts=window,
+                                 end_ts=window + CHUNK_SPAN_MS, resolution_ms=0)
+        session.add(chunk)
+    else:
+        samples = heapq.merge(iter_samples(chunk.data), samples)
+        if chunk.resolution_ms:
+            samples = downsample(samples, chunk.resolution_ms)
+        samples = list(samples)
+    chunk.data = encode_samples(samples)
+    chunk.sample_count = len(samples)
+
+
+def downsample_chunks(session, before_ts, resolution_ms):
+    """把结束时间早于 before_ts 的原始分辨率块降采样为 resolution_ms，返回处理的块数"""
+    ids = [chunk_id for (chunk_id,) in session.query(PlateWeightChunk.id).filter(
+        PlateWeightChunk.resolution_ms == 0, PlateWeightChunk.end_ts <= before_ts)]
+    for start in range(0, len(ids), 500):
+        for chunk in session.query(PlateWeightChunk).filter(PlateWeightChunk.id.in_(ids[start:start + 500])):
+            samples = list(downsample(iter_samples(chunk.data), resolution_ms))
+            chunk.data = encode_samples(samples)
+            chunk.sample_count = len(samples)
+            chunk.resolution_ms = resolution_ms
+        session.commit()
+    return len(ids)
+
+
+def iter_plate_samples(session, plate_id, start_ts=None, end_ts=None, batch_size=5000):
+    """按时间顺序逐个产出餐盘在 [start_ts, end_ts) 内的 (ts_ms, weight_g)
+
+    压缩块一次只取一个并逐个解码，尚未压缩的原始采样按 (ts, id) 分批读取；
+    每批都是完整读出的普通查询，两路数据归并时不会同时占用同一连接上的游标。
+    """
+    def in_range(samples):
+        for ts, weight in samples:
+            if start_ts is not None and ts < start_ts:
+                continue
+            if end_ts is not None and ts >= end_ts:
+                return
+            yield ts, weight
+
+    def from_chunks():
+        query = session.query(PlateWeightChunk.id).filter(PlateWeightChunk.plate_id == plate_id)
+        if start_ts is not None:
+            query = query.filter(PlateWeightChunk.end_ts > start_ts)
+        if end_ts is not None:
+            query = query.filter(PlateWeightChunk.start_ts < end_ts)
+        chunk_ids = [chunk_id for (chunk_id,) in
+                     query.order_by(PlateWeightChunk.start_ts, PlateWeightChunk.id).all()]
+        for chunk_id in chunk_ids:
+            data = session.query(PlateWeightChunk.data).filter(PlateWeightChunk.id == chunk_id).scalar()
+            if data is not None:
+                yield from iter_samples(data)
+
+    def from_rows():
+        query = session.query(PlateWeightSample.id, PlateWeightSample.ts, PlateWeightSample.weight) \
+            .filter(PlateWeightSample.plate_id == plate_id)
+        if start_ts is not None:
+            query = query.filter(PlateWeightSample.ts >= start_ts)
+        if end_ts is not None:
+            query = query.filter(PlateWeightSample.ts < end_ts)
+        query = query.order_by(PlateWeightSample.ts, PlateWeightSample.id)
+        page = query
+        while True:
+            rows = page.limit(batch_size).all()
+            for _, ts, weight in rows:
+                yield ts, weight
+            if len(rows) < batch_size:
+                return
+            last_id, last_ts, _ = rows[-1]
+            page = query.filter((PlateWeightSample.ts > last_ts) |
+                                ((PlateWeightSample.ts == last_ts) & (PlateWeightSample.id > last_id)))
+
+    return in_range(heapq.merge(from_chunks(), from_rows()))
@@ -0,0 +1,278 @@
+# benchmarks/run.py - 关键接口、营养计算与菜品识别的性能基准
+#
+# 在临时 SQLite 数据库中生成合成数据（用户、菜品、配方、数年的用餐与识别记录），
+# 通过 Flask 测试客户端逐个场景计时并统计每次请求的 SQL 条数，结果输出为 JSON，
+# 可与保存的基线比较：
+#
+#   python benchmarks/run.py --output bench.json
+#   python benchmarks/run.py --baseline bench.json --threshold 0.2
+#
+# 默认使用替身模型（固定推理延迟，不依赖 torch）；--real-model 使用 YOLO_MODEL_PATH 的真实模型。
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from PIL import Image  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from config import Config  # noqa: E402
+
+
+# ====================== 请求计时与 SQL 计数 ======================
+class QueryCounter:
+    """统计引擎上执行的 SQL 条数"""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def measure(name, request, counter, iterations, warmup, setup=None):
+    """执行 warmup 次预热后计时 iterations 次，返回统计结果；setup 在每次计时前调用且不计入耗时"""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        _check(name, request())
+
+    samples = []
+    queries = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        before = counter.count
+        start = time.perf_counter()
+        response = request()
+        samples.append((time.perf_counter() - start) * 1000)
+        queries.append(counter.count - before)
+        _check(name, response)
+
+    samples.sort()
+    return {
+        'iterations': iterations,
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'p50_ms': round(_percentile(samples, 50), 3),
+        'p95_ms': round(_percentile(samples, 95), 3),
+        'min_ms': round(samples[0], 3),
+        'max_ms': round(samples[-1], 3),
+        'queries_per_request': round(statistics.fmean(queries), 2)
+    }
+
+
+def _percentile(sorted_samples, percent):
+    index = (len(sorted_samples) - 1) * percent / 100
+    lower = int(index)
+    upper = min(lower + 1, len(sorted_samples) - 1)
+    return sorted_samples[lower] + (sorted_samples[upper] - sorted_samples[lower]) * (index - lower)
+
+
+def _check(name, response):
+    if response.status_code != 200:
+        raise RuntimeError(f'{name}: HTTP {response.status_code}')
+    if response.is_json and response.get_json().get('status') == 'error':
+        raise RuntimeError(f'{name}: {response.get_json().get("message")}')
+
+
+# ====================== 测试环境 ======================
+def build_app(workdir, args):
+    dish_names = [f'菜品{i}' for i in range(1, args.dishes + 1)]
+
+    class BenchConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+        UPLOAD_ROOT = os.path.join(workdir, 'uploads')
+        UPLOAD_SWEEP_INTERVAL = 0
+        DETECT_PERSIST = 'none'
+        DETECT_CACHE_ENABLED = False  # 每次都走完整推理路径
+        INFERENCE_SERVICE_ADDRESS = None
+        STATISTICS_MAX_BUCKETS = 100000
+
+    if not args.real_model:
+        # 路由会检查模型文件是否存在；替身模型只需要一个占位文件
+        from benchmarks import stub_model
+        stub_model.install(dish_names + ['未收录菜品'], args.stub_latency_ms, args.stub_per_image_ms)
+        BenchConfig.YOLO_MODEL_PATH = os.path.join(workdir, 'stub.pt')
+        open(BenchConfig.YOLO_MODEL_PATH, 'wb').close()
+
+    from app import create_app, db
+    from benchmarks.seed import seed_database
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        seeded = seed_database(users=args.users, dishes=args.dishes, ingredients=args.ingredients,
+                               days=args.days, detections_per_day=args.detections_per_day)
+        seeded['seconds'] = round(time.perf_counter() - start, 2)
+        seeded['dish_names'] = dish_names
+    return app, seeded
+
+
+def login(client, username):
+    from benchmarks.seed import PASSWORD
+    response = client.post('/login', data={'username': username, 'password': PASSWORD})
+    if response.status_code != 302:
+        raise RuntimeError(f'登录失败：{username}')
+
+
+def _test_image(size=640):
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 255, (size, size, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format='JPEG', quality=85)
+    return buffer.getvalue()
+
+
+# ====================== 场景 ======================
+def run_scenarios(app, seeded, args):
+    from app import db
+    from app.services.detection_stats import get_stats_cache
+    from app.services.nutrition_engine import nutrition_engine
+
+    with app.app_context():
+        counter = QueryCounter(db.engine)
+
+    user = app.test_client()
+    login(user, seeded['user'])
+    admin = app.test_client()
+    login(admin, seeded['admin'])
+
+    dish_names = seeded['dish_names']
+    meal = {'dishes': [{'dish_name': dish_names[i * 7 % len(dish_names)], 'weight': 100 + i * 10}
+                       for i in range(5)]}
+    end = seeded['end'].date() + timedelta(days=1)
+    week = {'from': (end - timedelta(days=7)).isoformat(), 'to': end.isoformat(), 'granularity': 'day'}
+    year = {'from': (end - timedelta(days=365)).isoformat(), 'to': end.isoformat(), 'granularity': 'day'}
+    image = _test_image()
+
+    def clear_stats_cache():
+        get_stats_cache(app).clear()
+
+    def detect():
+        return user.post('/meal/detect_dish', data={'image': (io.BytesIO(image), 'plate.jpg')},
+                         content_type='multipart/form-data')
+
+    scenarios = {
+        'dashboard.index': (lambda: user.get('/dashboard'), None),
+        'meal_track.dish_library': (lambda: user.get('/meal/dish_library'), None),
+        'meal_track.calculate_nutrition': (lambda: user.post('/meal/calculate_nutrition', json=meal), None),
+        'meal_track.calculate_nutrition.cold': (
+            lambda: user.post('/meal/calculate_nutrition', json=meal), nutrition_engine.invalidate),
+        'admin.statistics.week': (lambda: admin.get('/admin/statistics', query_string=week), None),
+        'admin.statistics.year': (lambda: admin.get('/admin/statistics', query_string=year), None),
+        'admin.statistics.year.cold': (
+            lambda: admin.get('/admin/statistics', query_string=year), clear_stats_cache),
+        'meal_track.detect_dish': (detect, None),
+    }
+
+    results = {}
+    for name, (request, setup) in scenarios.items():
+        if args.only and not any(part in name for part in args.only):
+            continue
+        iterations = args.iterations if 'detect' not in name else max(1, args.iterations // 2)
+        results[name] = measure(name, request, counter, iterations, args.warmup, setup)
+        print(f'{name:42s} p50 {results[name]["p50_ms"]:9.2f} ms  '
+              f'p95 {results[name]["p95_ms"]:9.2f} ms  '
+              f'{results[name]["queries_per_request"]:6.1f} queries', file=sys.stderr)
+    return results
+
+
+# ====================== 基线比较 ======================
+def compare(report, baseline, threshold, min_delta_ms=1.0, metric='p50_ms'):
+    """与基线比较，返回变慢超过 threshold（比例）且超过 min_delta_ms、或 SQL 条数增加的场景列表"""
+    regressions = []
+    if baseline.get('meta', {}).get('dataset') != report['meta']['dataset']:
+        print('警告：基线使用的数据规模与本次不同，比较结果仅供参考', file=sys.stderr)
+    for name, current in report['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            continue
+        ratio = current[metric] / previous[metric] if previous[metric] else 1.0
+        more_queries = current['queries_per_request'] > previous['queries_per_request']
+        current['baseline_ratio'] = round(ratio, 3)
+        status = 'ok'
+        slower = ratio > 1 + threshold and current[metric] - previous[metric] > min_delta_ms
+        if slower or more_queries:
+            status = 'REGRESSION'
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            status = 'improved'
+        print(f'{name:42s} {previous[metric]:9.2f} -> {current[metric]:9.2f} ms  '
+              f'x{ratio:5.2f}  queries {previous["queries_per_request"]} -> '
+              f'{current["queries_per_request"]}  {status}', file=sys.stderr)
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='NutriTrack 性能基准')
+    parser.add_argument('--output', help='结果 JSON 的保存路径（默认输出到标准输出）')
+    parser.add_argument('--baseline', help='用于比较的基线 JSON')
+    parser.add_argument('--threshold', type=float, default=0.2, help='p50 变慢超过该比例视为退化')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help='p50 变慢不超过该毫秒数时不视为退化')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--only', nargs='*', help='只运行名称包含这些片段的场景')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--dishes', type=int, default=300)
+    parser.add_argument('--ingredients', type=int, default=500)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--detections-per-day', type=int, default=40)
+    parser.add_argument('--real-model', action='store_true', help='使用 YOLO_MODEL_PATH 的真实模型')
+    parser.add_argument('--stub-latency-ms', type=float, default=20.0, help='替身模型每批的固定延迟')
+    parser.add_argument('--stub-per-image-ms', type=float, default=5.0, help='替身模型每张图片的额外延迟')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix='nutritrack-bench-') as workdir:
+        app, seeded = build_app(workdir, args)
+        results = run_scenarios(app, seeded, args)
+        with app.app_context():
+            from app import db
+            db.engine.dispose()
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'model': 'real' if args.real_model else 'stub',
+            'seed_seconds': seeded['seconds'],
+            'dataset': {'users': args.users, 'dishes': args.dishes, 'ingredients': args.ingredients,
+                        'days': args.days, 'detections_per_day': args.detections_per_day},
+            'iterations': args.iterations
+        },
+        'results': results
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.threshold, args.min_delta_ms)
+        report['regressions'] = regressions
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
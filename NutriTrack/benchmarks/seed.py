@@ -0,0 +1,100 @@
+# benchmarks/seed.py - 生成基准测试用的合成数据（直接批量写入，几秒内完成）
+
+import json
+import random
+from datetime import datetime, timedelta
+
+from app import db
+from app.models.food import Canteen, Dish, DishIngredient, Ingredient, NutritionFacts, normalize_dish_name
+from app.models.record import DetectionItem, DetectionRecord, DietRecord
+from app.models.user import User
+from app.services.counters import reconcile_counters
+from app.services.daily_rollup import rebuild_daily_rollup
+from app.services.nutrition_table import rebuild_dish_nutrition
+
+PASSWORD = 'bench123'
+
+
+def _insert(model, rows, chunk=5000):
+    for start in range(0, len(rows), chunk):
+        db.session.execute(model.__table__.insert(), rows[start:start + chunk])
+
+
+def seed_database(users=50, dishes=300, ingredients=500, days=730, detections_per_day=40, seed=42):
+    """写入用户、菜品、配方、营养成分，以及 days 天的用餐记录与识别记录
+
+    返回 {'user': 普通用户名, 'admin': 管理员用户名, 'dish_names': [...], 'end': 最后一天}。
+    """
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+
+    db.session.add(Canteen(canteen_id=1, name='第一食堂'))
+    template = User(username='_', email='_')
+    template.set_password(PASSWORD)
+    _insert(User, [{
+        'id': i, 'username': f'user{i}', 'email': f'user{i}@bench.local',
+        'password_hash': template.password_hash, 'is_admin': 1 if i == 1 else 0, 'status': 1,
+        'height': 170, 'weight': 65, 'age': 25, 'gender': 'male', 'bmr': 1600,
+        'health_goal': '保持健康', 'register_time': now - timedelta(days=days)
+    } for i in range(1, users + 1)])
+
+    _insert(Ingredient, [{'ingredient_id': i, 'ingredient_name': f'配料{i}'}
+                         for i in range(1, ingredients + 1)])
+    _insert(NutritionFacts, [{
+        'ingredient_id': i, 'energy_kcal': rng.uniform(10, 600), 'protein_g': rng.uniform(0, 30),
+        'fat_g': rng.uniform(0, 40), 'carb_g': rng.uniform(0, 80)
+    } for i in range(1, ingredients + 1) if i % 10])  # 约 10% 的配料缺少营养数据
+
+    dish_names = [f'菜品{i}' for i in range(1, dishes + 1)]
+    _insert(Dish, [{'dish_id': i, 'name': name, 'name_normalized': normalize_dish_name(name),
+                    'canteen_id': 1, 'cooking_method': rng.choice(['炒', '蒸', '煮', '炸'])}
+                   for i, name in enumerate(dish_names, start=1)])
+    recipe = []
+    for dish_id in range(1, dishes + 1):
+        for ingredient_id in rng.sample(range(1, ingredients + 1), rng.randint(2, 8)):
+            recipe.append({'dish_id': dish_id, 'ingredient_id': ingredient_id,
+                           'amount_g': rng.uniform(5, 200)})
+    _insert(DishIngredient, recipe)
+
+    # 用餐记录：每个用户每天 0~3 餐；最后一天为今天，保证各次运行的数据分布一致
+    diet = []
+    today = datetime(now.year, now.month, now.day)
+    start_day = today - timedelta(days=days - 1)
+    for user_id in range(1, users + 1):
+        for day in range(days):
+            for meal_type in range(1, 4):
+                # 基准用户今天三餐齐全，仪表盘走完整的分餐查询路径
+                if rng.random() < 0.3 and not (user_id == 2 and day == days - 1):
+                    continue
+                items = [{'dish_name': rng.choice(dish_names), 'weight': rng.randint(50, 300)}
+                         for _ in range(rng.randint(1, 4))]
+                diet.append({
+                    'user_id': user_id, 'meal_type': meal_type, 'dish_list': json.dumps(items, ensure_ascii=False),
+                    'total_calorie': rng.uniform(200, 1200), 'total_protein': rng.uniform(5, 60),
+                    'total_fat': rng.uniform(5, 60), 'total_carb': rng.uniform(20, 150),
+                    'create_time': start_day + timedelta(days=day, hours=6 + meal_type * 5,
+                                                         minutes=rng.randint(0, 59))
+                })
+    _insert(DietRecord, diet)
+
+    # 识别记录与识别结果
+    records, items = [], []
+    record_id = 0
+    for day in range(days):
+        for _ in range(detections_per_day):
+            record_id += 1
+            detect_time = start_day + timedelta(days=day, seconds=rng.randint(6 * 3600, 21 * 3600))
+            detected = [{'dish_name': rng.choice(dish_names), 'confidence': round(rng.uniform(0.3, 1.0), 2),
+                         'weight': 100} for _ in range(rng.randint(1, 4))]
+            records.append({'id': record_id, 'user_id': rng.randint(1, users), 'detect_time': detect_time,
+                            'detected_objects': json.dumps(detected, ensure_ascii=False)})
+            for item in detected:
+                items.append(dict(DetectionItem.values_from_result(item, detect_time), record_id=record_id))
+    _insert(DetectionRecord, records)
+    _insert(DetectionItem, items)
+
+    rebuild_dish_nutrition(db.session)
+    rebuild_daily_rollup(db.session)
+    reconcile_counters(db.session)
+    db.session.commit()
+    return {'user': 'user2', 'admin': 'user1', 'dish_names': dish_names, 'end': today}
@@ -0,0 +1,62 @@
+# benchmarks/stub_model.py - 不依赖 torch/ultralytics 的替身模型
+#
+# 安装后 app.services.model_registry 被替换为本模块提供的注册表，返回结构与
+# ultralytics 结果一致（boxes.cls / conf / xyxy），因此调度、结果解析、菜品映射等
+# 真实代码路径都会被执行，只有前向推理用固定延迟代替。
+
+import sys
+import time
+import types
+
+import numpy as np
+
+
+class _Box:
+    def __init__(self, class_id, confidence, xyxy):
+        self.cls = np.array([class_id])
+        self.conf = np.array([confidence])
+        self.xyxy = np.array([xyxy], dtype=np.float32)
+
+
+class _Result:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class StubModel:
+    def __init__(self, names, latency_ms, per_image_ms, boxes_per_image=3):
+        self.names = dict(enumerate(names))
+        self.version = 'stub@0'
+        self.latency_ms = latency_ms
+        self.per_image_ms = per_image_ms
+        self.boxes_per_image = boxes_per_image
+
+    def predict(self, source, **kwargs):
+        images = source if isinstance(source, list) else [source]
+        time.sleep((self.latency_ms + self.per_image_ms * len(images)) / 1000)
+        results = []
+        for index, _ in enumerate(images):
+            results.append(_Result([
+                _Box((index + k) % len(self.names), 0.9 - 0.1 * k, [10.0 * k, 10.0, 10.0 * k + 50, 60.0])
+                for k in range(self.boxes_per_image)
+            ]))
+        return results
+
+
+class StubRegistry:
+    def __init__(self, model):
+        self.model = model
+
+    def get(self, model_path):
+        return self.model
+
+    def clear(self):
+        pass
+
+
+def install(names, latency_ms=20.0, per_image_ms=5.0):
+    """用替身模型替换 app.services.model_registry，须在首次识别之前调用"""
+    module = types.ModuleType('app.services.model_registry')
+    module.model_registry = StubRegistry(StubModel(names, latency_ms, per_image_ms))
+    sys.modules['app.services.model_registry'] = module
+    return module.model_registry
@@ -10,3 +10,120 @@ class Config:
     
     # YOLO Model Path
     YOLO_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app', 'static', 'best.pt')
+
+    YOLO_IMGSZ = 640  # model input size, also used for warm-up
+
+    # Detection inference
+    DETECT_CONF = 0.3
+    DETECT_TIMEOUT = 30  # seconds a request waits for its inference result
+
+    # Micro-batching of concurrent detection requests
+    DETECT_BATCH_SIZE = 8
+    DETECT_BATCH_WAIT_MS = 10
+    DETECT_QUEUE_SIZE = 64
+
+    # Asynchronous detection jobs (POST /meal/detect_dish?async=1). Job state is
+    # kept in the memory of the process that accepted the upload, so polls must
+    # reach the same process (single process, or sticky sessions); other
+    # processes answer 404.
+    DETECT_JOB_WORKERS = 4
+    DETECT_JOB_TTL = 300  # seconds a finished job stays pollable
+    DETECT_JOB_MAX_WAIT = 3  # upper bound for ?wait=; each waiting poll holds a web worker
+
+    # Out-of-process inference service (python run.py --inference-service).
+    # When the address is set, web workers forward batches to the service
+    # instead of loading the model themselves. 'host:port' or a unix socket path.
+    INFERENCE_SERVICE_ADDRESS = os.environ.get('INFERENCE_SERVICE_ADDRESS')
+    # The connection unpickles what it receives, so the key must be a per-deployment
+    # secret; the service and the web workers refuse to start without it.
+    INFERENCE_SERVICE_AUTHKEY = os.environ.get('INFERENCE_SERVICE_AUTHKEY')
+    INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', 2))
+    INFERENCE_THREADS_PER_WORKER = int(os.environ.get('INFERENCE_THREADS_PER_WORKER', 2))
+    INFERENCE_SERVICE_QUEUE_SIZE = 128
+    # Crashed workers are restarted after 1, 2, 4 ... seconds (capped at 60);
+    # after this many consecutive failures a worker is given up on.
+    INFERENCE_WORKER_RESTART_BACKOFF = 1.0
+    INFERENCE_WORKER_MAX_FAILURES = 5
+
+    # Upload persistence for detect_dish: 'original' (original + thumbnail),
+    # 'thumbnail' or 'none'. Inference always runs on the in-memory image;
+    # saving happens off the request thread when DETECT_PERSIST_ASYNC is enabled.
+    DETECT_PERSIST = 'original'
+    DETECT_PERSIST_ASYNC = True
+
+    # Detection result cache keyed by a perceptual hash of the upload
+    DETECT_CACHE_ENABLED = True
+    DETECT_CACHE_SIZE = 512
+    DETECT_CACHE_TTL = 600  # seconds
+    DETECT_CACHE_MAX_DISTANCE = 4  # Hamming distance for near-duplicates, 0 = exact only
+
+    # In-memory nutrition engine. Commits that touch dishes or recipes
+    # invalidate it in the committing process; other processes reload
+    # after this many seconds (0 = only on explicit invalidation).
+    NUTRITION_ENGINE_TTL = 300
+    NUTRITION_BATCH_MAX_MEALS = 200  # meals per /meal/calculate_nutrition_batch call
+
+    # Admin detection statistics: upper bound on buckets per request
+    STATISTICS_MAX_BUCKETS = 2000
+
+    # Admin dashboard counters: in-memory TTL and how often they are
+    # reconciled against real COUNT(*) queries (seconds)
+    COUNTER_CACHE_TTL = 10
+    COUNTER_RECONCILE_INTERVAL = 3600
+    COUNTER_FLUSH_INTERVAL = 2.0  # committed deltas are written back in the background this often
+
+    # Logged-in user cache (per process, seconds). Other worker processes see
+    # profile changes and account disabling after at most this long; admin
+    # routes always re-check status and is_admin against the database.
+    USER_CACHE_TTL = 30
+
+    # Smart-plate weight ingestion (POST /plate/samples). Devices authenticate
+    # with "Authorization: Bearer <PLATE_INGEST_TOKEN>"; unset disables the API.
+    PLATE_INGEST_TOKEN = os.environ.get('PLATE_INGEST_TOKEN')
+    PLATE_INGEST_MAX_SAMPLES = 10000  # per request
+    PLATE_INGEST_BUFFER = 100000  # buffered samples before answering 429
+    PLATE_INGEST_FLUSH_SIZE = 5000
+    PLATE_INGEST_FLUSH_INTERVAL = 1.0  # seconds
+    # Flushes failing with transient DB errors are retried this many times; rows
+    # that still can't be written (or fail permanently) are logged and dropped.
+    PLATE_INGEST_MAX_ATTEMPTS = 5
+
+    # Weight sample compaction (flask compact-weight-samples, run from cron)
+    WEIGHT_RAW_MAX_AGE = 600  # seconds before raw samples are packed into chunks
+    WEIGHT_DOWNSAMPLE_AFTER_DAYS = 7
+    WEIGHT_DOWNSAMPLE_RESOLUTION_MS = 1000
+
+    # Consumption estimate from the plate weight stream
+    CONSUMPTION_EMA_ALPHA = 0.3
+    CONSUMPTION_NOISE_G = 3.0  # readings within this of the average count as stable
+    CONSUMPTION_SETTLE_SAMPLES = 5
+    CONSUMPTION_MIN_CHANGE_G = 2.0
+    CONSUMPTION_EMPTY_G = 5.0  # below this the plate is treated as lifted
+    CONSUMPTION_LIFT_TIMEOUT_MS = 10000
+    # Estimator state lives in process memory, so every sample of a plate must
+    # reach the same estimator. 'inline' estimates in the web process that
+    # ingests the samples (single ingest worker only); 'worker' leaves it to a
+    # single "flask track-consumption" process that follows the samples table.
+    CONSUMPTION_TRACKING = os.environ.get('CONSUMPTION_TRACKING', 'inline')
+    # 'worker' mode reads samples in id order; samples behind an id gap are held
+    # this many seconds waiting for a slower ingest worker's commit.
+    CONSUMPTION_COMMIT_LAG = 5.0
+
+    # Content-addressed upload storage (defaults to app/static/uploads) and its
+    # retention. Run "flask sweep-uploads" from cron, or set UPLOAD_SWEEP_INTERVAL
+    # (seconds) on exactly one process to sweep in a background thread there;
+    # 0 (the default) keeps web workers from each starting their own sweeper.
+    UPLOAD_ROOT = None
+    UPLOAD_URL_PREFIX = '/static/uploads'
+    UPLOAD_THUMB_SIZE = 320
+    UPLOAD_MAX_AGE_DAYS = 90
+    UPLOAD_MAX_BYTES = 5 * 1024 ** 3
+    UPLOAD_SWEEP_INTERVAL = int(os.environ.get('UPLOAD_SWEEP_INTERVAL', 0))
+
+    # Built-in performance metrics: per-route latency, SQL per request, timing
+    # spans and queue depth at GET /admin/metrics (JSON, or Prometheus text with
+    # ?format=prometheus). Values are per process. Scrapers without an admin
+    # session can send "Authorization: Bearer <METRICS_TOKEN>". Off by default;
+    # set METRICS_ENABLED=1 to turn it on.
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '0') == '1'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
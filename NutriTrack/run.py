@@ -1,14 +1,37 @@
+import sys
+
 from app import create_app, db
 from app.models.user import User
+from app.models.food import Dish, DishNutrition
+from app.models.record import DailyNutrition, DietRecord
+from app.services.daily_rollup import rebuild_daily_rollup
+from app.services.nutrition_table import rebuild_dish_nutrition
 
 
 app = create_app()
 
 if __name__ == '__main__':
+    # 本地启动独立推理服务：python run.py --inference-service
+    # Web 进程需设置 INFERENCE_SERVICE_ADDRESS 后才会改为通过该服务推理
+    if '--inference-service' in sys.argv:
+        from app.services.inference_service import serve_inference
+        serve_inference(app.config)
+        sys.exit(0)
+
     with app.app_context():
         # Create tables if they don't exist
         db.create_all()
         
+        # 首次部署时根据现有配方生成菜品营养成分表，之后随配方变更增量维护
+        if Dish.query.first() and not DishNutrition.query.first():
+            rebuild_dish_nutrition(db.session)
+            db.session.commit()
+
+        # 首次部署时根据已有用餐记录回填每日营养汇总
+        if DietRecord.query.first() and not DailyNutrition.query.first():
+            rebuild_daily_rollup(db.session)
+            db.session.commit()
+
         # Create default admin if not exists
         if not User.query.filter_by(username='admin').first():
             print("Creating default admin user...")
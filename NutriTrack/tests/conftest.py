@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db as _db  # noqa: E402
+from app.services.counters import pending_deltas  # noqa: E402
+from config import Config  # noqa: E402
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    UPLOAD_SWEEP_INTERVAL = 0
+    METRICS_ENABLED = False
+    INFERENCE_SERVICE_ADDRESS = None
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        _db.create_all()
+        yield app
+        _db.session.remove()
+        pending_deltas.take(_db.engine)  # 丢弃未写回的计数增量，数据库随后被删除
+        _db.drop_all()
+
+
+@pytest.fixture
+def session(app):
+    return _db.session
@@ -0,0 +1,103 @@
+import pytest
+
+from app import db
+from app.models.food import Dish, DishNutrition
+from app.services.nutrition_engine import nutrition_engine
+from benchmarks.run import _percentile, build_app, compare, measure, parse_args, run_scenarios
+
+
+def _report(**results):
+    return {'meta': {'dataset': {'users': 1}}, 'results': results}
+
+
+def _result(p50, queries=3):
+    return {'p50_ms': p50, 'queries_per_request': queries}
+
+
+def test_percentile_interpolates():
+    samples = [1.0, 2.0, 3.0, 4.0]
+    assert _percentile(samples, 0) == 1.0
+    assert _percentile(samples, 50) == 2.5
+    assert _percentile(samples, 100) == 4.0
+    assert _percentile([5.0], 95) == 5.0
+
+
+def test_compare_flags_slower_and_extra_queries():
+    baseline = _report(a=_result(10), b=_result(10), c=_result(10), d=_result(10), gone=_result(1))
+    report = _report(
+        a=_result(13),              # 慢 30%
+        b=_result(10.5),            # 在阈值内
+        c=_result(10, queries=4),   # SQL 条数增加
+        d=_result(5),               # 变快
+        new=_result(100),           # 基线中没有
+    )
+
+    assert compare(report, baseline, threshold=0.2) == ['a', 'c']
+    assert report['results']['a']['baseline_ratio'] == 1.3
+    assert report['results']['d']['baseline_ratio'] == 0.5
+    assert 'baseline_ratio' not in report['results']['new']
+
+
+def test_compare_ignores_small_absolute_changes():
+    baseline = _report(fast=_result(0.2))
+    report = _report(fast=_result(0.5))
+
+    assert compare(report, baseline, threshold=0.2, min_delta_ms=1.0) == []
+    assert compare(report, baseline, threshold=0.2, min_delta_ms=0.1) == ['fast']
+
+
+def test_measure_counts_queries_and_runs_setup():
+    class _Response:
+        status_code = 200
+        is_json = False
+
+    class _Counter:
+        count = 0
+
+    counter = _Counter()
+    setups = []
+
+    def request():
+        counter.count += 2
+        return _Response()
+
+    result = measure('x', request, counter, iterations=4, warmup=1, setup=lambda: setups.append(1))
+    assert result['iterations'] == 4
+    assert result['queries_per_request'] == 2
+    assert result['min_ms'] <= result['p50_ms'] <= result['p95_ms'] <= result['max_ms']
+    assert len(setups) == 5
+
+
+def test_measure_rejects_failed_requests():
+    class _Response:
+        status_code = 500
+
+    with pytest.raises(RuntimeError):
+        measure('x', lambda: _Response(), None, iterations=1, warmup=1)
+
+
+def test_seed_and_scenarios_smoke(tmp_path):
+    # 与 run.py 一样在应用上下文之外发请求，各测试客户端的登录状态互不影响；
+    # --real-model 避免替换模型模块，识别场景不在本测试中运行
+    args = parse_args(['--iterations', '2', '--warmup', '0', '--real-model',
+                       '--users', '3', '--dishes', '10', '--ingredients', '20', '--days', '10',
+                       '--detections-per-day', '3',
+                       '--only', 'calculate_nutrition', 'statistics.week', 'dish_library'])
+    app, seeded = build_app(str(tmp_path), args)
+    with app.app_context():
+        assert db.session.query(Dish).count() == 10
+        assert db.session.query(DishNutrition).count() > 0
+
+    try:
+        results = run_scenarios(app, seeded, args)
+    finally:
+        nutrition_engine.invalidate()  # 快照来自基准数据库，不能留给其它测试
+        with app.app_context():
+            db.engine.dispose()
+
+    assert set(results) == {'meal_track.dish_library', 'meal_track.calculate_nutrition',
+                            'meal_track.calculate_nutrition.cold', 'admin.statistics.week'}
+    assert all(result['iterations'] == 2 for result in results.values())
+    # 矩阵常驻内存时计算营养不访问营养数据表
+    assert results['meal_track.calculate_nutrition']['queries_per_request'] < \
+        results['meal_track.calculate_nutrition.cold']['queries_per_request']
@@ -0,0 +1,122 @@
+import threading
+
+import pytest
+
+from app.models.record import DetectionRecord, Plate, PlateWeightSample
+from app.models.user import User
+from app.services.consumption import (ConsumptionTracker, PlateEstimator, SampleFollower, follow_samples,
+                                      latest_consumption, scale_to_weight)
+
+
+def _feed_stable(estimator, start_ts, weight, count=40):
+    for i in range(count):
+        estimator.update(start_ts + i * 100, weight)
+    return start_ts + count * 100
+
+
+def _bound_user(session, name='eater'):
+    user = User(username=name, email=f'{name}@example.com')
+    user.set_password('pw')
+    session.add(user)
+    session.flush()
+    session.add(Plate(plate_id='P1', user_id=user.id, bind_status=1, current_weight=400.0))
+    session.commit()
+    return user
+
+
+def test_start_meal_does_not_write_zero_consumption():
+    estimator = PlateEstimator()
+    ts = _feed_stable(estimator, 0, 400.0)
+    estimator.dirty = False
+
+    estimator.start_meal(1)
+    assert not estimator.dirty
+
+    _feed_stable(estimator, ts, 300.0)
+    assert estimator.dirty
+    assert estimator.estimate()['consumed_weight'] == pytest.approx(100.0, abs=2)
+
+
+def test_latest_consumption_ignores_zero(session):
+    user = _bound_user(session)
+    record = DetectionRecord(user_id=user.id, plate_id='P1', served_weight=400.0, consumed_weight=0.0)
+    session.add(record)
+    session.commit()
+    assert latest_consumption(session, user.id) is None
+
+    record.consumed_weight = 120.0
+    session.commit()
+    assert latest_consumption(session, user.id) == (400.0, 120.0)
+
+
+def test_scale_to_weight_keeps_proportions():
+    dishes = [{'dish_name': 'a', 'weight': 100}, {'dish_name': 'b', 'weight': 300}]
+    assert [d['weight'] for d in scale_to_weight(dishes, 200)] == [50.0, 150.0]
+
+
+def test_calculate_nutrition_keeps_weights_before_any_consumption(app, session):
+    user = _bound_user(session)
+    session.add(DetectionRecord(user_id=user.id, plate_id='P1', served_weight=400.0, consumed_weight=0.0))
+    session.commit()
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'eater', 'password': 'pw'})
+    dishes = [{'dish_name': 'a', 'weight': 150}, {'dish_name': 'b', 'weight': 250}]
+    data = client.post('/meal/calculate_nutrition', json={'dishes': dishes, 'use_plate': True}).get_json()
+    assert data['status'] == 'success'
+    assert 'consumed_weight' not in data
+    assert [d['weight'] for d in data['details']] == [150.0, 250.0]
+
+
+def test_follow_samples_feeds_a_single_tracker(app, session):
+    user = _bound_user(session)
+    session.add(DetectionRecord(user_id=user.id, plate_id='P1'))
+    session.commit()
+
+    tracker = ConsumptionTracker(app)
+    samples = [(i * 100, 400.0) for i in range(40)] + [(4000 + i * 100, 250.0) for i in range(40)]
+    session.add_all(PlateWeightSample(plate_id='P1', ts=ts, weight=w) for ts, w in samples)
+    session.commit()
+
+    stop = threading.Event()
+    fed = []
+    original = tracker.feed
+
+    def feed(batch):
+        fed.extend(batch)
+        original(batch)
+        stop.set()
+
+    tracker.feed = feed
+    follow_samples(app, tracker, after_id=0, poll_interval=0.01, stop=stop)
+    assert len(fed) == len(samples)
+    assert tracker.estimate('P1')['consumed_weight'] == pytest.approx(150.0, abs=2)
+
+
+def test_follower_waits_for_out_of_order_commits(session):
+    session.add(Plate(plate_id='P1'))
+    session.add_all(PlateWeightSample(id=i, plate_id='P1', ts=i, weight=float(i)) for i in (1, 2, 4, 5))
+    session.commit()
+
+    follower = SampleFollower(0, commit_lag=5.0)
+    # id 3 属于另一个尚未提交的写入事务：它之后的采样先暂存
+    assert [ts for _, ts, _ in follower.poll(session, now=0.0)] == [1, 2]
+    assert follower.poll(session, now=1.0) == []
+
+    session.add(PlateWeightSample(id=3, plate_id='P1', ts=3, weight=3.0))
+    session.commit()
+    assert [ts for _, ts, _ in follower.poll(session, now=2.0)] == [3, 4, 5]
+    assert follower.after_id == 5
+
+
+def test_follower_skips_gaps_after_commit_lag(session):
+    session.add(Plate(plate_id='P1'))
+    session.add_all(PlateWeightSample(id=i, plate_id='P1', ts=i, weight=float(i)) for i in (1, 3))
+    session.commit()
+
+    follower = SampleFollower(0, commit_lag=5.0)
+    assert len(follower.poll(session, now=0.0)) == 1
+    assert follower.poll(session, now=4.0) == []
+    # id 2 一直没有提交（回滚或跳号），超过 commit_lag 后不再等待
+    assert [ts for _, ts, _ in follower.poll(session, now=5.5)] == [3]
+    assert follower.after_id == 3
@@ -0,0 +1,72 @@
+from app.models.counter import SystemCounter
+from app.models.record import DetectionRecord
+from app.models.user import User
+from app.services.counters import CounterReader, flush_pending_counters, reconcile_counters
+
+
+def _user(session, name, **kwargs):
+    user = User(username=name, email=f'{name}@example.com', **kwargs)
+    user.set_password('pw')
+    session.add(user)
+    return user
+
+
+def _stored(session):
+    session.expire_all()
+    return {row.name: row.value for row in session.query(SystemCounter)}
+
+
+def test_deltas_are_written_after_commit(session):
+    reconcile_counters(session)
+    session.commit()
+
+    _user(session, 'a')
+    admin = _user(session, 'b', is_admin=1)
+    session.add_all([DetectionRecord(user_id=1), DetectionRecord(user_id=1)])
+    session.commit()
+    admin.status = 0
+    session.commit()
+
+    flush_pending_counters(session.get_bind())
+    assert _stored(session) == {'users_total': 2, 'users_active': 1, 'users_admin': 1, 'detections_total': 2}
+    assert _stored(session) == reconcile_counters(session)
+
+
+def test_rolled_back_changes_are_not_counted(session):
+    reconcile_counters(session)
+    session.commit()
+
+    _user(session, 'a')
+    session.flush()
+    session.rollback()
+    flush_pending_counters(session.get_bind())
+    assert _stored(session)['users_total'] == 0
+
+
+def test_reader_does_not_commit_callers_session(session):
+    _user(session, 'pending')
+    values = CounterReader().get_all(session)
+    assert values['users_total'] == 0
+    # 调用方未提交的对象仍在事务中
+    assert session.new
+    session.rollback()
+    assert session.query(User).count() == 0
+
+
+def test_other_processes_deltas_before_reconcile_are_skipped(session):
+    from datetime import datetime, timedelta
+
+    from app.services.counters import pending_deltas
+
+    session.add(DetectionRecord(user_id=1))
+    session.commit()
+    flush_pending_counters(session.get_bind())
+    before = datetime.now() - timedelta(seconds=1)
+    reconcile_counters(session)
+    session.commit()
+
+    # 其它进程在校准之前提交、校准之后才写回的增量已经包含在 COUNT 中
+    pending_deltas.add(session.get_bind(), {'detections_total': 1}, committed_at=before)
+    pending_deltas.add(session.get_bind(), {'detections_total': 2}, committed_at=datetime.now() + timedelta(seconds=1))
+    flush_pending_counters(session.get_bind())
+    assert _stored(session)['detections_total'] == 3
@@ -0,0 +1,70 @@
+from datetime import date, datetime
+
+from app.models.record import DailyNutrition, DietRecord
+from app.services.daily_rollup import apply_diet_record, rebuild_daily_rollup
+
+COLUMNS = ['total_calorie', 'total_protein', 'total_fat', 'total_carb',
+           'record_count', 'breakfast_count', 'lunch_count', 'dinner_count']
+
+
+def _record(session, meal_type, calorie, when, user_id=1):
+    record = DietRecord(user_id=user_id, meal_type=meal_type, total_calorie=calorie, total_protein=calorie / 10,
+                        total_fat=calorie / 20, total_carb=calorie / 5, create_time=when)
+    session.add(record)
+    apply_diet_record(session, record)
+    return record
+
+
+def _rollup(session):
+    session.expire_all()
+    return {(row.user_id, row.day): {c: round(getattr(row, c), 6) for c in COLUMNS}
+            for row in session.query(DailyNutrition)}
+
+
+def test_incremental_matches_rebuild(session):
+    _record(session, 1, 300.0, datetime(2024, 3, 1, 8))
+    _record(session, 2, 700.0, datetime(2024, 3, 1, 12))
+    _record(session, '3', 500.0, datetime(2024, 3, 2, 19))
+    _record(session, None, 100.0, datetime(2024, 3, 2, 21), user_id=2)
+    session.commit()
+
+    incremental = _rollup(session)
+    assert incremental[(1, date(2024, 3, 1))]['total_calorie'] == 1000.0
+    assert incremental[(1, date(2024, 3, 1))]['breakfast_count'] == 1
+    assert incremental[(1, date(2024, 3, 2))]['dinner_count'] == 1
+    assert incremental[(2, date(2024, 3, 2))]['record_count'] == 1
+
+    assert rebuild_daily_rollup(session) == 3
+    session.commit()
+    assert _rollup(session) == incremental
+
+
+def test_removing_all_records_resets_totals(session):
+    first = _record(session, 1, 0.1, datetime(2024, 3, 1, 8))
+    second = _record(session, 2, 0.2, datetime(2024, 3, 1, 12))
+    session.commit()
+
+    for record in (first, second):
+        apply_diet_record(session, record, sign=-1)
+        session.delete(record)
+    session.commit()
+
+    row = _rollup(session)[(1, date(2024, 3, 1))]
+    assert row['record_count'] == 0
+    assert row['total_calorie'] == 0.0 and row['lunch_count'] == 0
+
+
+def test_rebuild_for_one_user_since_a_day(session):
+    _record(session, 1, 300.0, datetime(2024, 3, 1, 8))
+    _record(session, 1, 400.0, datetime(2024, 3, 5, 8))
+    _record(session, 1, 500.0, datetime(2024, 3, 5, 8), user_id=2)
+    session.commit()
+    session.query(DailyNutrition).update({DailyNutrition.total_calorie: 0.0})
+    session.commit()
+
+    assert rebuild_daily_rollup(session, user_id=1, since=date(2024, 3, 2)) == 1
+    session.commit()
+    rollup = _rollup(session)
+    assert rollup[(1, date(2024, 3, 5))]['total_calorie'] == 400.0
+    assert rollup[(1, date(2024, 3, 1))]['total_calorie'] == 0.0
+    assert rollup[(2, date(2024, 3, 5))]['total_calorie'] == 0.0
@@ -0,0 +1,66 @@
+import threading
+
+from app.services.detect_jobs import JOB_ERROR, JOB_SUCCESS, DetectionJobManager
+
+
+def test_worker_timings_do_not_leak_into_submitted_snapshot():
+    manager = DetectionJobManager(max_workers=1)
+    started, release = threading.Event(), threading.Event()
+    request_timings = {'decode_ms': 1.0}
+
+    def detect(value, timings=None):
+        timings['inference_ms'] = 5.0
+        started.set()
+        release.wait(5)
+        return [value]
+
+    job = manager.submit(1, detect, 'dish', timings=request_timings)
+    assert started.wait(5)
+    # 后台线程写入的是自己的副本，运行中的任务只返回提交时的快照
+    assert job.to_dict()['timings'] == {'decode_ms': 1.0}
+    release.set()
+
+    assert job.wait(5)
+    data = job.to_dict()
+    assert data['status'] == JOB_SUCCESS and data['results'] == ['dish']
+    assert data['timings'] == {'decode_ms': 1.0, 'inference_ms': 5.0}
+    assert request_timings == {'decode_ms': 1.0}
+
+
+def test_failed_job_reports_message_and_user_scope():
+    manager = DetectionJobManager(max_workers=1)
+
+    def fail():
+        raise RuntimeError('boom')
+
+    job = manager.submit(1, fail)
+    assert job.wait(5)
+    assert job.to_dict() == {'status': JOB_ERROR, 'job_id': job.id, 'image_url': None, 'message': '识别失败：boom'}
+    assert manager.get(job.id, user_id=2) is None
+    assert manager.get(job.id, user_id=1) is job
+
+
+def test_poll_wait_is_capped_and_unknown_jobs_404(app, session):
+    from app.models.user import User
+    from app.services.detect_jobs import get_job_manager
+
+    user = User(username='poller', email='poller@example.com')
+    user.set_password('pw')
+    session.add(user)
+    session.commit()
+    client = app.test_client()
+    client.post('/login', data={'username': 'poller', 'password': 'pw'})
+
+    release = threading.Event()
+    job = get_job_manager(app).submit(user.id, lambda: release.wait(5) and [])
+    app.config['DETECT_JOB_MAX_WAIT'] = 0.05
+    try:
+        response = client.get(f'/meal/detect_jobs/{job.id}?wait=60')
+        assert response.status_code == 200
+        assert response.get_json()['status'] in ('pending', 'running')
+    finally:
+        release.set()
+
+    response = client.get('/meal/detect_jobs/unknown')
+    assert response.status_code == 404
+    assert '提交它的服务进程' in response.get_json()['message']
@@ -0,0 +1,118 @@
+from datetime import datetime
+
+from app.models.food import Dish
+from app.models.record import DetectionItem, DetectionRecord
+from app.models.user import User
+from app.services.detection_stats import (DetectionStatsCache, confidence_histogram, detection_statistics,
+                                          dish_popularity)
+
+START, END = datetime(2024, 1, 1), datetime(2024, 2, 1)
+
+
+def _items(session, *items, when=datetime(2024, 1, 10)):
+    record = DetectionRecord(user_id=1, detect_time=when)
+    session.add(record)
+    for dish_id, name, confidence in items:
+        record.items.append(DetectionItem(dish_id=dish_id, dish_name=name, confidence=confidence,
+                                          detect_time=record.detect_time))
+    session.commit()
+
+
+def test_popularity_groups_by_dish_id(session):
+    session.add_all([Dish(dish_id=1, name='宫保鸡丁'), Dish(dish_id=2, name='鱼香肉丝')])
+    # 菜品 1 改名前后的识别、两个未匹配的名称、与菜品 2 同名但未匹配的识别
+    _items(session, (1, '宫爆鸡丁', 0.9), (1, '宫保鸡丁', 0.7), (1, '宫保鸡丁', 0.8),
+           (None, '未知甲', 0.5), (None, '未知甲', 0.3), (None, '未知乙', 0.4),
+           (2, '鱼香肉丝', 0.6), (None, '鱼香肉丝', 0.2))
+
+    popularity = {(row['dish_id'], row['dish_name']): (row['count'], row['avg_confidence'])
+                  for row in dish_popularity(session, START, END)}
+    assert popularity == {
+        (1, '宫保鸡丁'): (3, 0.8),
+        (None, '未知甲'): (2, 0.4),
+        (None, '未知乙'): (1, 0.4),
+        (2, '鱼香肉丝'): (1, 0.6),
+        (None, '鱼香肉丝'): (1, 0.2),
+    }
+    assert dish_popularity(session, START, END, limit=1)[0]['dish_id'] == 1
+    assert dish_popularity(session, END, datetime(2024, 3, 1)) == []
+
+
+def test_confidence_histogram(session):
+    _items(session, (1, 'a', 0.05), (1, 'a', 0.55), (2, 'b', 0.59), (2, 'b', 1.0), (2, 'b', None))
+    assert confidence_histogram(session, START, END) == [1, 0, 0, 0, 0, 2, 0, 0, 0, 1]
+    assert confidence_histogram(session, START, END, bins=2, dish_id=2) == [0, 2]
+
+
+def test_statistics_buckets(session):
+    _items(session, (1, '米饭', 0.9), (2, '红烧肉', 0.8), when=datetime(2024, 1, 1, 8))
+    _items(session, (1, '米饭', 0.9), when=datetime(2024, 1, 1, 12))
+    _items(session, when=datetime(2024, 1, 3, 23, 59))
+
+    labels, entries = detection_statistics(session, DetectionStatsCache(), 'day',
+                                           datetime(2024, 1, 1), datetime(2024, 1, 4))
+    assert labels == ['2024-01-01', '2024-01-02', '2024-01-03']
+    assert entries == [
+        {'count': 2, 'dishes': {'米饭': 2, '红烧肉': 1}},
+        {'count': 0, 'dishes': {}},
+        {'count': 1, 'dishes': {}},
+    ]
+
+
+def test_only_closed_buckets_are_cached(session):
+    cache = DetectionStatsCache(grace=60)
+    start, end = datetime(2024, 1, 1), datetime(2024, 1, 3)
+    now = datetime(2024, 1, 2, 12)
+    _items(session, (1, '米饭', 0.9), when=datetime(2024, 1, 1, 8))
+    _items(session, (1, '米饭', 0.9), when=datetime(2024, 1, 2, 8))
+
+    detection_statistics(session, cache, 'day', start, end, now=now)
+    assert cache.get('day', datetime(2024, 1, 1)) == {'count': 1, 'dishes': {'米饭': 1}}
+    assert cache.get('day', datetime(2024, 1, 2)) is None
+
+    # 已缓存的历史桶不再查询，当前桶每次重新计算
+    _items(session, (1, '米饭', 0.9), when=datetime(2024, 1, 1, 9))
+    _items(session, (2, '红烧肉', 0.8), when=datetime(2024, 1, 2, 9))
+    _, entries = detection_statistics(session, cache, 'day', start, end, now=now)
+    assert [entry['count'] for entry in entries] == [1, 2]
+    assert entries[1]['dishes'] == {'米饭': 1, '红烧肉': 1}
+
+    cache.clear()
+    _, entries = detection_statistics(session, cache, 'day', start, end, now=now)
+    assert [entry['count'] for entry in entries] == [2, 2]
+
+
+def test_cache_grace_and_eviction():
+    cache = DetectionStatsCache(max_entries=2, grace=60)
+    entry = {'count': 1, 'dishes': {}}
+
+    # 桶在 now 前 30 秒才结束，仍在宽限期内
+    cache.put('hour', datetime(2024, 1, 1, 9), entry, now=datetime(2024, 1, 1, 10, 0, 30))
+    assert cache.get('hour', datetime(2024, 1, 1, 9)) is None
+
+    now = datetime(2024, 1, 2)
+    for hour in (1, 2, 3):
+        cache.put('hour', datetime(2024, 1, 1, hour), entry, now=now)
+    assert cache.get('hour', datetime(2024, 1, 1, 1)) is None
+    assert cache.get('hour', datetime(2024, 1, 1, 3)) == entry
+
+
+def test_statistics_route(app, session):
+    admin = User(username='admin', email='admin@example.com', is_admin=1)
+    admin.set_password('pw')
+    session.add(admin)
+    session.commit()
+    _items(session, (1, '米饭', 0.9), (1, '米饭', 0.8), when=datetime(2024, 1, 1, 8))
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'pw'})
+
+    data = client.get('/admin/statistics?from=2024-01-01&to=2024-01-02').get_json()
+    assert data['labels'] == ['2024-01-01', '2024-01-02']
+    assert data['data'] == [1, 0]
+    assert data['dish_totals'] == {'米饭': 2}
+
+    app.config['STATISTICS_MAX_BUCKETS'] = 24
+    response = client.get('/admin/statistics?from=2024-01-01&to=2024-01-02&granularity=hour')
+    assert response.status_code == 400
+    response = client.get('/admin/statistics?granularity=month')
+    assert response.status_code == 400
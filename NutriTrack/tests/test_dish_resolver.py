@@ -0,0 +1,37 @@
+from app.models.food import Dish, normalize_dish_name
+from app.services.dish_resolver import DishResolver, dish_resolver
+
+
+def test_normalized_name_follows_name(session):
+    dish = Dish(dish_id=1, name='  Kung Pao Chicken ')
+    assert dish.name_normalized == 'kung pao chicken'
+
+    dish.name = '宫保鸡丁'
+    assert dish.name_normalized == normalize_dish_name('宫保鸡丁')
+
+
+def test_class_map_per_model_version(session):
+    session.add_all([Dish(dish_id=1, name='Rice'), Dish(dish_id=2, name='红烧肉')])
+    session.commit()
+    resolver = DishResolver()
+
+    class_map = resolver.class_map(session, 'best.pt@1', {0: ' rice', 1: '红烧肉', 2: 'soup'})
+    assert class_map == {0: 1, 1: 2, 2: None}
+    assert resolver.resolve_name(session, 'RICE ') == 1
+    assert resolver.resolve_name(session, '不存在') is None
+
+    # 同一版本复用已生成的映射，新版本按自己的类别名称生成
+    assert resolver.class_map(session, 'best.pt@1', {}) is class_map
+    assert resolver.class_map(session, 'best.pt@2', {0: '红烧肉'}) == {0: 2}
+
+
+def test_shared_resolver_invalidated_on_commit(session):
+    session.add(Dish(dish_id=1, name='Rice'))
+    session.commit()
+    assert dish_resolver.class_map(session, 'v1', {0: 'soup'}) == {0: None}
+
+    session.add(Dish(dish_id=2, name='Soup'))
+    session.commit()
+
+    assert dish_resolver.class_map(session, 'v1', {0: 'soup'}) == {0: 2}
+    assert dish_resolver.resolve_name(session, 'soup') == 2
@@ -0,0 +1,57 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+
+from app.models.record import DietRecord
+from app.services import export
+from app.services.export import export_stream
+
+
+def _diet(session):
+    dishes = [{'dish_name': '米饭', 'weight': 150, 'calories': 174}, {'dish_name': '青菜', 'weight': 100}]
+    session.add_all([
+        DietRecord(user_id=1, meal_type=1, total_calorie=300, dish_list=json.dumps(dishes, ensure_ascii=False),
+                   create_time=datetime(2024, 1, 1, 8)),
+        DietRecord(user_id=1, meal_type=2, total_calorie=500, dish_list='[{"dish_name": "面',
+                   create_time=datetime(2024, 1, 2, 12)),
+        DietRecord(user_id=1, meal_type=3, dish_list='["米饭", {"dish_name": "汤"}]',
+                   create_time=datetime(2024, 1, 3, 19)),
+        DietRecord(user_id=2, meal_type=1, dish_list=None, create_time=datetime(2024, 1, 3, 8)),
+    ])
+    session.commit()
+
+
+def _ndjson(chunks):
+    return [json.loads(line) for line in b''.join(chunks).decode('utf-8').splitlines()]
+
+
+def test_ndjson_keeps_malformed_rows_as_text(session):
+    _diet(session)
+    rows = _ndjson(export_stream(session, 'diet', 'ndjson'))
+    assert [row['id'] for row in rows] == [1, 2, 3, 4]
+    assert rows[0]['dish_list'][0]['dish_name'] == '米饭'
+    assert rows[1]['dish_list'] == '[{"dish_name": "面'
+    assert rows[3]['dish_list'] == []
+
+
+def test_flattened_csv_reports_bad_items_and_completes(session):
+    _diet(session)
+    data = gzip.decompress(b''.join(export_stream(session, 'diet', 'csv', compress=True, flatten=True)))
+    rows = list(csv.DictReader(io.StringIO(data.decode('utf-8'))))
+    assert [(row['id'], row['item_dish_name']) for row in rows] == [
+        ('1', '米饭'), ('1', '青菜'), ('2', ''), ('3', ''), ('3', '汤'), ('4', '')]
+    assert rows[0]['create_time'] == '2024-01-01 08:00:00'
+    assert rows[2]['item_error'].startswith('JSON 无法解析')
+    assert rows[3]['item_error'].startswith('元素不是对象')
+    assert rows[5]['item_error'] == ''
+
+
+def test_filters_and_chunking(session, monkeypatch):
+    _diet(session)
+    monkeypatch.setattr(export, 'CHUNK_SIZE', 10)
+    chunks = list(export_stream(session, 'diet', 'ndjson', user_id=1,
+                                start=datetime(2024, 1, 2), end=datetime(2024, 1, 4)))
+    assert len(chunks) == 2
+    assert [row['id'] for row in _ndjson(chunks)] == [2, 3]
@@ -0,0 +1,51 @@
+import io
+
+import pytest
+from PIL import Image, UnidentifiedImageError
+
+from app.services.image_pipeline import decode_upload, save_original, save_thumbnail
+
+
+def _upload(size, color=(255, 0, 0), fmt='JPEG'):
+    buf = io.BytesIO()
+    Image.new('RGB', size, color).save(buf, format=fmt)
+    buf.seek(0)
+    return buf
+
+
+def test_decodes_and_downscales_large_image():
+    upload = decode_upload(_upload((2000, 1000)), max_side=640)
+
+    assert upload.format == 'JPEG'
+    assert max(upload.image.size) == 640
+    assert upload.array.shape == (upload.image.size[1], upload.image.size[0], 3)
+    assert upload.array.flags['C_CONTIGUOUS']
+    assert set(upload.timings) == {'decode_ms', 'resize_ms'}
+
+
+def test_array_is_bgr():
+    upload = decode_upload(_upload((64, 48), fmt='PNG'), max_side=640)
+
+    assert upload.image.size == (64, 48)
+    assert tuple(upload.array[0, 0]) == (0, 0, 255)
+
+
+def test_keeps_original_bytes(tmp_path):
+    source = _upload((32, 32), fmt='PNG')
+    data = source.getvalue()
+    upload = decode_upload(source, max_side=640)
+
+    path = tmp_path / 'original.png'
+    save_original(upload.data, path)
+    assert path.read_bytes() == data
+
+    thumb = tmp_path / 'thumb.jpg'
+    save_thumbnail(upload.image, thumb, max_side=16)
+    with Image.open(thumb) as saved:
+        assert saved.format == 'JPEG'
+        assert max(saved.size) == 16
+
+
+def test_rejects_non_image():
+    with pytest.raises(UnidentifiedImageError):
+        decode_upload(io.BytesIO(b'not an image'), max_side=640)
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+from app.services.inference_batcher import InferenceBatcher, InferenceQueueFull
+
+
+class _Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, images, conf):
+        self.calls.append((list(images), conf))
+        return [[{'image': image, 'conf': conf}] for image in images]
+
+
+def test_fans_batch_results_out_to_each_future():
+    predict = _Recorder()
+    batcher = InferenceBatcher(predict, max_batch_size=4, max_wait_ms=200)
+
+    futures = [batcher.submit(i, 0.5) for i in range(3)]
+    results = [f.result(timeout=2) for f in futures]
+
+    assert results == [[{'image': i, 'conf': 0.5}] for i in range(3)]
+    assert predict.calls == [([0, 1, 2], 0.5)]
+    assert batcher.batch_count == 1
+    assert batcher.avg_batch_size == 3
+
+
+def test_splits_by_confidence():
+    predict = _Recorder()
+    batcher = InferenceBatcher(predict, max_batch_size=8, max_wait_ms=200)
+
+    low = batcher.submit('a', 0.25)
+    high = batcher.submit('b', 0.5)
+
+    assert low.result(timeout=2) == [{'image': 'a', 'conf': 0.25}]
+    assert high.result(timeout=2) == [{'image': 'b', 'conf': 0.5}]
+    assert sorted(conf for _, conf in predict.calls) == [0.25, 0.5]
+
+
+def test_respects_max_batch_size():
+    predict = _Recorder()
+    batcher = InferenceBatcher(predict, max_batch_size=2, max_wait_ms=200)
+
+    futures = [batcher.submit(i, 0.5) for i in range(5)]
+    for f in futures:
+        f.result(timeout=2)
+
+    assert all(len(images) <= 2 for images, _ in predict.calls)
+    assert batcher.item_count == 5
+
+
+def test_batch_failure_reaches_every_caller():
+    def predict(images, conf):
+        raise RuntimeError('cuda oom')
+
+    batcher = InferenceBatcher(predict, max_batch_size=4, max_wait_ms=100)
+    futures = [batcher.submit(i, 0.5) for i in range(2)]
+
+    for f in futures:
+        with pytest.raises(RuntimeError, match='cuda oom'):
+            f.result(timeout=2)
+    assert batcher.failed_batches == 1
+    assert batcher.last_error['error'] == 'cuda oom'
+
+
+def test_mismatched_output_length_is_an_error():
+    batcher = InferenceBatcher(lambda images, conf: [], max_wait_ms=0)
+
+    with pytest.raises(RuntimeError):
+        batcher.predict('a', 0.5, timeout=2)
+
+
+def test_queue_full():
+    release = threading.Event()
+
+    def predict(images, conf):
+        release.wait(2)
+        return [[] for _ in images]
+
+    batcher = InferenceBatcher(predict, max_batch_size=1, max_wait_ms=0, max_queue_size=1)
+    try:
+        first = batcher.submit('a', 0.5)
+        # 等待工作线程取走第一张图并阻塞在推理中
+        for _ in range(200):
+            if batcher.queue_depth == 0:
+                break
+            time.sleep(0.01)
+        batcher.submit('b', 0.5)
+        with pytest.raises(InferenceQueueFull):
+            batcher.submit('c', 0.5)
+    finally:
+        release.set()
+    assert first.result(timeout=2) == []
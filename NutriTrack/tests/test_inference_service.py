@@ -0,0 +1,117 @@
+import threading
+import time
+from multiprocessing.connection import Listener
+
+import pytest
+
+from app.services.inference_batcher import InferenceQueueFull
+from app.services.inference_service import InferenceClient, InferenceService, parse_address
+
+
+class _DeadProcess:
+    exitcode = 1
+
+    def is_alive(self):
+        return False
+
+
+def _service(**kwargs):
+    return InferenceService('model.pt', '127.0.0.1:0', b'secret', num_workers=1, **kwargs)
+
+
+def test_requires_authkey():
+    with pytest.raises(ValueError):
+        InferenceService('model.pt', '127.0.0.1:0', b'')
+
+
+def test_restart_backoff_and_failure_limit():
+    service = _service(restart_backoff=1.0, max_failures=3)
+    service._workers[0] = _DeadProcess()
+
+    delays = []
+    for _ in range(2):
+        before = time.monotonic()
+        service._on_worker_exit(0, service._workers[0])
+        delays.append(service._restart_at.pop(0) - before)
+    assert delays[0] == pytest.approx(1.0, abs=0.1)
+    assert delays[1] == pytest.approx(2.0, abs=0.1)
+
+    service._on_worker_exit(0, service._workers[0])
+    assert 0 not in service._restart_at
+    health = service.health()
+    assert health['status'] == 'failed'
+    assert health['failed_workers'] == [0]
+    assert 'exit code 1' in health['last_error']['error']
+
+
+def test_reported_load_error_is_kept():
+    service = _service()
+    service._spawned_at[0] = time.time()
+    service._record_error(0, '模型加载失败：bad file')
+    service._on_worker_exit(0, _DeadProcess())
+    assert service.health()['last_error']['error'] == '模型加载失败：bad file'
+
+
+@pytest.fixture
+def fake_server():
+    """本地 socket 上的简易服务端，按 handler 返回响应"""
+    listener = Listener(('127.0.0.1', 0), authkey=b'secret')
+    state = {'handler': None, 'messages': []}
+
+    def serve():
+        while True:
+            try:
+                conn = listener.accept()
+            except OSError:
+                return
+            with conn:
+                while True:
+                    try:
+                        message = conn.recv()
+                    except (EOFError, OSError):
+                        break
+                    state['messages'].append(message)
+                    conn.send(state['handler'](message))
+
+    threading.Thread(target=serve, daemon=True).start()
+    host, port = listener.address
+    yield f'{host}:{port}', state
+    listener.close()
+
+
+def test_parse_address():
+    assert parse_address('127.0.0.1:6001') == ('127.0.0.1', 6001)
+    assert parse_address('/run/nutritrack/inference.sock') == '/run/nutritrack/inference.sock'
+
+
+def test_client_round_trip_and_errors(fake_server):
+    address, state = fake_server
+    client = InferenceClient(address, b'secret', timeout=2)
+
+    state['handler'] = lambda m: {'ok': True, 'outputs': [[{'class_id': 1}] for _ in m['images']]}
+    assert client.predict_batch(['a', 'b'], 0.5) == [[{'class_id': 1}], [{'class_id': 1}]]
+    assert state['messages'][-1] == {'op': 'detect', 'images': ['a', 'b'], 'conf': 0.5}
+
+    state['handler'] = lambda m: {'ok': False, 'busy': True, 'error': '推理服务队列已满'}
+    with pytest.raises(InferenceQueueFull):
+        client.predict_batch(['a'], 0.5)
+
+    state['handler'] = lambda m: {'ok': False, 'error': 'boom'}
+    with pytest.raises(RuntimeError, match='boom'):
+        client.predict_batch(['a'], 0.5)
+
+
+def test_client_caches_model_info(fake_server):
+    address, state = fake_server
+    client = InferenceClient(address, b'secret', timeout=2)
+    state['handler'] = lambda m: {'ok': True, 'model_info': {'version': 'best.pt@1', 'names': {0: 'rice'}}}
+
+    assert client.model_info()['version'] == 'best.pt@1'
+    assert client.model_info()['version'] == 'best.pt@1'
+    assert [m['op'] for m in state['messages']] == ['model_info']
+
+
+def test_service_handle_without_model():
+    service = _service()
+    assert service._handle({'op': 'model_info'})['ok'] is False
+    assert '未知操作' in service._handle({'op': 'reload'})['error']
@@ -0,0 +1,88 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.record import DetectionRecord
+from app.models.user import User
+from app.services.keyset import InvalidCursor, decode_cursor, encode_cursor, keyset_paginate
+
+COLUMNS = [DetectionRecord.detect_time, DetectionRecord.id]
+
+
+@pytest.fixture
+def records(session):
+    # 每个时间戳 3 条记录，验证排序键相同时按 id 区分
+    start = datetime(2024, 1, 1, 12, 0)
+    for i in range(10):
+        session.add(DetectionRecord(user_id=1, detect_time=start + timedelta(minutes=i // 3)))
+    session.commit()
+    rows = DetectionRecord.query.all()
+    return [r.id for r in sorted(rows, key=lambda r: (r.detect_time, r.id), reverse=True)]
+
+
+def _page(**kwargs):
+    return keyset_paginate(DetectionRecord.query, COLUMNS, per_page=4, descending=True, **kwargs)
+
+
+def test_forward_and_back(records):
+    pages = [_page()]
+    while pages[-1].has_next:
+        pages.append(_page(after=pages[-1].next_cursor))
+    assert [[r.id for r in p.items] for p in pages] == [records[0:4], records[4:8], records[8:10]]
+    assert not pages[0].has_prev and pages[1].has_prev
+
+    back = _page(before=pages[2].prev_cursor)
+    assert [r.id for r in back.items] == records[4:8]
+    assert back.has_next and back.has_prev
+    first = _page(before=back.prev_cursor)
+    assert [r.id for r in first.items] == records[0:4]
+    assert first.has_next and not first.has_prev
+
+
+def test_ascending_by_primary_key(records):
+    page = keyset_paginate(DetectionRecord.query, [DetectionRecord.id], per_page=6)
+    assert [r.id for r in page.items] == sorted(records)[:6]
+    page = keyset_paginate(DetectionRecord.query, [DetectionRecord.id], per_page=6, after=page.next_cursor)
+    assert [r.id for r in page.items] == sorted(records)[6:]
+    assert not page.has_next
+
+
+def test_cursor_round_trip():
+    values = [datetime(2024, 5, 6, 7, 8, 9, 123456), 42]
+    assert decode_cursor(encode_cursor(values), 2) == values
+
+
+def _token(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+@pytest.mark.parametrize('token', [
+    'not-base64!', encode_cursor([1]), 'bnVsbA', encode_cursor([{'dt': 5}, 1]),
+    _token('ab'), _token([[1], [2]]), _token([1.5, 2]), _token([True, 1]), _token([{'dt': '2024-01-01', 'x': 1}, 1]),
+])
+def test_invalid_cursor(token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, 2)
+
+
+def test_cursor_types_must_match_sort_columns():
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor(['2024-01-01', 1]), 2, [datetime, int])
+    assert decode_cursor(encode_cursor([None, 1]), 2, [datetime, int]) == [None, 1]
+
+
+def test_tampered_cursor_is_a_400(app, session, records):
+    admin = User(username='admin', email='admin@example.com', is_admin=1)
+    admin.set_password('pw')
+    session.add(admin)
+    session.commit()
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'pw'})
+
+    for path in ('/admin/detection_records', '/admin/user_manage'):
+        response = client.get(path, query_string={'after': _token([{'a': 1}, 'x']), 'format': 'json'})
+        assert response.status_code == 400
+    response = client.get('/admin/detection_records', query_string={'after': _token(['x', 1]), 'format': 'json'})
+    assert response.status_code == 400
@@ -0,0 +1,88 @@
+import io
+
+import pytest
+
+from app.models.food import Dish, DishIngredient, DishNutrition
+from app.services.menu_import import import_records, iter_records
+
+
+def _csv(text):
+    return list(iter_records(io.BytesIO(text.encode('utf-8')), 'csv'))
+
+
+def _import(session, kind, text, **kwargs):
+    return import_records(session, kind, _csv(text), **kwargs)
+
+
+@pytest.fixture
+def menu(session):
+    _import(session, 'canteens', 'canteen_id,name\n1,一食堂\n')
+    _import(session, 'dishes', 'dish_id,name,canteen_id\n1,番茄炒蛋,1\n2,红烧肉,1\n')
+    _import(session, 'ingredients', 'ingredient_id,ingredient_name\n1,番茄\n2,鸡蛋\n3,猪肉\n')
+    _import(session, 'nutrition_facts',
+            'ingredient_name,energy_kcal,protein_g,fat_g,carb_g\n'
+            '番茄,20,1,0,4\n鸡蛋,140,13,9,1\n猪肉,400,15,37,0\n')
+    _import(session, 'dish_ingredients',
+            'dish_name,ingredient_name,amount_g\n番茄炒蛋,番茄,200\n番茄炒蛋,鸡蛋,100\n红烧肉,猪肉,250\n')
+    return session
+
+
+def test_import_builds_dish_nutrition(menu):
+    nutrition = menu.get(DishNutrition, 1)
+    assert nutrition.recipe_weight_g == 300
+    # (200 * 20 + 100 * 140) / 100 克 -> 每 100 克
+    assert nutrition.calories == pytest.approx((200 * 20 / 100 + 100 * 140 / 100) / 3)
+    assert menu.query(DishIngredient).count() == 3
+
+
+def test_invalid_rows_are_reported(menu):
+    result = _import(menu, 'dish_ingredients',
+                     'dish_name,ingredient_name,amount_g\n不存在,番茄,10\n红烧肉,番茄,abc\n红烧肉,番茄,30\n')
+    assert result.imported == 1
+    assert [error['line'] for error in result.errors] == [2, 3]
+
+
+def test_dry_run_writes_nothing(menu):
+    result = _import(menu, 'dishes', 'dish_id,name\n3,清炒时蔬\n', dry_run=True)
+    assert result.imported == 1
+    assert menu.get(Dish, 3) is None
+
+
+def test_duplicate_dish_names_in_file_are_rejected(menu):
+    result = _import(menu, 'dishes', 'dish_id,name\n3,宫保鸡丁\n4, 宫保鸡丁 \n5,鱼香肉丝\n')
+    assert result.imported == 2
+    assert result.error_count == 1 and result.errors[0]['line'] == 3
+    assert menu.get(Dish, 4) is None
+
+
+def test_dish_name_of_another_dish_is_rejected(menu):
+    result = _import(menu, 'dishes', 'dish_id,name\n9,番茄炒蛋\n2,红烧肉（大份）\n')
+    assert result.imported == 1
+    assert result.errors[0]['line'] == 2
+    assert menu.get(Dish, 9) is None
+    assert menu.get(Dish, 1).name == '番茄炒蛋'
+    assert menu.get(Dish, 2).name == '红烧肉（大份）'
+
+
+def test_reimport_same_dish_updates_in_place(menu):
+    result = _import(menu, 'dishes', 'dish_id,name,cooking_method\n1,番茄炒蛋,炒\n')
+    assert result.error_count == 0
+    menu.expire_all()
+    assert menu.get(Dish, 1).cooking_method == '炒'
+
+
+def test_unknown_canteen_is_a_row_error_before_any_write(menu):
+    result = _import(menu, 'dishes', 'dish_id,name,canteen_id\n3,清炒时蔬,1\n4,麻婆豆腐,99\n', chunk_size=1)
+    assert result.imported == 1
+    assert result.errors == [{'line': 3, 'message': '食堂不存在：99'}]
+    assert menu.get(Dish, 4) is None
+
+
+def test_names_colliding_after_normalization_and_renames(menu):
+    # 第 2、3 行规范化后同名；第 4 行把菜品 2 改名，第 5 行使用其释放的旧名称
+    result = _import(menu, 'dishes', 'dish_id,name\n3,Mapo Tofu\n4, mapo tofu\n2,红烧肉（大份）\n5,红烧肉\n')
+    assert [error['line'] for error in result.errors] == [3]
+    menu.expire_all()
+    assert menu.get(Dish, 4) is None
+    assert menu.get(Dish, 2).name == '红烧肉（大份）'
+    assert menu.get(Dish, 5).name_normalized == '红烧肉'
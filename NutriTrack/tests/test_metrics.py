@@ -0,0 +1,74 @@
+import pytest
+
+from app import create_app
+from app.services.metrics import Histogram, metrics, span
+from config import Config
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    INFERENCE_SERVICE_ADDRESS = None
+
+
+class MetricsConfig(TestConfig):
+    METRICS_ENABLED = True
+    METRICS_TOKEN = 'scrape-token'
+
+
+AUTH = {'Authorization': 'Bearer scrape-token'}
+
+
+@pytest.fixture
+def metrics_app():
+    app = create_app(MetricsConfig)
+    metrics.reset()
+    yield app
+    create_app(TestConfig)  # 恢复为关闭状态，避免影响其它测试
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(buckets=(0.01, 0.1, 1.0))
+    for seconds in [0.005] * 50 + [0.05] * 45 + [0.5] * 5:
+        histogram.observe(seconds)
+    assert histogram.count == 100
+    assert histogram.quantile(0.5) == pytest.approx(0.01)
+    assert 0.01 < histogram.quantile(0.95) <= 0.1
+    assert histogram.quantile(1.0) == 0.5  # 不超过实际最大值
+    assert histogram.to_dict()['max_ms'] == 500.0
+
+
+def test_requests_and_spans_are_reported(metrics_app):
+    client = metrics_app.test_client()
+    assert client.get('/admin/metrics').status_code == 302  # 未登录且没有令牌
+    with span('unit.test'):
+        pass
+
+    data = client.get('/admin/metrics', headers=AUTH).get_json()
+    assert data['spans']['unit.test']['count'] == 1
+    route = data['routes']['GET admin.metrics_report']
+    assert route['count'] == 1 and route['statuses'] == {'302': 1}
+
+
+def test_prometheus_format(metrics_app):
+    metrics.observe_span('quote"span', 0.003)
+    response = metrics_app.test_client().get('/admin/metrics', query_string={'format': 'prometheus'},
+                                               headers=AUTH)
+    assert response.mimetype == 'text/plain'
+    lines = response.get_data(as_text=True).splitlines()
+    assert '# TYPE nutritrack_span_duration_seconds histogram' in lines
+    assert 'nutritrack_span_duration_seconds_bucket{span="quote\\"span",le="0.0025"} 0' in lines
+    assert 'nutritrack_span_duration_seconds_bucket{span="quote\\"span",le="0.005"} 1' in lines
+    assert 'nutritrack_span_duration_seconds_bucket{span="quote\\"span",le="+Inf"} 1' in lines
+    assert 'nutritrack_span_duration_seconds_count{span="quote\\"span"} 1' in lines
+    assert any(line.startswith('nutritrack_inference_queue_depth ') for line in lines)
+
+
+def test_later_app_can_disable_metrics(metrics_app):
+    assert metrics.enabled
+    app = create_app(type('DisabledConfig', (MetricsConfig,), {'METRICS_ENABLED': False}))
+    assert not metrics.enabled
+    with span('ignored'):
+        pass
+    assert 'ignored' not in metrics.snapshot()['spans']
+    assert app.test_client().get('/admin/metrics', headers=AUTH).status_code == 404
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+pytest.importorskip('ultralytics')
+
+from app.services import model_registry as registry_module  # noqa: E402
+from app.services.model_registry import ModelRegistry  # noqa: E402
+
+
+class _FakeYOLO:
+    loads = []
+
+    def __init__(self, path):
+        self.path = path
+        self.names = {0: 'rice', 1: 'tofu'}
+        self.calls = []
+        _FakeYOLO.loads.append(path)
+
+    def __call__(self, source, **kwargs):
+        self.calls.append(kwargs)
+        return []
+
+
+@pytest.fixture
+def model_file(tmp_path, monkeypatch):
+    _FakeYOLO.loads = []
+    monkeypatch.setattr(registry_module, 'YOLO', _FakeYOLO)
+    path = tmp_path / 'best.pt'
+    path.write_bytes(b'weights')
+    os.utime(path, (1000, 1000))
+    return str(path)
+
+
+def test_loads_once_and_warms_up(model_file):
+    registry = ModelRegistry(warmup_size=32)
+
+    first = registry.get(model_file)
+    second = registry.get(model_file)
+
+    assert first is second
+    assert _FakeYOLO.loads == [model_file]
+    assert first.model.calls == [{'verbose': False, 'imgsz': 32}]
+    assert first.names == {0: 'rice', 1: 'tofu'}
+    assert first.version == 'best.pt@1000'
+
+
+def test_reloads_when_file_changes(model_file):
+    registry = ModelRegistry(warmup_size=0)
+    first = registry.get(model_file)
+
+    os.utime(model_file, (2000, 2000))
+    second = registry.get(model_file)
+
+    assert second is not first
+    assert second.version == 'best.pt@2000'
+    assert len(_FakeYOLO.loads) == 2
+
+
+def test_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        ModelRegistry().get(str(tmp_path / 'missing.pt'))
@@ -0,0 +1,66 @@
+import pytest
+
+from app.models.food import Dish, DishIngredient, Ingredient, NutritionFacts
+
+
+@pytest.fixture
+def client(app, session):
+    app.config['NUTRITION_BATCH_MAX_MEALS'] = 3
+    session.add_all([
+        Dish(dish_id=1, name='番茄炒蛋'),
+        Dish(dish_id=2, name='米饭'),
+        Ingredient(ingredient_id=1, ingredient_name='番茄'),
+        Ingredient(ingredient_id=2, ingredient_name='鸡蛋'),
+        Ingredient(ingredient_id=3, ingredient_name='大米'),
+        NutritionFacts(ingredient_id=1, energy_kcal=20, protein_g=1, fat_g=0.2, carb_g=4),
+        NutritionFacts(ingredient_id=2, energy_kcal=140, protein_g=13, fat_g=9, carb_g=1),
+        NutritionFacts(ingredient_id=3, energy_kcal=116, protein_g=2.6, fat_g=0.3, carb_g=25.9),
+    ])
+    session.flush()
+    session.add_all([
+        DishIngredient(dish_id=1, ingredient_id=1, amount_g=200),
+        DishIngredient(dish_id=1, ingredient_id=2, amount_g=100),
+        DishIngredient(dish_id=2, ingredient_id=3, amount_g=100),
+    ])
+    session.commit()
+    return app.test_client()
+
+
+def _single(client, dishes):
+    data = client.post('/meal/calculate_nutrition', json={'dishes': dishes}).get_json()
+    return data['total'], data['details']
+
+
+def test_batch_matches_single_calls(client):
+    meals = [
+        {'id': 'breakfast', 'dishes': [{'dish_name': '米饭', 'weight': 150}]},
+        {'dishes': [{'dish_name': '番茄炒蛋', 'weight': 230}, {'dish_name': '米饭', 'weight': 80}]},
+        {'id': 7, 'dishes': [{'dish_name': '未知菜品', 'weight': 100}]},
+    ]
+    response = client.post('/meal/calculate_nutrition_batch', json={'meals': meals})
+
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [r['id'] for r in results] == ['breakfast', 1, 7]
+    for meal, result in zip(meals, results):
+        total, details = _single(client, meal['dishes'])
+        assert result['total'] == total
+        assert result['details'] == details
+
+
+def test_empty_batch(client):
+    data = client.post('/meal/calculate_nutrition_batch', json={}).get_json()
+    assert data == {'status': 'success', 'results': []}
+
+
+@pytest.mark.parametrize('payload', [
+    {'meals': {'dishes': []}},
+    {'meals': ['not a meal']},
+    {'meals': [{'dishes': [{'dish_name': '米饭', 'weight': 'abc'}]}]},
+    {'meals': [{'dishes': []}] * 4},
+])
+def test_rejects_bad_requests(client, payload):
+    response = client.post('/meal/calculate_nutrition_batch', json=payload)
+
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'error'
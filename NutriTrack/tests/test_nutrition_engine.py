@@ -0,0 +1,109 @@
+import random
+
+import pytest
+
+from app.models.food import Dish, DishIngredient, Ingredient, NutritionFacts
+from app.services.nutrition_engine import MACROS, NutritionEngine, nutrition_engine
+
+FACT_FIELDS = ('energy_kcal', 'protein_g', 'fat_g', 'carb_g')
+
+
+def _baseline(session, dishes):
+    """原先逐条查询配方与营养成分的计算方式"""
+    total = dict.fromkeys(MACROS, 0.0)
+    details = []
+    for dish_input in dishes:
+        name = dish_input.get('dish_name', '')
+        weight = float(dish_input.get('weight', 0))
+        single = dict.fromkeys(MACROS, 0.0)
+        single.update(dish_name=name, weight=weight)
+
+        dish = session.query(Dish).filter(Dish.name_normalized == name.strip().lower()).first()
+        items = session.query(DishIngredient).filter_by(dish_id=dish.dish_id).all() if dish else []
+        recipe_weight = sum(item.amount_g for item in items)
+        if recipe_weight > 0:
+            for item in items:
+                facts = session.get(NutritionFacts, item.ingredient_id)
+                if session.get(Ingredient, item.ingredient_id) is None or facts is None:
+                    continue
+                factor = item.amount_g * weight / recipe_weight / 100
+                for macro, field in zip(MACROS, FACT_FIELDS):
+                    single[macro] += getattr(facts, field) * factor
+            for macro in MACROS:
+                single[macro] = round(single[macro], 1)
+        for macro in MACROS:
+            total[macro] += single[macro]
+        details.append(single)
+    for macro in MACROS:
+        total[macro] = round(total[macro], 1)
+    return total, details
+
+
+@pytest.fixture
+def menu(session):
+    rng = random.Random(7)
+    ingredients = []
+    for i in range(1, 13):
+        ingredients.append(Ingredient(ingredient_id=i, ingredient_name=f'配料{i}'))
+        # 最后两种配料没有营养成分
+        if i <= 10:
+            ingredients.append(NutritionFacts(
+                ingredient_id=i, energy_kcal=rng.uniform(10, 500), protein_g=rng.uniform(0, 30),
+                fat_g=rng.uniform(0, 40), carb_g=rng.uniform(0, 80)))
+    session.add_all(ingredients)
+    session.add_all(Dish(dish_id=d, name=f'菜品{d}') for d in range(1, 9))
+    session.flush()
+    for dish_id in range(1, 8):  # 菜品8没有配方
+        for ingredient_id in rng.sample(range(1, 13), 3):
+            session.add(DishIngredient(dish_id=dish_id, ingredient_id=ingredient_id,
+                                       amount_g=rng.uniform(5, 300)))
+    session.commit()
+    return session
+
+
+def test_matches_baseline_formula(menu):
+    rng = random.Random(11)
+    names = [f'菜品{d}' for d in range(1, 9)] + [' 菜品3 ', '不存在的菜']
+    engine = NutritionEngine()
+
+    for _ in range(20):
+        dishes = [{'dish_name': rng.choice(names), 'weight': rng.uniform(0, 600)}
+                  for _ in range(rng.randint(1, 6))]
+        assert engine.calculate(menu, dishes) == _baseline(menu, dishes)
+
+
+def test_unknown_and_empty_recipes_are_zero(menu):
+    total, details = NutritionEngine().calculate(menu, [
+        {'dish_name': '不存在的菜', 'weight': 100},
+        {'dish_name': '菜品8', 'weight': 100},
+    ])
+    assert total == dict.fromkeys(MACROS, 0.0)
+    assert [d['calories'] for d in details] == [0.0, 0.0]
+
+
+def test_calculate_many_matches_single(menu):
+    engine = NutritionEngine()
+    meals = [[{'dish_name': '菜品1', 'weight': 150}], [], [{'dish_name': '菜品2', 'weight': 80},
+                                                          {'dish_name': '菜品1', 'weight': 50}]]
+
+    assert engine.calculate_many(menu, meals) == [engine.calculate(menu, meal) for meal in meals]
+
+
+def test_shared_engine_invalidated_on_commit(menu):
+    before, _ = nutrition_engine.calculate(menu, [{'dish_name': '菜品8', 'weight': 100}])
+    assert before['calories'] == 0
+
+    menu.add(DishIngredient(dish_id=8, ingredient_id=1, amount_g=100))
+    menu.commit()
+
+    after, _ = nutrition_engine.calculate(menu, [{'dish_name': '菜品8', 'weight': 100}])
+    assert after['calories'] == round(menu.get(NutritionFacts, 1).energy_kcal, 1)
+
+
+def test_ttl_reload(menu, monkeypatch):
+    engine = NutritionEngine()
+    first = engine.snapshot(menu, ttl=60)
+    assert engine.snapshot(menu, ttl=60) is first
+
+    monkeypatch.setattr(first, 'loaded_at', first.loaded_at - 61)
+    assert engine.snapshot(menu, ttl=60) is not first
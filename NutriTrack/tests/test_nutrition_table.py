@@ -0,0 +1,106 @@
+import pytest
+
+from app.models.food import Dish, DishIngredient, DishNutrition, Ingredient, NutritionFacts
+from app.models.user import User
+from app.services.nutrition_table import (
+    compute_dish_nutrition, mark_nutrition_data_changed, on_nutrition_data_committed,
+    rebuild_dish_nutrition
+)
+
+
+@pytest.fixture
+def recipes(session):
+    session.add_all([
+        Dish(dish_id=1, name='番茄炒蛋'),
+        Dish(dish_id=2, name='清炒时蔬'),
+        Ingredient(ingredient_id=1, ingredient_name='番茄'),
+        Ingredient(ingredient_id=2, ingredient_name='鸡蛋'),
+        Ingredient(ingredient_id=3, ingredient_name='香料'),
+        NutritionFacts(ingredient_id=1, energy_kcal=20, protein_g=1, fat_g=0, carb_g=4),
+        NutritionFacts(ingredient_id=2, energy_kcal=140, protein_g=13, fat_g=9, carb_g=1),
+    ])
+    session.flush()
+    session.add_all([
+        DishIngredient(dish_id=1, ingredient_id=1, amount_g=200),
+        DishIngredient(dish_id=1, ingredient_id=2, amount_g=100),
+        # 没有营养成分的配料只计入配方总重量
+        DishIngredient(dish_id=1, ingredient_id=3, amount_g=100),
+    ])
+    session.commit()
+    return session
+
+
+def test_per_100g_values(recipes):
+    row = recipes.get(DishNutrition, 1)
+
+    assert row.recipe_weight_g == 400
+    assert row.calories == pytest.approx((200 * 20 + 100 * 140) / 400)
+    assert row.protein == pytest.approx((200 * 1 + 100 * 13) / 400)
+    assert row.fat == pytest.approx(100 * 9 / 400)
+    assert row.carb == pytest.approx((200 * 4 + 100 * 1) / 400)
+    # 无配方的菜品没有营养成分行
+    assert recipes.get(DishNutrition, 2) is None
+    assert set(compute_dish_nutrition(recipes)) == {1}
+
+
+def test_rebuilds_on_nutrition_change(recipes):
+    recipes.get(NutritionFacts, 2).energy_kcal = 160
+    recipes.commit()
+
+    recipes.expire_all()
+    assert recipes.get(DishNutrition, 1).calories == pytest.approx((200 * 20 + 100 * 160) / 400)
+
+
+def test_rebuilds_on_recipe_change(recipes):
+    recipes.add(DishIngredient(dish_id=2, ingredient_id=1, amount_g=50))
+    recipes.delete(recipes.get(DishIngredient, (1, 3)))
+    recipes.commit()
+
+    recipes.expire_all()
+    assert recipes.get(DishNutrition, 1).recipe_weight_g == 300
+    assert recipes.get(DishNutrition, 2).calories == pytest.approx(20)
+
+
+def test_bulk_writes_marked_explicitly(recipes):
+    recipes.execute(NutritionFacts.__table__.update().where(
+        NutritionFacts.ingredient_id == 1).values(energy_kcal=40))
+    mark_nutrition_data_changed(recipes, ingredient_ids=[1])
+    recipes.commit()
+
+    recipes.expire_all()
+    assert recipes.get(DishNutrition, 1).calories == pytest.approx((200 * 40 + 100 * 140) / 400)
+
+
+def test_full_rebuild_and_invalidation_callback(recipes, monkeypatch):
+    from app.services import nutrition_table
+
+    calls = []
+    monkeypatch.setattr(nutrition_table, '_invalidation_callbacks', [])
+    on_nutrition_data_committed(lambda: calls.append(1))
+
+    recipes.query(DishNutrition).delete()
+    assert rebuild_dish_nutrition(recipes) == 2
+    recipes.commit()
+    assert recipes.query(DishNutrition).count() == 1
+    # 只改 DishNutrition 不算菜品数据变更
+    assert calls == []
+
+    recipes.get(Dish, 2).cooking_method = '清炒'
+    recipes.commit()
+    assert calls == [1]
+
+
+def test_dish_library_page(app, recipes):
+    user = User(username='alice', email='alice@example.com')
+    user.set_password('pw')
+    recipes.add(user)
+    recipes.commit()
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'alice', 'password': 'pw'})
+    response = client.get('/meal/dish_library')
+
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    assert '番茄炒蛋' in body and '清炒时蔬' in body
+    assert str(round((200 * 20 + 100 * 140) / 400, 1)) in body
@@ -0,0 +1,69 @@
+import io
+
+from PIL import Image, ImageDraw
+
+from app.services.result_cache import DetectionResultCache, dhash
+
+
+def _plate(offset=0):
+    image = Image.new('RGB', (200, 200), (240, 240, 240))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((20 + offset, 30, 120 + offset, 130), fill=(200, 80, 20))
+    draw.rectangle((130, 120, 190, 190), fill=(30, 140, 60))
+    return image
+
+
+def test_dhash_is_stable_under_recompression_and_resize():
+    image = _plate()
+    buf = io.BytesIO()
+    image.save(buf, format='JPEG', quality=60)
+    recompressed = Image.open(io.BytesIO(buf.getvalue()))
+    resized = image.resize((150, 150))
+
+    base = dhash(image)
+    assert (base ^ dhash(recompressed)).bit_count() <= 4
+    assert (base ^ dhash(resized)).bit_count() <= 4
+    assert (base ^ dhash(image.transpose(Image.FLIP_LEFT_RIGHT))).bit_count() > 4
+
+
+def test_exact_and_near_hits():
+    cache = DetectionResultCache(max_distance=2)
+    cache.put('v1', 0.5, 0b1010, [{'dish_id': 1}])
+
+    assert cache.get('v1', 0.5, 0b1010) == [{'dish_id': 1}]
+    assert cache.get('v1', 0.5, 0b1001) == [{'dish_id': 1}]  # 距离 2
+    assert cache.get('v1', 0.5, 0b0101) is None                # 距离 4
+    assert cache.get('v2', 0.5, 0b1010) is None
+    assert cache.get('v1', 0.25, 0b1010) is None
+    assert cache.stats() == {'entries': 1, 'hits': 2, 'misses': 3, 'hit_rate': 0.4}
+
+
+def test_exact_only_when_distance_zero():
+    cache = DetectionResultCache(max_distance=0)
+    cache.put('v1', 0.5, 0b1010, [{'dish_id': 1}])
+
+    assert cache.get('v1', 0.5, 0b1011) is None
+
+
+def test_returns_copies():
+    cache = DetectionResultCache()
+    cache.put('v1', 0.5, 1, [{'weight': 100}])
+
+    cache.get('v1', 0.5, 1)[0]['weight'] = 300
+    assert cache.get('v1', 0.5, 1) == [{'weight': 100}]
+
+
+def test_lru_eviction_and_ttl():
+    cache = DetectionResultCache(max_entries=2, max_distance=0)
+    cache.put('v1', 0.5, 1, [])
+    cache.put('v1', 0.5, 2, [])
+    cache.get('v1', 0.5, 1)
+    cache.put('v1', 0.5, 3, [])
+
+    assert cache.get('v1', 0.5, 2) is None
+    assert cache.get('v1', 0.5, 1) == []
+
+    expired = DetectionResultCache(ttl=0)
+    expired.put('v1', 0.5, 1, [])
+    assert expired.get('v1', 0.5, 1) is None
+    assert expired.stats()['entries'] == 0
@@ -0,0 +1,82 @@
+from datetime import datetime
+
+import pytest
+
+from app.models.record import DietRecord
+from app.models.user import User
+from app.services.time_buckets import bucket_start, iter_buckets
+
+
+def _user(session, name):
+    user = User(username=name, email=f'{name}@example.com')
+    user.set_password('pw')
+    session.add(user)
+    session.flush()
+    return user
+
+
+def _meal(session, user, when, calories, protein=10.0):
+    session.add(DietRecord(user_id=user.id, meal_type=1, dish_list='[]', total_calorie=calories,
+                           total_protein=protein, total_fat=5.0, total_carb=20.0, create_time=when))
+
+
+@pytest.fixture
+def client(app, session):
+    alice = _user(session, 'alice')
+    bob = _user(session, 'bob')
+    _meal(session, alice, datetime(2026, 3, 2, 8, 0), 400)     # 周一
+    _meal(session, alice, datetime(2026, 3, 2, 12, 30), 650.5)
+    _meal(session, alice, datetime(2026, 3, 4, 23, 59, 59), 300)
+    _meal(session, alice, datetime(2026, 3, 9, 0, 0), 500)     # 下周一
+    _meal(session, alice, datetime(2026, 2, 28, 19, 0), 800)   # 范围外
+    _meal(session, bob, datetime(2026, 3, 2, 9, 0), 999)       # 其他用户
+    session.commit()
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'alice', 'password': 'pw'})
+    return client
+
+
+def test_daily_series_fills_empty_days(client):
+    data = client.get('/dashboard/trends?from=2026-03-01&to=2026-03-05').get_json()
+
+    assert data['status'] == 'success'
+    assert data['labels'] == ['2026-03-01', '2026-03-02', '2026-03-03', '2026-03-04', '2026-03-05']
+    assert data['calories'] == [0, 1050.5, 0, 300, 0]
+    assert data['protein'] == [0, 20, 0, 10, 0]
+    assert data['meals'] == [0, 2, 0, 1, 0]
+
+
+def test_weekly_and_monthly_buckets(client):
+    weekly = client.get('/dashboard/trends?from=2026-03-01&to=2026-03-10&bucket=week').get_json()
+    # 周桶以周一为标签，3月1日是周日，属于 2月23日 这一周
+    assert weekly['labels'] == ['2026-02-23', '2026-03-02', '2026-03-09']
+    assert weekly['calories'] == [0, 1350.5, 500]
+    assert weekly['meals'] == [0, 3, 1]
+
+    monthly = client.get('/dashboard/trends?from=2026-02-01&to=2026-03-31&bucket=month').get_json()
+    assert monthly['labels'] == ['2026-02-01', '2026-03-01']
+    assert monthly['calories'] == [800, 1850.5]
+
+
+@pytest.mark.parametrize('query', [
+    'bucket=hour', 'from=2026-3-xx', 'from=2026-03-05&to=2026-03-01'
+])
+def test_rejects_bad_parameters(client, query):
+    response = client.get(f'/dashboard/trends?{query}')
+
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'error'
+
+
+def test_requires_login(app):
+    assert app.test_client().get('/dashboard/trends').status_code == 302
+
+
+def test_iter_buckets_cover_range():
+    start, end = datetime(2026, 11, 15), datetime(2027, 2, 1)
+
+    assert [b.strftime('%Y-%m') for b in iter_buckets(start, end, 'month')] == \
+        ['2026-11', '2026-12', '2027-01']
+    assert bucket_start(datetime(2026, 3, 8, 13, 45), 'week') == datetime(2026, 3, 2)
+    assert bucket_start(datetime(2026, 3, 8, 13, 45), 'hour') == datetime(2026, 3, 8, 13)
@@ -0,0 +1,37 @@
+import os
+import time
+
+from app.services.upload_store import UploadStore
+
+
+def _path(store, key):
+    return os.path.join(store.root, store._relative('originals', key))
+
+
+def test_put_rewrites_file_removed_by_sweeper(tmp_path):
+    store = UploadStore(str(tmp_path), '/uploads')
+    key = store.make_key(b'image')
+    store.put(key, data=b'image')
+    os.remove(_path(store, key))
+
+    store.put(key, data=b'image')
+    with open(_path(store, key), 'rb') as f:
+        assert f.read() == b'image'
+
+
+def test_sweep_removes_expired_and_keeps_refreshed(tmp_path):
+    store = UploadStore(str(tmp_path), '/uploads')
+    old, fresh = store.make_key(b'old'), store.make_key(b'fresh')
+    store.put(old, data=b'old')
+    store.put(fresh, data=b'fresh')
+    week_ago = time.time() - 7 * 86400
+    os.utime(_path(store, old), (week_ago, week_ago))
+
+    assert store.sweep(max_age_days=3) == (1, 3)
+    assert not os.path.exists(_path(store, old))
+    assert os.path.exists(_path(store, fresh))
+
+    # 再次上传只刷新修改时间，不会被当作过期文件
+    os.utime(_path(store, fresh), (week_ago, week_ago))
+    store.put(fresh, data=b'fresh')
+    assert store.sweep(max_age_days=3) == (0, 0)
@@ -0,0 +1,33 @@
+from sqlalchemy import update
+
+from app.models.user import User
+from app.services.user_cache import user_cache
+
+
+def _login_admin(app, session):
+    admin = User(username='admin', email='admin@example.com', is_admin=1)
+    admin.set_password('pw')
+    session.add(admin)
+    session.commit()
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'pw'})
+    return client, admin.id
+
+
+def test_admin_routes_ignore_stale_cached_role(app, session):
+    user_cache.invalidate()
+    client, user_id = _login_admin(app, session)
+    assert client.get('/admin/statistics/dishes').status_code == 200
+
+    # 模拟其它进程的修改：不经过本进程的 ORM 事件，缓存中的快照仍是管理员
+    with session.get_bind().begin() as connection:
+        connection.execute(update(User.__table__).where(User.__table__.c.id == user_id).values(is_admin=0))
+    assert client.get('/admin/statistics/dishes').status_code == 302
+
+
+def test_admin_routes_reject_disabled_account(app, session):
+    user_cache.invalidate()
+    client, user_id = _login_admin(app, session)
+    with session.get_bind().begin() as connection:
+        connection.execute(update(User.__table__).where(User.__table__.c.id == user_id).values(status=0))
+    assert client.get('/admin/statistics/dishes').status_code == 302
@@ -0,0 +1,59 @@
+from sqlalchemy.exc import OperationalError
+
+from app.models.record import Plate, PlateWeightSample
+from app.services.weight_ingest import WeightIngestor
+
+
+def _ingestor(app, **kwargs):
+    ingestor = WeightIngestor(app, **kwargs)
+    ingestor._ensure_started = lambda: None  # 测试中手动 flush
+    return ingestor
+
+
+def _stored(session):
+    session.expire_all()
+    return sorted((s.plate_id, s.ts, s.weight) for s in session.query(PlateWeightSample))
+
+
+def test_permanent_error_drops_only_offending_plate(app, session):
+    session.add_all([Plate(plate_id='P1'), Plate(plate_id='P2')])
+    session.commit()
+    ingestor = _ingestor(app)
+    ingestor.offer([('P1', 1000, 10.0), ('P2', 1000, None), ('P1', 2000, 12.0)])
+
+    assert ingestor.flush() == 2
+    assert _stored(session) == [('P1', 1000, 10.0), ('P1', 2000, 12.0)]
+    assert session.get(Plate, 'P1').current_weight == 12.0
+    stats = ingestor.stats()
+    assert stats['dead_lettered'] == 1
+    assert stats['buffered'] == 0 and stats['retrying'] == 0
+
+
+def test_transient_errors_are_retried_then_dead_lettered(app, session, monkeypatch):
+    session.add(Plate(plate_id='P1'))
+    session.commit()
+    ingestor = _ingestor(app, max_attempts=3)
+    execute = ingestor._execute
+
+    def unavailable(batch, latest):
+        raise OperationalError('INSERT', {}, Exception('server has gone away'))
+
+    monkeypatch.setattr(ingestor, '_execute', unavailable)
+    ingestor.offer([('P1', 1000, 10.0)])
+    assert ingestor.flush() == 0
+    ingestor.offer([('P1', 2000, 11.0)])
+    assert ingestor.flush() == 0
+    # 重试中的批次失败时，新数据仍留在缓冲区
+    assert ingestor.stats()['retrying'] == 1 and ingestor.stats()['buffered'] == 1
+
+    monkeypatch.setattr(ingestor, '_execute', execute)
+    assert ingestor.flush() == 2
+    assert _stored(session) == [('P1', 1000, 10.0), ('P1', 2000, 11.0)]
+
+    monkeypatch.setattr(ingestor, '_execute', unavailable)
+    ingestor.offer([('P1', 3000, 9.0)])
+    for _ in range(3):
+        ingestor.flush()
+    stats = ingestor.stats()
+    assert stats['dead_lettered'] == 1
+    assert stats['retrying'] == 0 and stats['failed_flushes'] == 5
@@ -0,0 +1,104 @@
+import json
+import random
+
+from app.models.record import DetectionRecord, Plate, PlateWeightChunk, PlateWeightSample
+from app.services.weight_codec import decode_samples, downsample, encode_samples
+from app.services.weight_store import CHUNK_SPAN_MS, downsample_chunks, iter_plate_samples, pack_samples
+
+BASE_TS = 1_700_000_000_000 - 1_700_000_000_000 % CHUNK_SPAN_MS
+
+
+def _add_samples(session, plate_id, samples):
+    session.add_all(PlateWeightSample(plate_id=plate_id, ts=ts, weight=weight) for ts, weight in samples)
+    session.commit()
+
+
+def _series(start, count, step_ms, seed):
+    rng = random.Random(seed)
+    return [(start + i * step_ms, round(rng.uniform(0, 800), 1)) for i in range(count)]
+
+
+def test_codec_round_trip():
+    samples = [(BASE_TS, 512.3), (BASE_TS + 40, 511.9), (BASE_TS + 45, 0.0), (BASE_TS + 10_000, 780.1)]
+    assert decode_samples(encode_samples(samples)) == samples
+    assert decode_samples(encode_samples([])) == []
+
+
+def test_downsample_averages_buckets():
+    samples = [(BASE_TS, 10.0), (BASE_TS + 400, 20.0), (BASE_TS + 1000, 30.0)]
+    assert list(downsample(samples, 1000)) == [(BASE_TS, 15.0), (BASE_TS + 1000, 30.0)]
+
+
+def test_pack_keeps_every_sample_across_windows(session):
+    session.add_all([Plate(plate_id='P1'), Plate(plate_id='P2')])
+    # 每 5 秒一个采样，跨越 3 个完整窗口加一个未完成的窗口
+    p1 = _series(BASE_TS, 3 * 720 + 100, 5000, seed=1)
+    p2 = _series(BASE_TS + 1234, 1500, 7000, seed=2)
+    _add_samples(session, 'P1', p1)
+    _add_samples(session, 'P2', p2)
+
+    before_ts = BASE_TS + 3 * CHUNK_SPAN_MS + 60_000
+    packed, chunks = pack_samples(session, before_ts)
+
+    expected_packed = sum(1 for ts, _ in p1 + p2 if ts < before_ts)
+    assert packed == expected_packed
+    assert chunks == session.query(PlateWeightChunk).count()
+    # 只有 before_ts 之后的原始采样留在原表
+    remaining = session.query(PlateWeightSample.ts).all()
+    assert remaining and all(ts >= before_ts for (ts,) in remaining)
+
+    assert list(iter_plate_samples(session, 'P1', batch_size=100)) == p1
+    assert list(iter_plate_samples(session, 'P2', batch_size=100)) == p2
+
+
+def test_iter_plate_samples_range(session):
+    session.add(Plate(plate_id='P1'))
+    samples = _series(BASE_TS, 2000, 3000, seed=3)
+    _add_samples(session, 'P1', samples)
+    pack_samples(session, BASE_TS + CHUNK_SPAN_MS)
+
+    start, end = BASE_TS + 1_000_000, BASE_TS + 5_000_000
+    assert list(iter_plate_samples(session, 'P1', start, end, batch_size=50)) == \
+        [(ts, w) for ts, w in samples if start <= ts < end]
+
+
+def test_late_samples_merge_into_existing_chunk(session):
+    session.add(Plate(plate_id='P1'))
+    _add_samples(session, 'P1', _series(BASE_TS, 100, 1000, seed=4))
+    pack_samples(session, BASE_TS + CHUNK_SPAN_MS)
+    downsample_chunks(session, BASE_TS + CHUNK_SPAN_MS, 10_000)
+
+    # 迟到的原始采样落在已降采样的窗口内
+    _add_samples(session, 'P1', [(BASE_TS + 500_500, 42.0)])
+    pack_samples(session, BASE_TS + CHUNK_SPAN_MS)
+
+    chunks = session.query(PlateWeightChunk).all()
+    assert len(chunks) == 1
+    assert chunks[0].resolution_ms == 10_000
+    series = list(iter_plate_samples(session, 'P1'))
+    assert (BASE_TS + 500_000, 42.0) in series
+    assert [ts for ts, _ in series] == sorted(ts for ts, _ in series)
+    assert session.query(PlateWeightSample).count() == 0
+
+
+def test_migrate_weight_log_keeps_legacy_until_verified(app, session):
+    log = json.dumps([[1000, 250.04], [1500, 248.96], [2000, 240.0]])
+    records = [DetectionRecord(user_id=1, weight_log=log) for _ in range(3)]
+    records.append(DetectionRecord(user_id=1, weight_log='[[1000, "heavy"'))
+    session.add_all(records)
+    session.commit()
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=['migrate-weight-log'])
+    assert '已转换 3 条' in result.output and '1 条无法解析' in result.output
+    session.expire_all()
+    assert all(record.weight_log is not None for record in records)
+    assert list(records[0].iter_weight_samples()) == [(1000, 250.0), (1500, 249.0), (2000, 240.0)]
+
+    # 与原日志不一致的记录保留 weight_log
+    records[1].weight_data = encode_samples([(1000, 250.0)])
+    session.commit()
+    result = runner.invoke(args=['migrate-weight-log', '--drop-legacy'])
+    assert '已清空 2 条' in result.output and '1 条校验不一致' in result.output
+    session.expire_all()
+    assert [record.weight_log is None for record in records] == [True, False, True, False]